@@ -7,6 +7,7 @@ from time import sleep # So we can make delays that humans can detect
 from llt.common.mem_func_client_2 import MemClient
 #from DC2390_functions import * # Register definitions live in this file
 from llt.utils.sockit_system_functions import sockit_uns32_to_signed32, sockit_capture  # More functions for talking to the SoCkit
+from llt.utils.sockit_conversions import sign_extend
 import numpy as np
 from matplotlib import pyplot as plt
 
@@ -98,26 +99,8 @@ for i in range (0, 2):
 client.reg_write(DATAPATH_CONTROL_BASE, 0x00000000) # First capture ADC A
 data = sockit_uns32_to_signed32(sockit_capture(client, NUM_SAMPLES, trigger = 0, timeout = 2.0))
 
-data_ch0 = np.ndarray(NUM_SAMPLES, dtype=float)
-
 numbits = 12
-if(numbits == 18):
-    for i in range(0, NUM_SAMPLES):
-        data_ch0[i] = (data[i] & 0x0003FFFF)
-        if(data_ch0[i] > 2**17):
-            data_ch0[i] -= 2**18
-
-if(numbits == 16):
-    for i in range(0, NUM_SAMPLES):
-        data_ch0[i] = (data[i] & 0x0000FFFF)
-        if(data_ch0[i] > 2**15):
-            data_ch0[i] -= 2**16
-
-if(numbits == 12):
-    for i in range(0, NUM_SAMPLES):
-        data_ch0[i] = (data[i] & 0x00000FFF)
-        if(data_ch0[i] > 2**11):
-            data_ch0[i] -= 2**12
+data_ch0 = sign_extend(data, numbits).astype(float)
 
 data_nodc0 = data_ch0 #- np.average(data)
 
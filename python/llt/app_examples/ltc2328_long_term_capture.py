@@ -35,32 +35,33 @@ of the authors and should not be interpreted as representing official policies,
 either expressed or implied, of Linear Technology Corp.
 '''
 
-from time import sleep
-import time
-import numpy as np
-
-from ltc2328_dc1908 import ltc2328_dc1908
+import llt.common.capture_archive as ca
+import llt.common.functions as funcs
+import llt.common.constants as consts
+from llt.demo_board_examples.ltc23xx.ltc2328.ltc2328_18_dc1908a_d import Dc1908aD
 
 # Print extra information to console
 
 num_points = 1024
 delay = 1.0
 
-averages = [0] * num_points
-stdevs = [0] * num_points
-times = [time.time()] * num_points
-starttime = time.time()
-
-for i in range (0, num_points):
-    print("Capturing point " + str(i) + " of " + str(num_points))
-    times[i] = time.time() - starttime
-    capturedata = ltc2328_dc1908(32*1024, verbose=False, do_demo=False)
-    averages[i] = np.average(capturedata)
-    stdevs[i] = np.std(capturedata)
-    sleep(delay)
+# Every capture is kept in the archive as soon as it is taken, a crash loses
+# at most one point and the raw data stays around for later analysis
+archive = ca.CaptureArchive('longterm_archive')
+first_point = len(archive)
 
+# Set the board up once and reuse it for every point
+with Dc1908aD(verbose=False) as board:
+    for i, capturedata in enumerate(funcs.collect_loop(board, num_points, 32*1024,
+            consts.TRIGGER_NONE, delay=delay)):
+        print("Captured point " + str(i) + " of " + str(num_points))
+        archive.append(capturedata, board=board)
+archive.close()
 
 print('Writing data to file')
+starttime = archive.records[first_point]['timestamp']
 with open('longterm_data.txt', 'w') as f:
-    for i in range (0, num_points):
-        f.write(str(times[i]) + "," + str(averages[i]) + "," + str(stdevs[i]) + '\n')
\ No newline at end of file
+    for record, (average, stdev) in archive.apply(ca.noise_stats,
+            range(first_point, len(archive))):
+        f.write(str(record['timestamp'] - starttime) + "," + str(average) + "," + 
+                str(stdev) + '\n')
\ No newline at end of file
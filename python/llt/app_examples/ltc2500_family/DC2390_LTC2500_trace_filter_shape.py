@@ -57,6 +57,7 @@ from llt.common.mem_func_client_2 import MemClient ## Updated to client_2
 from llt.utils.DC2390_functions import * # Leaving here as a commend during restructuring
 from llt.utils.sockit_system_functions import *
 from llt.utils.linear_lab_tools_functions import *
+import llt.utils.ltc25xx_filter_store as filter_store
 import time
 
 
@@ -90,24 +91,12 @@ NUM_FREQS = 64
 
 bins_per_point = 2
 
-filename = "../../../../common/ltc25xx_filters/" + FT_info.FT_txt + "_" + DF_info.DF_txt + ".txt"
-filelength = linecount(filename)
-filt = np.ndarray(filelength, dtype=float)
-print ("reading " + str(filelength) + " coefficients from file " + filename)
-# Read in coefficients from files
-with open(filename, 'r') as infile:
-    for i in range(0, filelength):
-        instring = infile.readline()
-        filt[i] = float(instring)
-print('done reading filter coefficients!')
+# Coefficients come back normalized to unity gain, the response is cached on
+# disk after the first run
+filt = filter_store.get_filter(FT_info, DF_info)
+filt_resp_full_db = freqz_db_cached(filt, 2 ** 20)
 
-filt /= sum(filt) # Normalize to unity gain
-filt_resp_full = freqz_by_fft_numpoints(filt, 2 ** 20)
-
-filt_resp_full_db = 20 * np.log10(abs(filt_resp_full))
-
-filt_resp = downsample(filt_resp_full, 128*bins_per_point)
-filt_resp_db = 20 * np.log10(abs(filt_resp))
+filt_resp_db = downsample(filt_resp_full_db, 128*bins_per_point)
 
 
 # Plot out first bin time domain data, count bits for this point. Useful
@@ -82,7 +82,7 @@ raw_input("\nPlease set jumper 10 and 11 to 1, \nthen hit enter")
 HOST = sys.argv[1] if len(sys.argv) == 2 else '127.0.0.1'
 
 print '\nStarting client'
-client = MemClient(host=HOST)
+client = MemClient(host=HOST, shadow=True) # skips rewriting unchanged registers
 
 #Read FPGA type and revision
 rev_id = client.reg_read(REV_ID_BASE)
@@ -154,4 +154,5 @@ plt.xlabel("Bin")
 plt.ylabel("dB")
 plt.show()
 
+print client.shadow.summary()
 print "The program took", (time.time() - start_time)/60, "min to run"
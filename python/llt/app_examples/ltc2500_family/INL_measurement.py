@@ -390,8 +390,8 @@ if __name__ == "__main__":
         #HOST = '10.54.6.24'
         #HOST = '192.168.1.231'    
 
-        # Connect to the SoC 
-        client = MemClient(host=HOST)
+        # Connect to the SoC, the shadow skips rewriting unchanged registers
+        client = MemClient(host=HOST, shadow=True)
         
         # Verify the FPGA bistream
         # Read FPGA type and revision
@@ -476,6 +476,7 @@ if __name__ == "__main__":
         
         inl_test(client, meter_inst, NUMBER_OF_POINTS, in_p_start, in_p_end,
                  in_n_start, in_n_end, "output_data/raw_data.csv")
+        print client.shadow.summary()
 
         time.sleep(1)
 
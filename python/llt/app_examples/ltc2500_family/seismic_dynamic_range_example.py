@@ -48,6 +48,7 @@ import numpy as np
 from time import sleep
 from matplotlib import pyplot as plt
 import llt.utils.DC2390_functions as DC2390
+import llt.utils.ltc25xx_filter_store as filter_store
 from llt.common.mem_func_client_2 import MemClient
 from llt.utils.sockit_system_functions import *
 
@@ -87,27 +88,18 @@ def capture_seismic_data(client, filter_type):
     if filter_type == 1:
         filter_str = "SSINC 256"
         length = 256
-        with open('../../../../common/ltc25xx_filters/ssinc_256.txt') as filter_coeff_file:
-            ltc25xx_filter = [float(line) for line in filter_coeff_file]
-        # Normalize to unity gain
-        sum_ltc25xx_filter = sum(ltc25xx_filter)
-        ltc25xx_filter[:] = [x / sum_ltc25xx_filter for x in ltc25xx_filter] 
+        # Cached and already normalized to unity gain
+        ltc25xx_filter = filter_store.get_filter("ssinc", 256)
     elif filter_type == 2:   
         filter_str = "SSINC 1024"
         length = 1024
-        with open('../../../../common/ltc25xx_filters/ssinc_1024.txt') as filter_coeff_file:
-            ltc25xx_filter = [float(line) for line in filter_coeff_file]
-        # Normalize to unity gain
-        sum_ltc25xx_filter = sum(ltc25xx_filter)
-        ltc25xx_filter[:] = [x / sum_ltc25xx_filter for x in ltc25xx_filter]
+        # Cached and already normalized to unity gain
+        ltc25xx_filter = filter_store.get_filter("ssinc", 1024)
     elif filter_type == 3:
         filter_str = "SSINC 4096"
         length = 4096
-        with open('../../../../common/ltc25xx_filters/ssinc_4096.txt') as filter_coeff_file:
-            ltc25xx_filter = [float(line) for line in filter_coeff_file]
-        # Normalize to unity gain
-        sum_ltc25xx_filter = sum(ltc25xx_filter)
-        ltc25xx_filter[:] = [x / sum_ltc25xx_filter for x in ltc25xx_filter]
+        # Cached and already normalized to unity gain
+        ltc25xx_filter = filter_store.get_filter("ssinc", 4096)
     else:
         filter_str = "SINC 2048"
         length = SINC_LEN
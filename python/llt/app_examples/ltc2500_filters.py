@@ -51,6 +51,7 @@ import time
 import sys
 from llt.utils.DC2390_functions import * # Has filter DF, type information
 import llt.utils.linear_lab_tools_functions as lltf
+import llt.utils.ltc25xx_filter_store as filter_store
 
 start_time = time.time();
 
@@ -78,25 +79,20 @@ except: # if not, read files
 
 if read_files == True:
     filters          = [[[] for j in xrange(len(DF_list))] for i in xrange(len(FT_list))]
-    filt_resp_mag    = [[[] for j in xrange(len(DF_list))] for i in xrange(len(FT_list))]
     filt_resp_mag_db = [[[] for j in xrange(len(DF_list))] for i in xrange(len(FT_list))]
     ftnum = 0 # Handy numerical index
     for ft in FT_list:
         dfnum = 0 # Handy numerical index
         for df in DF_list:
-            filename = "../../../common/ltc25xx_filters/" + ft.FT_txt + "_" + df.DF_txt + ".txt" # Construct filename
-            filelength = lltf.linecount(filename) # Find out how long it is
-            filters[ftnum][dfnum] = np.ndarray(filelength, dtype=float) # Add entry to list
-            print ("reading " + str(filelength) + " coefficients from file " + filename)
-            with open(filename, 'r') as infile: # Read in coefficients from files
-                for i in range(0, filelength):
-                    instring = infile.readline()
-                    filters[ftnum][dfnum][i] = float(instring)
-            filters[ftnum][dfnum] /= sum(filters[ftnum][dfnum]) # Normalize to unity gain
-            filt_resp_mag[ftnum][dfnum] = lltf.freqz_by_fft_numpoints(filters[ftnum][dfnum], 2 ** 20) # Calculate magnitude response
-            filt_resp_mag_db[ftnum][dfnum] = 20*np.log10(abs(filt_resp_mag[ftnum][dfnum])) # Calculate response in dB
+            # Coefficients come back normalized to unity gain
+            filters[ftnum][dfnum] = filter_store.get_filter(ft, df)
+            print ("read " + str(len(filters[ftnum][dfnum])) + " coefficients for " + filter_store.filter_name(ft, df))
             dfnum += 1
         ftnum += 1
+    # Responses in dB, computed in parallel the first time and cached on disk
+    responses = lltf.freqz_db_cached_list([f for ft_filters in filters for f in ft_filters], 2 ** 20)
+    for ftnum in range(len(FT_list)):
+        filt_resp_mag_db[ftnum] = responses[ftnum * len(DF_list):(ftnum + 1) * len(DF_list)]
     print ("Done reading in all coefficient files and calculating responses!!")
 
 read_files = False # So that we don't re-read files if run again.
@@ -210,84 +206,14 @@ FS = 1000000 # Sample rate, for scaling horizontal axis
 
 start_time = time.time();
 
-# Sort of messy to read one by one, but each filter has a different length...
-
-filename = "../../../common/ltc25xx_filters/" + FTSINC1.FT_txt + "_" + DF_info.DF_txt + ".txt"
-filelength = lltf.linecount(filename)
-filt_sinc1 = np.ndarray(filelength, dtype=float)
-print ("reading " + str(filelength) + " coefficients from file " + filename)
-# Read in coefficients from files
-with open(filename, 'r') as infile:
-    for i in range(0, filelength):
-        instring = infile.readline()
-        filt_sinc1[i] = float(instring)
-print("done reading filter coefficients for " + FTSINC1.FT_txt + "!")
-
-filename = "../../../common/ltc25xx_filters/" + FTSINC2.FT_txt + "_" + DF_info.DF_txt + ".txt"
-filelength = lltf.linecount(filename)
-filt_sinc2 = np.ndarray(filelength, dtype=float)
-print ("reading " + str(filelength) + " coefficients from file " + filename)
-# Read in coefficients from files
-with open(filename, 'r') as infile:
-    for i in range(0, filelength):
-        instring = infile.readline()
-        filt_sinc2[i] = float(instring)
-print("done reading filter coefficients for " + FTSINC2.FT_txt + "!")
-
-filename = "../../../common/ltc25xx_filters/" + FTSINC3.FT_txt + "_" + DF_info.DF_txt + ".txt"
-filelength = lltf.linecount(filename)
-filt_sinc3 = np.ndarray(filelength, dtype=float)
-print ("reading " + str(filelength) + " coefficients from file " + filename)
-# Read in coefficients from files
-with open(filename, 'r') as infile:
-    for i in range(0, filelength):
-        instring = infile.readline()
-        filt_sinc3[i] = float(instring)
-print("done reading filter coefficients for " + FTSINC3.FT_txt + "!")
-
-filename = "../../../common/ltc25xx_filters/" + FTSINC4.FT_txt + "_" + DF_info.DF_txt + ".txt"
-filelength = lltf.linecount(filename)
-filt_sinc4 = np.ndarray(filelength, dtype=float)
-print ("reading " + str(filelength) + " coefficients from file " + filename)
-# Read in coefficients from files
-with open(filename, 'r') as infile:
-    for i in range(0, filelength):
-        instring = infile.readline()
-        filt_sinc4[i] = float(instring)
-print("done reading filter coefficients for " + FTSINC4.FT_txt + "!")
-
-filename = "../../../common/ltc25xx_filters/" + FTSSINC.FT_txt + "_" + DF_info.DF_txt + ".txt"
-filelength = lltf.linecount(filename)
-filt_ssinc = np.ndarray(filelength, dtype=float)
-print ("reading " + str(filelength) + " coefficients from file " + filename)
-# Read in coefficients from files
-with open(filename, 'r') as infile:
-    for i in range(0, filelength):
-        instring = infile.readline()
-        filt_ssinc[i] = float(instring)
-print("done reading filter coefficients for " + FTSSINC.FT_txt + "!")
-
-filename = "../../../common/ltc25xx_filters/" + FT_FLAT.FT_txt + "_" + DF_info.DF_txt + ".txt"
-filelength = lltf.linecount(filename)
-filt_flat = np.ndarray(filelength, dtype=float)
-print ("reading " + str(filelength) + " coefficients from file " + filename)
-# Read in coefficients from files
-with open(filename, 'r') as infile:
-    for i in range(0, filelength):
-        instring = infile.readline()
-        filt_flat[i] = float(instring)
-print("done reading filter coefficients for " + FT_FLAT.FT_txt + "!")
-
-
-
-
-filt_sinc1 /= sum(filt_sinc1) #Normalize to unity gain
-filt_sinc2 /= sum(filt_sinc2) #Normalize to unity gain
-filt_sinc3 /= sum(filt_sinc3) #Normalize to unity gain
-filt_sinc4 /= sum(filt_sinc4) #Normalize to unity gain
-filt_ssinc /= sum(filt_ssinc) #Normalize to unity gain
-filt_flat /= sum(filt_flat) #Normalize to unity gain
-print("Done normalizing!")
+# Coefficients come back normalized to unity gain (and read-only)
+filt_sinc1 = filter_store.get_filter(FTSINC1, DF_info)
+filt_sinc2 = filter_store.get_filter(FTSINC2, DF_info)
+filt_sinc3 = filter_store.get_filter(FTSINC3, DF_info)
+filt_sinc4 = filter_store.get_filter(FTSINC4, DF_info)
+filt_ssinc = filter_store.get_filter(FTSSINC, DF_info)
+filt_flat = filter_store.get_filter(FT_FLAT, DF_info)
+print("done reading filter coefficients for DF " + DF_info.DF_txt + "!")
 
 # Plot the impulse responses on the same horizontal axis, with normalized
 # amplitude for a better visual picture...
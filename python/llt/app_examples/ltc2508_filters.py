@@ -52,6 +52,7 @@ import time
 # Import Linear Lab Tools utility funcitons
 import sys
 import llt.utils.linear_lab_tools_functions as lltf
+import llt.utils.ltc25xx_filter_store as filter_store
 
 start_time = time.time();
 
@@ -61,42 +62,12 @@ use_fft_method = True
 ppc = 8 # Points per coefficient, affects fft method
 num_freqencies = 65536 # Number of frequencies to evaluate, affects freqz method
 
-# Initialize arrays to hold filter coefficients. We know the number of elements ahead of time.
-ssinc_256 = np.ndarray(2175, dtype=float)
-ssinc_1024 = np.ndarray(8703, dtype=float)
-ssinc_4096 = np.ndarray(34815, dtype=float)
-ssinc_16384 = np.ndarray(139263, dtype=float)
-
-# Read in coefficients from files
-with open('../../../common/ltc25xx_filters/ssinc_256.txt', 'r') as infile:
-    for i in range(0, 2175):
-        instring = infile.readline()
-        ssinc_256[i] = float(instring)
-print('done reading DF 256!')
-
-with open('../../../common/ltc25xx_filters/ssinc_1024.txt', 'r') as infile:
-    for i in range(0, 8703):
-        instring = infile.readline()
-        ssinc_1024[i] = float(instring)
-print('done reading DF 1024!')
-
-with open('../../../common/ltc25xx_filters/ssinc_4096.txt', 'r') as infile:
-    for i in range(0, 34815):
-        instring = infile.readline()
-        ssinc_4096[i] = float(instring)
-print('done reading DF 4096!')
-
-with open('../../../common/ltc25xx_filters/ssinc_16384.txt', 'r') as infile:
-    for i in range(0, 139263):
-        instring = infile.readline()
-        ssinc_16384[i] = float(instring) # Frequency Density
-print('done reading DF 16384!')
-
-ssinc_256 /= sum(ssinc_256) #Normalize to unity gain
-ssinc_1024 /= sum(ssinc_1024) #Normalize to unity gain
-ssinc_4096 /= sum(ssinc_4096) #Normalize to unity gain
-ssinc_16384 /= sum(ssinc_16384) #Normalize to unity gain
-print("Done normalizing!")
+# Read in coefficients, already normalized to unity gain
+ssinc_256 = filter_store.get_filter("ssinc", 256)
+ssinc_1024 = filter_store.get_filter("ssinc", 1024)
+ssinc_4096 = filter_store.get_filter("ssinc", 4096)
+ssinc_16384 = filter_store.get_filter("ssinc", 16384)
+print("Done reading coefficients!")
 
 # Plot the impulse responses
 plt.figure(1)
@@ -52,6 +52,7 @@ import time
 # Import Linear Lab Tools utility funcitons
 import sys
 import llt.utils.linear_lab_tools_functions as lltf
+import llt.utils.ltc25xx_filter_store as filter_store
 
 start_time = time.time();
 
@@ -61,49 +62,13 @@ use_fft_method = True
 ppc = 8 # Points per coefficient, affects fft method
 num_freqencies = 65536 # Number of frequencies to evaluate, affects freqz method
 
-# Initialize arrays to hold filter coefficients. We know the number of elements ahead of time.
-ssinc_flat_4 = np.ndarray(117, dtype=float)
-ssinc_flat_8 = np.ndarray(235, dtype=float)
-ssinc_flat_16 = np.ndarray(471, dtype=float)
-ssinc_flat_32 = np.ndarray(943, dtype=float)
-#ssinc_flat_64 = np.ndarray(1887, dtype=float)
-
-# Read in coefficients from files
-with open('../../../common/ltc25xx_filters/ssinc_flat_4.txt', 'r') as infile:
-    for i in range(0, 117):
-        instring = infile.readline()
-        ssinc_flat_4[i] = float(instring)
-print('done reading DF 4!')
-
-with open('../../../common/ltc25xx_filters/ssinc_flat_8.txt', 'r') as infile:
-    for i in range(0, 235):
-        instring = infile.readline()
-        ssinc_flat_8[i] = float(instring)
-print('done reading DF 8!')
-
-with open('../../../common/ltc25xx_filters/ssinc_flat_16.txt', 'r') as infile:
-    for i in range(0, 471):
-        instring = infile.readline()
-        ssinc_flat_16[i] = float(instring)
-print('done reading DF 16!')
-
-with open('../../../common/ltc25xx_filters/ssinc_flat_32.txt', 'r') as infile:
-    for i in range(0, 943):
-        instring = infile.readline()
-        ssinc_flat_32[i] = float(instring)
-print('done reading DF 32!')
-
-#with open('../../common/ltc25xx_filters/ssinc_flat_64.txt', 'r') as infile:
-#    for i in range(0, 1887):
-#        instring = infile.readline()
-#        ssinc_flat_64[i] = float(instring) # Frequency Density
-#print('done reading DF 64!')
-ssinc_flat_4 /= sum(ssinc_flat_4) #Normalize to unity gain
-ssinc_flat_8 /= sum(ssinc_flat_8) #Normalize to unity gain
-ssinc_flat_16 /= sum(ssinc_flat_16) #Normalize to unity gain
-ssinc_flat_32 /= sum(ssinc_flat_32) #Normalize to unity gain
-#ssinc_flat_64 /= sum(ssinc_flat_64) #Normalize to unity gain
-print("Done normalizing!")
+# Read in coefficients, already normalized to unity gain
+ssinc_flat_4 = filter_store.get_filter("ssinc_flat", 4)
+ssinc_flat_8 = filter_store.get_filter("ssinc_flat", 8)
+ssinc_flat_16 = filter_store.get_filter("ssinc_flat", 16)
+ssinc_flat_32 = filter_store.get_filter("ssinc_flat", 32)
+#ssinc_flat_64 = filter_store.get_filter("ssinc_flat", 64)
+print("Done reading coefficients!")
 
 # Plot the impulse responses on the same horizontal axis, with normalized
 # amplitude for a better visual picture...
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (c) 2016, Linear Technology Corp.(LTC)
+    All rights reserved.
+
+    Redistribution and use in source and binary forms, with or without
+    modification, are permitted provided that the following conditions are met:
+
+    1. Redistributions of source code must retain the above copyright notice,
+       this list of conditions and the following disclaimer.
+    2. Redistributions in binary form must reproduce the above copyright
+       notice, this list of conditions and the following disclaimer in the
+       documentation and/or other materials provided with the distribution.
+
+    THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+    ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+    LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+    CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+    SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+    INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+    CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+    ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+    POSSIBILITY OF SUCH DAMAGE.
+
+    The views and conclusions contained in the software and documentation are
+    those of the authors and should not be interpreted as representing official
+    policies, either expressed or implied, of Linear Technology Corp.
+
+    Description:
+        Times the python side of an acquisition (collect, scatter, text and
+        binary file write, sin_params) on the simulated controller backend, no hardware needed.
+        Collects and transfers are instant so only the host work is measured,
+        run with LTC_SIMULATED_BOARDS set to use other boards or timings.
+"""
+
+import os
+os.environ['LTC_CONTROLLER_COMM'] = 'simulated'
+os.environ.setdefault('LTC_SIMULATED_BOARDS',
+    'DC718:DC1813A-E:alignment=18:is_bipolar=0:frequency=20e3:realtime=0:transfer_rate=0;'
+    'DC890:DC1925A-A:alignment=20:frequency=20e3:realtime=0:transfer_rate=0;'
+    'DC1371:DC1763A-E:alignment=16:is_bipolar=0:frequency=20e3:realtime=0:transfer_rate=0')
+
+import tempfile
+import time
+import llt.common.capture_file as cf
+import llt.common.constants as consts
+import llt.common.dc718 as dc718
+import llt.common.dc890 as dc890
+import llt.common.dc1371 as dc1371
+import llt.common.functions as funcs
+from llt.utils.sin_params import sin_params
+
+NUM_SAMPLES = 256 * 1024
+
+def make_boards():
+    # settings of the matching demo_board_examples
+    return [
+        ("DC718, 18 bit, 3 byte", dc718.Demoboard('DC1813A-E', True, 18, 18, False)),
+        ("DC890, 20 bit, 4 byte", dc890.Demoboard('DC1925A-A', 'CMOS', 1, True, 20, 20, True)),
+        ("DC1371, 16 bit, 2 channel", dc1371.Demoboard('DC1763A-E', 'S2195', 2, 16, 16, False, 0x28000000))
+    ]
+
+def time_it(func, *args):
+    start = time.time()
+    result = func(*args)
+    return time.time() - start, result
+
+def benchmark(num_samples = NUM_SAMPLES):
+    file_name = os.path.join(tempfile.gettempdir(), 'acquisition_benchmark.txt')
+    capture_name = os.path.join(tempfile.gettempdir(), 'acquisition_benchmark.ltc')
+    print "%-28s %10s %10s %10s %10s" % ("board", "collect", "file", "binary", "sin_params")
+    for name, board in make_boards():
+        collect_time, data = time_it(board.collect, num_samples, consts.TRIGGER_NONE)
+        channel = data[0] if isinstance(data, tuple) else data
+        file_time, _ = time_it(funcs.write_to_file_32_bit, file_name, channel)
+        binary_time, _ = time_it(cf.write_capture, capture_name, data, board)
+        sin_params_time, _ = time_it(sin_params, channel)
+        print "%-28s %9.1fms %9.1fms %9.1fms %9.1fms" % (name, 1000 * collect_time,
+            1000 * file_time, 1000 * binary_time, 1000 * sin_params_time)
+    os.remove(file_name)
+    os.remove(capture_name)
+
+if __name__ == '__main__':
+    print "%d samples per collect" % NUM_SAMPLES
+    benchmark()
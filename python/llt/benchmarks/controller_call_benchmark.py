@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (c) 2016, Linear Technology Corp.(LTC)
+    All rights reserved.
+
+    Redistribution and use in source and binary forms, with or without
+    modification, are permitted provided that the following conditions are met:
+
+    1. Redistributions of source code must retain the above copyright notice,
+       this list of conditions and the following disclaimer.
+    2. Redistributions in binary form must reproduce the above copyright
+       notice, this list of conditions and the following disclaimer in the
+       documentation and/or other materials provided with the distribution.
+
+    THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+    ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+    LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+    CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+    SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+    INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+    CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+    ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+    POSSIBILITY OF SUCH DAMAGE.
+
+    The views and conclusions contained in the software and documentation are
+    those of the authors and should not be interpreted as representing official
+    policies, either expressed or implied, of Linear Technology Corp.
+
+    Description:
+        Register calls/sec through Controller on the simulated backend, for
+        hs_fpga_write_data_at_address / hs_fpga_read_data_at_address as used
+        by the LTC212x and DC2226 setup code. The prototyped function table
+        is compared with the original getattr-per-call _call.
+"""
+
+import os
+os.environ['LTC_CONTROLLER_COMM'] = 'simulated'
+os.environ.setdefault('LTC_SIMULATED_BOARDS', 'HIGH_SPEED:DC2226A')
+
+import time
+import ctypes as ct
+import llt.common.constants as consts
+import llt.common.ltc_controller_comm as comm
+import llt.common.exceptions as errs
+
+NUM_CALLS = 100000
+ADDRESS = 0x01
+
+class ReferenceController(comm.Controller):
+    """The original getattr per call Controller, kept as the reference."""
+    def _call(self, func_name, *args):
+        func = getattr(comm._load_dll(), 'Lcc' + func_name)
+        error_code = func(self._handle, *args)
+        if error_code != 0:
+            c_error_buffer = ct.create_string_buffer(consts.ERROR_BUFFER_SIZE)
+            comm._load_dll().LccGetErrorInfo(self._handle, c_error_buffer,
+                                             consts.ERROR_BUFFER_SIZE)
+            raise errs.HardwareError(c_error_buffer.value)
+
+    def hs_fpga_write_data_at_address(self, address, value):
+        c_address = ct.c_ubyte(address)
+        c_value = ct.c_ubyte(value)
+        self._call('HsFpgaWriteDataAtAddress', c_address, c_value)
+
+    def hs_fpga_read_data_at_address(self, address):
+        c_address = ct.c_ubyte(address)
+        c_value = ct.c_ubyte()
+        self._call('HsFpgaReadDataAtAddress', c_address, ct.byref(c_value))
+        return c_value.value
+
+def write_loop(controller, num_calls):
+    for i in xrange(num_calls):
+        controller.hs_fpga_write_data_at_address(ADDRESS, i & 0xFF)
+
+def read_loop(controller, num_calls):
+    for i in xrange(num_calls):
+        controller.hs_fpga_read_data_at_address(ADDRESS)
+
+def report(name, func, controller, num_calls = NUM_CALLS):
+    start = time.time()
+    func(controller, num_calls)
+    elapsed = time.time() - start
+    print "%-34s %10.0f calls/s" % (name, num_calls / elapsed)
+
+if __name__ == '__main__':
+    info = comm.list_controllers(consts.TYPE_HIGH_SPEED)[0]
+    for name, controller_class in [("getattr per call", ReferenceController),
+                                   ("prototyped table", comm.Controller)]:
+        with controller_class(info) as controller:
+            controller.hs_fpga_write_data_at_address(ADDRESS, 0x5A)
+            if controller.hs_fpga_read_data_at_address(ADDRESS) != 0x5A:
+                raise RuntimeError("Register did not read back")
+            report("write, " + name, write_loop, controller)
+            report("read, " + name, read_loop, controller)
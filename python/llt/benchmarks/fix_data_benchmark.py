@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (c) 2016, Linear Technology Corp.(LTC)
+    All rights reserved.
+
+    Redistribution and use in source and binary forms, with or without
+    modification, are permitted provided that the following conditions are met:
+
+    1. Redistributions of source code must retain the above copyright notice,
+       this list of conditions and the following disclaimer.
+    2. Redistributions in binary form must reproduce the above copyright
+       notice, this list of conditions and the following disclaimer in the
+       documentation and/or other materials provided with the distribution.
+
+    THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+    ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+    LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+    CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+    SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+    INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+    CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+    ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+    POSSIBILITY OF SUCH DAMAGE.
+
+    The views and conclusions contained in the software and documentation are
+    those of the authors and should not be interpreted as representing official
+    policies, either expressed or implied, of Linear Technology Corp.
+
+    Description:
+        Compares the numpy fix_data against the original per-sample loop,
+        checks that both give the same codes for every flag combination and
+        prints samples/sec for 16, 24 and 30 bit alignments.
+"""
+
+import time
+import numpy as np
+import llt.common.functions as funcs
+
+NUM_SAMPLES = 1024 * 1024
+
+def fix_data_loop(data, num_bits, alignment, is_bipolar, is_randomized = False,
+                  is_alternate_bit = False):
+    # the original pure python implementation, kept as the reference
+    shift = alignment - num_bits
+    sign_bit = (1 << (num_bits - 1))
+    offset = 1 << num_bits
+    mask = offset - 1
+
+    for i in xrange(len(data)):
+        x = data[i]
+        x = x >> shift
+        if is_randomized and  (x & 1):
+            x = x ^ 0x3FFFFFFE;
+        if is_alternate_bit:
+            x = x ^ 0x2AAAAAAA;
+        x = x & mask
+        if  is_bipolar and (x & sign_bit):
+            x = x - offset
+        data[i] = x
+    return data
+
+def make_raw_data(num_samples, alignment):
+    # what the controller hands back, 2 or 4 byte unsigned words
+    dtype = np.uint16 if alignment <= 16 else np.uint32
+    return np.random.randint(0, 1 << alignment, num_samples).astype(dtype)
+
+def check_equivalence():
+    raw = make_raw_data(4096, 30)
+    for num_bits, alignment in [(12, 16), (16, 16), (18, 24), (24, 24), (20, 30)]:
+        for is_bipolar in (False, True):
+            for is_randomized in (False, True):
+                for is_alternate_bit in (False, True):
+                    data = raw & ((1 << alignment) - 1)
+                    expected = fix_data_loop(data.tolist(), num_bits, alignment,
+                        is_bipolar, is_randomized, is_alternate_bit)
+                    actual = funcs.fix_data(data, num_bits, alignment,
+                        is_bipolar, is_randomized, is_alternate_bit)
+                    if actual.tolist() != expected:
+                        raise RuntimeError("Mismatch for %d bits aligned to %d" %
+                                           (num_bits, alignment))
+    print "fix_data matches the reference loop for all flag combinations"
+
+def time_it(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+def benchmark(num_samples = NUM_SAMPLES):
+    print "%10s %16s %16s %9s" % ("alignment", "loop samp/s", "numpy samp/s", "speedup")
+    for num_bits, alignment in [(16, 16), (24, 24), (30, 30)]:
+        raw = make_raw_data(num_samples, alignment)
+        loop_time = time_it(fix_data_loop, raw.tolist(), num_bits, alignment,
+                            True, True, True)
+        numpy_time = time_it(funcs.fix_data, raw, num_bits, alignment,
+                             True, True, True)
+        print "%10d %16.0f %16.0f %8.1fx" % (alignment, num_samples / loop_time,
+            num_samples / numpy_time, loop_time / numpy_time)
+
+if __name__ == '__main__':
+    check_equivalence()
+    benchmark()
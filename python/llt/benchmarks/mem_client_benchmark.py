@@ -0,0 +1,82 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+    Copyright (c) 2016, Linear Technology Corp.(LTC)
+    All rights reserved.
+
+    Redistribution and use in source and binary forms, with or without
+    modification, are permitted provided that the following conditions are met:
+
+    1. Redistributions of source code must retain the above copyright notice,
+       this list of conditions and the following disclaimer.
+    2. Redistributions in binary form must reproduce the above copyright
+       notice, this list of conditions and the following disclaimer in the
+       documentation and/or other materials provided with the distribution.
+
+    THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+    ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+    LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+    CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+    SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+    INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+    CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+    ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+    POSSIBILITY OF SUCH DAMAGE.
+
+    The views and conclusions contained in the software and documentation are
+    those of the authors and should not be interpreted as representing official
+    policies, either expressed or implied, of Linear Technology Corp.
+
+    Description:
+        Register ops/sec against a SoCkit running mem_func_daemon_2, using
+        "dummy" commands so the FPGA is not touched. Compares a connection
+        per command, a persistent connection and pipelined batches.
+
+        usage: mem_client_benchmark.py [host]
+
+        host "emulator" runs against a local SockitEmulator instead.
+"""
+
+import sys
+import time
+from llt.common.mem_func_client_2 import MemClient
+from llt.common.sockit_emulator import SockitEmulator
+
+HOST = sys.argv[1] if len(sys.argv) == 2 else '127.0.0.1'
+NUM_OPS = 2000
+BATCH_SIZE = 64
+ADDRESS = 0x40 # LED_BASE, never written in dummy mode anyway
+
+def one_at_a_time(client, num_ops):
+    for i in range(num_ops / 2):
+        client.reg_write(ADDRESS, i & 0xFF, dummy = True)
+        client.reg_read(ADDRESS, dummy = True)
+
+def pipelined(client, num_ops):
+    for i in range(0, num_ops, BATCH_SIZE):
+        with client.pipeline() as p:
+            for j in range(BATCH_SIZE / 2):
+                p.reg_write(ADDRESS, j & 0xFF, dummy = True)
+                p.reg_read(ADDRESS, dummy = True)
+
+def report(name, func, client, num_ops = NUM_OPS):
+    start = time.time()
+    func(client, num_ops)
+    elapsed = time.time() - start
+    print "%-28s %10.0f ops/s" % (name, num_ops / elapsed)
+
+def run(host, port = 1992):
+    print "Register ops against " + host
+    report("connection per command", one_at_a_time, MemClient(host = host, port = port))
+    with MemClient(host = host, port = port, persistent = True) as client:
+        report("persistent connection", one_at_a_time, client)
+        report("persistent, pipelined x%d" % BATCH_SIZE, pipelined, client)
+
+if __name__ == '__main__':
+    if HOST == 'emulator':
+        with SockitEmulator(port = 0) as emulator:
+            run(emulator.host, emulator.port)
+    else:
+        run(HOST)
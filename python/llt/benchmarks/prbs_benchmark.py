@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (c) 2016, Linear Technology Corp.(LTC)
+    All rights reserved.
+
+    Redistribution and use in source and binary forms, with or without
+    modification, are permitted provided that the following conditions are met:
+
+    1. Redistributions of source code must retain the above copyright notice,
+       this list of conditions and the following disclaimer.
+    2. Redistributions in binary form must reproduce the above copyright
+       notice, this list of conditions and the following disclaimer in the
+       documentation and/or other materials provided with the distribution.
+
+    THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+    ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+    LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+    CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+    SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+    INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+    CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+    ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+    POSSIBILITY OF SUCH DAMAGE.
+
+    The views and conclusions contained in the software and documentation are
+    those of the authors and should not be interpreted as representing official
+    policies, either expressed or implied, of Linear Technology Corp.
+
+    Description:
+        Compares the table driven PRBS checker against the original per-sample
+        pattern_checker loop on 1M synthetic LTC2123 test pattern samples with
+        injected bit errors, checks that both count the same errors and prints
+        samples/sec for checking, sequence generation and lane splitting.
+"""
+
+import time
+import numpy as np
+import llt.utils.prbs as prbs
+import llt.demo_board_examples.ltc21xx.ltc2123.ltc2123_functions as ltc2123
+
+NUM_SAMPLES = 1024 * 1024
+
+def next_pbrs_loop(data):
+    # the original per-sample implementation, kept as the reference
+    next_pbrs = ((data << 1) ^ (data << 2)) & 0b1111111111111100
+    next_pbrs |= (((next_pbrs >> 15) ^ (next_pbrs >> 14)) & 0x0001)    # find bit 0
+    next_pbrs |= (((next_pbrs >> 14) ^ (data << 1)) & 0x0002)    # find bit 1
+    return next_pbrs
+
+def pattern_checker_loop(data, num_samples):
+    errorcount = num_samples - 1
+    for i in xrange(num_samples - 1):
+        if data[i + 1] == next_pbrs_loop(data[i]):
+            errorcount -= 1
+    return errorcount
+
+def sequence_loop(seed, num_samples):
+    sequence = [seed]
+    for i in xrange(num_samples - 1):
+        sequence.append(next_pbrs_loop(sequence[-1]))
+    return sequence
+
+def split_loop(data, num_samples):
+    data_ch0 = [0] * (num_samples / 2)
+    data_ch1 = [0] * (num_samples / 2)
+    for i in xrange(num_samples / 4):
+        data_ch0[i * 2] = data[i * 4]
+        data_ch0[i * 2 + 1] = data[i * 4 + 1]
+        data_ch1[i * 2] = data[i * 4 + 2]
+        data_ch1[i * 2 + 1] = data[i * 4 + 3]
+    return data_ch0, data_ch1
+
+def make_pattern(num_samples, num_errors = 20):
+    # a clean pattern with single bit errors at random places
+    data = prbs.prbs_sequence(0x1234, num_samples)
+    positions = np.random.randint(1, num_samples, num_errors)
+    data[positions] ^= (1 << np.random.randint(0, 16, num_errors)).astype(np.uint16)
+    return data
+
+def check_equivalence():
+    if prbs.prbs_sequence(0x1234, 70000).tolist() != sequence_loop(0x1234, 70000):
+        raise RuntimeError("prbs_sequence doesn't match the reference loop")
+    data = make_pattern(100000)
+    if prbs.check_prbs(data).errors != pattern_checker_loop(data.tolist(), len(data)):
+        raise RuntimeError("check_prbs doesn't match the reference loop")
+    raw = np.random.randint(0, 0x10000, 4096).astype(np.uint16)
+    if [ch.tolist() for ch in ltc2123.split_channels(raw, 4096)] != list(split_loop(raw.tolist(), 4096)):
+        raise RuntimeError("split_channels doesn't match the reference loop")
+    print "check_prbs, prbs_sequence and split_channels match the reference loops"
+
+def time_it(func, *args):
+    start = time.time()
+    result = func(*args)
+    return time.time() - start, result
+
+def benchmark(num_samples = NUM_SAMPLES):
+    data = make_pattern(num_samples)
+    data_list = data.tolist()
+    print "%10s %16s %16s %9s" % ("", "loop samp/s", "numpy samp/s", "speedup")
+    rows = [
+        ("check", (pattern_checker_loop, data_list, num_samples), (prbs.check_prbs, data)),
+        ("generate", (sequence_loop, 0x1234, num_samples), (prbs.prbs_sequence, 0x1234, num_samples)),
+        ("split", (split_loop, data_list, num_samples), (ltc2123.split_channels, data, num_samples))]
+    for name, loop_call, numpy_call in rows:
+        loop_time, _ = time_it(*loop_call)
+        numpy_time, _ = time_it(*numpy_call)
+        print "%10s %16.0f %16.0f %8.1fx" % (name, num_samples / loop_time,
+            num_samples / numpy_time, loop_time / numpy_time)
+    _, result = time_it(prbs.check_prbs, data)
+    print result.summary()
+
+if __name__ == '__main__':
+    check_equivalence()
+    benchmark()
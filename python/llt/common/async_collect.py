@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (c) 2016, Linear Technology Corp.(LTC)
+    All rights reserved.
+
+    Redistribution and use in source and binary forms, with or without
+    modification, are permitted provided that the following conditions are met:
+
+    1. Redistributions of source code must retain the above copyright notice, 
+       this list of conditions and the following disclaimer.
+    2. Redistributions in binary form must reproduce the above copyright 
+       notice, this list of conditions and the following disclaimer in the 
+       documentation and/or other materials provided with the distribution.
+
+    THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE 
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE 
+    ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE 
+    LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+    CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF 
+    SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+    INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN 
+    CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+    ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
+    POSSIBILITY OF SUCH DAMAGE.
+
+    The views and conclusions contained in the software and documentation are 
+    those of the authors and should not be interpreted as representing official
+    policies, either expressed or implied, of Linear Technology Corp.
+
+    Description:
+        Background collects with back-off polling and cancellation, shared by
+        the DC890/DC1371/DC718 Demoboards (functions.collect_async) and the
+        SoCkit capture functions.
+"""
+
+import threading
+import time
+import llt.common.exceptions as err
+
+# the cancel event of the CollectFuture running in the current thread, if any
+_collect_state = threading.local()
+
+def poll_until(is_done, timeout, first_interval = 0.0005, max_interval = 0.1):
+    """Call is_done() until it returns True, sleeping first_interval at first
+    and twice as long each time after, up to max_interval. Short collects are
+    seen within a millisecond or so without hammering the hardware on long
+    ones. Returns False if timeout seconds pass first, raises
+    CollectCancelledError if the CollectFuture running it was cancelled.
+    """
+    cancel_event = getattr(_collect_state, 'cancel_event', None)
+    end_time = time.time() + timeout
+    interval = first_interval
+    while not is_done():
+        now = time.time()
+        if now >= end_time:
+            return False
+        if cancel_event is not None:
+            if cancel_event.wait(min(interval, end_time - now)):
+                raise err.CollectCancelledError('Collect cancelled')
+        else:
+            time.sleep(min(interval, end_time - now))
+        interval = min(interval * 2, max_interval)
+    return True
+
+class CollectFuture(object):
+    """The pending result of a collect running in a background thread.
+
+    Modelled on concurrent.futures.Future. cancel() asks the collect to stop,
+    the DC890/DC1371/DC718 collect is then cancelled with data_cancel_collect,
+    and result() raises CollectCancelledError. A collect that finished before
+    it noticed the cancel still returns its data. Callbacks added with
+    add_done_callback get the future and run in the collecting thread (or
+    right away if it is already done).
+    """
+    def __init__(self, func, *args, **kwargs):
+        self._cancel_event = threading.Event()
+        self._done_event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._result = None
+        self._exception = None
+        self._thread = threading.Thread(target = self._run, args = (func, args, kwargs))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, func, args, kwargs):
+        _collect_state.cancel_event = self._cancel_event
+        try:
+            self._result = func(*args, **kwargs)
+        except BaseException as e:
+            self._exception = e
+        finally:
+            _collect_state.cancel_event = None
+        with self._lock:
+            self._done_event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def cancel(self):
+        """Ask the collect to stop, returns False if it is already done."""
+        if self._done_event.is_set():
+            return False
+        self._cancel_event.set()
+        return True
+
+    def cancelled(self):
+        return isinstance(self._exception, err.CollectCancelledError)
+
+    def done(self):
+        return self._done_event.is_set()
+
+    def add_done_callback(self, callback):
+        with self._lock:
+            if not self._done_event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def exception(self, timeout = None):
+        if not self._done_event.wait(timeout):
+            raise err.HardwareError('Timed out waiting for the collect')
+        return self._exception
+
+    def result(self, timeout = None):
+        exception = self.exception(timeout)
+        if exception is not None:
+            raise exception
+        return self._result
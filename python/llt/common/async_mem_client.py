@@ -0,0 +1,322 @@
+#!/usr/bin/python
+# Event driven client for the SoCkit mem_func_daemon, speaks the same
+# cmd/length framing as mem_func_client_2.MemClient but over one persistent,
+# non-blocking connection per board. Any number of boards share one asyncore
+# loop, so no thread per board is needed:
+#
+#   boards = [AsyncMemClient(host) for host in hosts]
+#   requests = [b.mem_read_block_array(address, 4096) for b in boards]
+#   wait_all(requests)
+#   data = [r.result() for r in requests]
+#
+# Commands to one board are answered in order. Up to max_in_flight of them
+# are sent before the first answer comes back, the rest wait in a queue.
+# The daemon has to serve more than one command per connection.
+
+import asyncore
+import collections
+import errno
+import socket
+import struct
+import time
+import numpy as np
+
+from llt.common.mem_func_client_2 import MemClient, byte_view, \
+    check_address_range, check_for_error
+
+_WOULD_BLOCK = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR)
+# select timeout per socket map when wait_all polls more than one
+_MULTI_MAP_POLL = 0.002
+
+class MemRequest(object):
+    """A command sent (or queued) by an AsyncMemClient.
+
+    result() runs the client's event loop until the answer is in.
+    """
+    def __init__(self, client, message, buffer, parse):
+        self._client = client
+        self.message = message
+        self._parse = parse
+        self._buffer = buffer # flat uint8 array the response is received into
+        self._received = 0
+        self._done = False
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+
+    def done(self):
+        return self._done
+
+    def add_done_callback(self, callback):
+        if self._done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def result(self, timeout = None):
+        if not wait_all([self], timeout):
+            raise socket.timeout('no answer from %s within %s s' % 
+                                 (self._client.host, timeout))
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    # Buffer the next bytes of the response go into.
+    def _target(self):
+        return self._buffer[self._received:]
+
+    # Count received bytes, returns True once the response is complete.
+    def _advance(self, num_bytes):
+        self._received += num_bytes
+        if self._received < len(self._buffer):
+            return False
+        # the parser may ask for more, e.g. the body after a header
+        more = self._parse(self, self._buffer)
+        if more:
+            self._buffer = np.empty(more, dtype=np.uint8)
+            self._received = 0
+            return False
+        return True
+
+    def _finish(self, result = None, exception = None):
+        self._result = result
+        self._exception = exception
+        self._done = True
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+class AsyncMemClient(asyncore.dispatcher):
+    """Non-blocking MemClient. Every command returns a MemRequest."""
+    def __init__(self, host = 'localhost', port = 1992, max_in_flight = 16,
+                 socket_map = None):
+        asyncore.dispatcher.__init__(self, map = socket_map)
+        self.host = host
+        self.port = port
+        self.max_in_flight = max_in_flight
+        self.socket_map = asyncore.socket_map if socket_map is None else socket_map
+        self._waiting = collections.deque()
+        self._in_flight = collections.deque()
+        self._out = collections.deque()
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connect((host, port))
+
+    # support "with" semantics
+    def __enter__(self):
+        return self
+
+    # support "with" semantics
+    def __exit__(self, vtype, value, traceback):
+        self.close()
+
+    def close(self):
+        asyncore.dispatcher.close(self)
+        self._fail_all(EOFError('connection to %s closed' % self.host))
+
+    def _fail_all(self, exception):
+        requests = list(self._in_flight) + list(self._waiting)
+        self._in_flight.clear()
+        self._waiting.clear()
+        self._out.clear()
+        for request in requests:
+            request._finish(exception = exception)
+
+    def _submit(self, request):
+        if not self.connected and not self.connecting:
+            request._finish(exception = EOFError('not connected to %s' % self.host))
+        elif len(self._in_flight) < self.max_in_flight:
+            self._in_flight.append(request)
+            self._out.append(request.message)
+        else:
+            self._waiting.append(request)
+        return request
+
+    def _request(self, message, response_length, parse):
+        buffer = np.empty(response_length, dtype=np.uint8)
+        return self._submit(MemRequest(self, message, buffer, parse))
+
+    # asyncore callbacks
+    def writable(self):
+        return self.connecting or len(self._out) > 0
+
+    def handle_connect(self):
+        pass
+
+    def handle_write(self):
+        # everything queued goes out in one send
+        data = b''.join(self._out)
+        self._out.clear()
+        try:
+            sent = self.socket.send(data)
+        except socket.error as e:
+            if e.args[0] not in _WOULD_BLOCK:
+                raise
+            sent = 0
+        if sent < len(data):
+            self._out.append(data[sent:])
+
+    def handle_read(self):
+        if not self._in_flight:
+            # nothing was asked for, drop it so the socket stops being readable
+            try:
+                received = self.socket.recv(4096)
+            except socket.error as e:
+                if e.args[0] in _WOULD_BLOCK:
+                    return
+                raise
+            if not received:
+                self.handle_close()
+            return
+        while self._in_flight:
+            request = self._in_flight[0]
+            target = request._target()
+            try:
+                received = self.socket.recv_into(target, len(target))
+            except socket.error as e:
+                if e.args[0] in _WOULD_BLOCK:
+                    return
+                raise
+            if not received:
+                self.handle_close()
+                return
+            if request._advance(received):
+                self._in_flight.popleft()
+                if self._waiting:
+                    self._submit(self._waiting.popleft())
+            elif received < len(target):
+                return
+
+    def handle_close(self):
+        self.close()
+
+    def handle_error(self):
+        exception = socket.error('connection to %s failed' % self.host)
+        asyncore.dispatcher.close(self)
+        self._fail_all(exception)
+
+    # commands, same arguments as MemClient
+
+    def _word_command(self, cmd_id, dummy, *args):
+        command = cmd_id | MemClient.COMMAND_SENT
+        if (dummy == True):
+            command = command | MemClient.DUMMY_FUNC
+        return command, struct.pack('II' + 'I' * len(args), command, 8 + 4 * len(args), *args)
+
+    def _word_request(self, cmd_id, dummy, *args):
+        command, message = self._word_command(cmd_id, dummy, *args)
+        def parse(request, response):
+            (response_command, response_length, value) = struct.unpack('III', response.tobytes())
+            check_for_error(response_command)
+            request._finish(value)
+        return self._request(message, 12, parse)
+
+    def reg_read(self, address, dummy = False):
+        check_address_range(address)
+        return self._word_request(MemClient.REG_READ, dummy, address)
+
+    def reg_write(self, address, value, dummy = False):
+        check_address_range(address)
+        return self._word_request(MemClient.REG_WRITE, dummy, address, value)
+
+    def mem_read(self, address, dummy = False):
+        check_address_range(address)
+        return self._word_request(MemClient.MEM_READ, dummy, address)
+
+    def mem_write(self, address, value, dummy = False):
+        check_address_range(address)
+        return self._word_request(MemClient.MEM_WRITE, dummy, address, value)
+
+    # The words are received straight into buffer (or a new array), the
+    # result is a uint32 (or int32) view of it.
+    def _read_block_array(self, cmd_id, address, size, buffer, signed, dummy):
+        check_address_range(address)
+        command, message = self._word_command(cmd_id, dummy, address, size)
+        def parse(request, response):
+            request._finish(response.view(np.int32 if signed else np.uint32))
+        request = MemRequest(self, message, byte_view(buffer, size * 4), parse)
+        if size == 0:
+            parse(request, request._buffer)
+            return request
+        return self._submit(request)
+
+    def reg_read_block_array(self, address, size, buffer = None, signed = False, dummy = False):
+        return self._read_block_array(MemClient.REG_READ_BLOCK, address, size,
+                                      buffer, signed, dummy)
+
+    def mem_read_block_array(self, address, capture_size, buffer = None, signed = False, dummy = False):
+        return self._read_block_array(MemClient.MEM_READ_BLOCK, address, capture_size,
+                                      buffer, signed, dummy)
+
+    def _write_block(self, cmd_id, address, size, values, dummy):
+        check_address_range(address)
+        command = cmd_id | MemClient.COMMAND_SENT
+        if (dummy == True):
+            command = command | MemClient.DUMMY_FUNC
+        if isinstance(values, bytes):
+            payload = values
+        else:
+            payload = np.asarray(values, dtype='<u4').tobytes()
+        message = struct.pack('IIII', command, 16 + size * 4, address, size) + payload
+        def parse(request, response):
+            (response_command, response_length, last_location) = struct.unpack('III', response.tobytes())
+            check_for_error(response_command)
+            request._finish(last_location)
+        return self._request(message, 12, parse)
+
+    def reg_write_block(self, address, size, reg_values, dummy = False):
+        return self._write_block(MemClient.REG_WRITE_BLOCK, address, size, reg_values, dummy)
+
+    def mem_write_block(self, address, size, mem_values, dummy = False):
+        return self._write_block(MemClient.MEM_WRITE_BLOCK, address, size, mem_values, dummy)
+
+    def reg_write_LUT(self, address, size, data_array, dummy = False):
+        return self._write_block(MemClient.REG_WRITE_LUT, address, size, data_array, dummy)
+
+    def send_dc590(self, i2c_output_base_reg, i2c_input_base_reg, DC590_command, dummy = False):
+        command = MemClient.DC590_TPP_COMMANDS | MemClient.COMMAND_SENT
+        if (dummy == True):
+            command = command | MemClient.DUMMY_FUNC
+        message = struct.pack('IIII', command, 16 + len(DC590_command),
+                              i2c_output_base_reg, i2c_input_base_reg) + str(DC590_command)
+        is_header = [True]
+        def parse(request, response):
+            if is_header[0]:
+                # the string follows the header
+                (response_command, response_length) = struct.unpack('II', response.tobytes())
+                is_header[0] = False
+                if response_length:
+                    return response_length
+                request._finish('')
+            else:
+                request._finish(response.tobytes())
+        return self._request(message, 8, parse)
+
+def wait_all(requests, timeout = None):
+    """Run the event loop(s) of requests until all are done. Returns False
+    if timeout seconds passed first."""
+    end_time = None if timeout is None else time.time() + timeout
+    remaining = [0]
+    def count_down(request):
+        remaining[0] -= 1
+    socket_maps = []
+    for request in requests:
+        if not request.done():
+            remaining[0] += 1
+            request.add_done_callback(count_down)
+            if all(request._client.socket_map is not m for m in socket_maps):
+                socket_maps.append(request._client.socket_map)
+    while remaining[0] > 0:
+        poll_timeout = 0.1
+        if end_time is not None:
+            poll_timeout = end_time - time.time()
+            if poll_timeout <= 0:
+                return False
+            poll_timeout = min(poll_timeout, 0.1)
+        for socket_map in socket_maps:
+            if not socket_map:
+                continue
+            if len(socket_maps) > 1:
+                poll_timeout = min(poll_timeout, _MULTI_MAP_POLL)
+            asyncore.loop(timeout = poll_timeout, map = socket_map, count = 1)
+    return True
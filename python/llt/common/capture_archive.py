@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (c) 2016, Linear Technology Corp.(LTC)
+    All rights reserved.
+
+    Redistribution and use in source and binary forms, with or without
+    modification, are permitted provided that the following conditions are met:
+
+    1. Redistributions of source code must retain the above copyright notice, 
+       this list of conditions and the following disclaimer.
+    2. Redistributions in binary form must reproduce the above copyright 
+       notice, this list of conditions and the following disclaimer in the 
+       documentation and/or other materials provided with the distribution.
+
+    THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE 
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE 
+    ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE 
+    LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+    CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF 
+    SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+    INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN 
+    CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+    ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
+    POSSIBILITY OF SUCH DAMAGE.
+
+    The views and conclusions contained in the software and documentation are 
+    those of the authors and should not be interpreted as representing official
+    policies, either expressed or implied, of Linear Technology Corp.
+
+
+    Description:
+        Archive of many captures for long term runs. Every capture is saved
+        as it comes in, so a crash loses at most the capture being written,
+        and any capture can be read back by index or time without loading
+        the others:
+
+            import llt.common.capture_archive as ca
+            with ca.CaptureArchive("longterm") as archive:
+                for data in funcs.collect_loop(board, None, 32 * 1024, trigger):
+                    archive.append(data, board = board, temperature = t)
+            archive = ca.CaptureArchive("longterm")
+            first_hour = archive.between(archive.start_time(), 
+                                         archive.start_time() + 3600)
+            for record, (mean, std) in archive.apply(ca.noise_stats, first_hour):
+                print record['timestamp'], mean, std
+
+        The archive is a directory with one compressed .npz file per capture
+        and index.jsonl, one JSON line per capture with the metadata (see
+        capture_file.make_header), the file name and the sample count.
+"""
+
+import bisect
+import json
+import os
+import numpy as np
+from llt.common.capture_file import make_header
+
+INDEX_FILE_NAME = 'index.jsonl'
+
+def noise_stats(data):
+    """Return (mean, standard deviation) of a channel."""
+    return np.mean(data), np.std(data)
+
+class CaptureArchive(object):
+    """A directory of captures, opened for reading and appending."""
+    def __init__(self, path):
+        self.path = path
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.records = []
+        self._times = []
+        index_path = os.path.join(path, INDEX_FILE_NAME)
+        if os.path.exists(index_path):
+            valid_length = 0
+            with open(index_path, 'rb') as index_file:
+                for line in index_file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    if not line.endswith('\n'):
+                        break
+                    valid_length += len(line)
+                    self.records.append(record)
+                    self._times.append(record['timestamp'])
+            if valid_length < os.path.getsize(index_path):
+                # a line cut short by a crash, that capture is lost
+                with open(index_path, 'r+b') as index_file:
+                    index_file.truncate(valid_length)
+        self._index_file = None
+
+    # support "with" semantics
+    def __enter__(self):
+        return self
+
+    # support "with" semantics
+    def __exit__(self, vtype, value, traceback):
+        self.close()
+
+    def close(self):
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        return self.read(index)
+
+    def append(self, channels, board = None, **metadata):
+        """Add a capture (what collect returned: one channel or a tuple of
+        channels) and return its index. metadata (JSON-able) is stored with
+        it, keys missing from it are filled in from board."""
+        if isinstance(channels, tuple):
+            channels = list(channels)
+        else:
+            channels = [channels]
+        record = make_header(board, **metadata)
+        if self._times and record['timestamp'] < self._times[-1]:
+            raise ValueError("captures must be appended in time order")
+        index = len(self.records)
+        file_name = 'capture_%06d.npz' % index
+        temp_path = os.path.join(self.path, file_name + '.tmp')
+        with open(temp_path, 'wb') as f:
+            np.savez_compressed(f, *[np.asarray(channel) for channel in channels])
+        capture_path = os.path.join(self.path, file_name)
+        if os.path.exists(capture_path):
+            # left by a crash before its index line was written, os.rename
+            # will not replace an existing file on Windows
+            os.remove(capture_path)
+        os.rename(temp_path, capture_path)
+        record['index'] = index
+        record['file'] = file_name
+        record['num_channels'] = len(channels)
+        record['num_samples'] = len(channels[0])
+        if self._index_file is None:
+            self._index_file = open(os.path.join(self.path, INDEX_FILE_NAME), 'a')
+        self._index_file.write(json.dumps(record, sort_keys = True) + '\n')
+        self._index_file.flush()
+        os.fsync(self._index_file.fileno())
+        self.records.append(record)
+        self._times.append(record['timestamp'])
+        return index
+
+    def read(self, index):
+        """Return the channels of capture index as a tuple of arrays."""
+        record = self.records[index]
+        with np.load(os.path.join(self.path, record['file'])) as npz:
+            return tuple(npz['arr_%d' % i] for i in range(record['num_channels']))
+
+    def start_time(self):
+        return self._times[0] if self._times else None
+
+    def index_at_time(self, timestamp):
+        """Return the index of the last capture taken at or before timestamp."""
+        index = bisect.bisect_right(self._times, timestamp) - 1
+        if index < 0:
+            raise IndexError("no capture at or before %s" % timestamp)
+        return index
+
+    def between(self, start_time, end_time):
+        """Return the indices of the captures with start_time <= timestamp < end_time."""
+        return range(bisect.bisect_left(self._times, start_time),
+                     bisect.bisect_left(self._times, end_time))
+
+    def apply(self, func, indices = None, channel = 0):
+        """Yield (record, func(data)) for channel of each capture in indices
+        (default all), reading one capture at a time."""
+        if indices is None:
+            indices = range(len(self.records))
+        for index in indices:
+            yield self.records[index], func(self.read(index)[channel])
+
+    def sin_params(self, indices = None, channel = 0, **sin_params_kw):
+        """Yield (record, sin_params result) for each capture, see apply."""
+        from llt.utils.sin_params import sin_params
+        return self.apply(lambda data: sin_params(data, **sin_params_kw), indices, channel)
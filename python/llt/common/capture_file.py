@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (c) 2016, Linear Technology Corp.(LTC)
+    All rights reserved.
+
+    Redistribution and use in source and binary forms, with or without
+    modification, are permitted provided that the following conditions are met:
+
+    1. Redistributions of source code must retain the above copyright notice, 
+       this list of conditions and the following disclaimer.
+    2. Redistributions in binary form must reproduce the above copyright 
+       notice, this list of conditions and the following disclaimer in the 
+       documentation and/or other materials provided with the distribution.
+
+    THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE 
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE 
+    ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE 
+    LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+    CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF 
+    SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+    INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN 
+    CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+    ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
+    POSSIBILITY OF SUCH DAMAGE.
+
+    The views and conclusions contained in the software and documentation are 
+    those of the authors and should not be interpreted as representing official
+    policies, either expressed or implied, of Linear Technology Corp.
+
+
+    Description:
+        Binary capture files. The samples are stored raw, one channel after
+        the other, behind a small JSON header describing the capture, so a
+        multi-million sample capture is written with a single write and read
+        back as views of a memory map:
+
+            import llt.common.capture_file as cf
+            cf.write_capture("data.ltc", channels, board = controller,
+                             sample_rate = 125e6)
+            capture = cf.read_capture("data.ltc")
+            print capture.num_bits, capture.serial_number
+            ch0 = capture.channels[0]
+
+        File layout: 8 byte magic, 4 byte little endian header length, JSON
+        header, padding to 16 bytes, then num_channels * num_samples little
+        endian samples of the header's dtype. The text format written by
+        functions.write_channels_to_file_32_bit (one sample per line, one
+        channel after the other) is still there for other tools.
+"""
+
+import json
+import struct
+import time
+import numpy as np
+
+MAGIC = b'LTCCAPT1'
+
+# describe the capture, None if not known
+HEADER_KEYS = ['num_bits', 'alignment', 'is_bipolar', 'sample_rate',
+               'serial_number', 'timestamp']
+
+class Capture(object):
+    """A capture read by read_capture. data is a (num_channels, num_samples)
+    array, channels a tuple of its rows, the header keys are attributes."""
+    def __init__(self, header, data):
+        self.header = header
+        self.data = data
+        self.channels = tuple(data)
+        self.num_channels, self.num_samples = data.shape
+        for key in HEADER_KEYS:
+            setattr(self, key, header.get(key))
+
+def _as_channels(channels):
+    # a single channel (list or 1-D array) or a sequence of equal length ones
+    data = np.asarray(channels)
+    if data.ndim == 1:
+        data = data.reshape(1, -1)
+    if data.ndim != 2:
+        raise ValueError("channels must be one channel or a list of equal length channels")
+    return data
+
+def _sample_dtype(data, packed):
+    # int32 (or 16 bits if packed and they fit) for integer samples, or the
+    # samples' own type if that would lose anything
+    if data.dtype.kind not in 'biuf':
+        raise TypeError("can't store samples of type " + str(data.dtype))
+    if data.dtype.kind == 'f':
+        return data.dtype.newbyteorder('<').str
+    if data.size == 0:
+        return '<i2' if packed else '<i4'
+    low, high = data.min(), data.max()
+    if packed and low >= -0x8000 and high <= 0x7FFF:
+        return '<i2'
+    if packed and low >= 0 and high <= 0xFFFF:
+        return '<u2'
+    if low >= -0x80000000 and high <= 0x7FFFFFFF:
+        return '<i4'
+    if low >= 0 and high <= 0xFFFFFFFF:
+        return '<u4'
+    return data.dtype.newbyteorder('<').str
+
+def make_header(board = None, **header):
+    """Return a header dict, the keys not given are taken from board (a
+    Demoboard) if there is one. timestamp defaults to now."""
+    full_header = dict((key, None) for key in HEADER_KEYS)
+    if board is not None:
+        for key in ['num_bits', 'alignment', 'is_bipolar']:
+            full_header[key] = getattr(board, key, None)
+        try:
+            full_header['serial_number'] = board.controller.get_serial_number()
+        except AttributeError:
+            pass
+    full_header['timestamp'] = time.time()
+    full_header.update((key, value) for key, value in header.items() if value is not None)
+    return full_header
+
+def write_capture(filename, channels, board = None, packed = False, **header):
+    """Write channels (one channel or a list of them) to a capture file.
+
+    header holds any of HEADER_KEYS (and other JSON-able items), missing keys
+    are filled in from board. Integer samples are stored as int32, or with
+    packed = True as 16 bits if they fit. Integers that don't fit in int32
+    are stored as uint32 or their own type, floats keep their own type.
+    """
+    data = _as_channels(channels)
+    dtype = _sample_dtype(data, packed)
+    full_header = make_header(board, **header)
+    full_header['dtype'] = dtype
+    full_header['num_channels'], full_header['num_samples'] = data.shape
+    header_bytes = json.dumps(full_header, sort_keys = True).encode('utf-8')
+    with open(filename, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b'\0' * (_data_offset(len(header_bytes)) - len(MAGIC) - 4 - len(header_bytes)))
+        np.ascontiguousarray(data, dtype = dtype).tofile(f)
+
+def read_header(filename):
+    """Return the header dict of a capture file."""
+    return _read_header(filename)[0]
+
+def read_capture(filename, mmap = True):
+    """Read a capture file, the samples are a read only memory map unless
+    mmap is False."""
+    header, data_offset = _read_header(filename)
+    shape = (header['num_channels'], header['num_samples'])
+    if mmap and shape[0] * shape[1] > 0:
+        data = np.memmap(filename, dtype = header['dtype'], mode = 'r',
+                         offset = data_offset, shape = shape)
+    else:
+        with open(filename, 'rb') as f:
+            f.seek(data_offset)
+            data = np.fromfile(f, dtype = header['dtype'],
+                               count = shape[0] * shape[1]).reshape(shape)
+    return Capture(header, data)
+
+def _read_header(filename):
+    with open(filename, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise IOError(filename + " is not a capture file")
+        header_length, = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    return header, _data_offset(header_length)
+
+def _data_offset(header_length):
+    return (len(MAGIC) + 4 + header_length + 15) // 16 * 16
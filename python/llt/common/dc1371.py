@@ -42,7 +42,6 @@
 
 # Import communication library
 
-import llt.common.ltc_controller_comm as comm
 import llt.common.functions as funcs
 from llt.common.constants import TYPE_DC1371
 from llt.common.constants import DC1371_EEPROM_SIZE
@@ -50,18 +49,24 @@ import llt.common.exceptions as errs
 
 class Demoboard():
     def __init__(self, dc_number, fpga_load, num_channels, num_bits, alignment, is_bipolar, 
-                 demo_config, spi_reg_values = [], verbose = False):
+                 demo_config, spi_reg_values = [], verbose = False, serial_number = None,
+                 keep_open = False):
         self.vprint = funcs.make_vprint(verbose)
+        self.keep_open = keep_open
         self.num_bits = num_bits
         self.alignment = alignment
         self.is_bipolar = is_bipolar
         self.num_channels = num_channels
         self.fpga_load = fpga_load
 
-        controller_info = funcs.get_controller_info_by_eeprom(TYPE_DC1371,
-            dc_number, DC1371_EEPROM_SIZE, self.vprint)
-        self.controller = comm.Controller(controller_info)
-        self._init_controller(demo_config, spi_reg_values)
+        self.controller = funcs.get_controller_by_eeprom(TYPE_DC1371,
+            dc_number, DC1371_EEPROM_SIZE, self.vprint, serial_number,
+            owner = self)
+        try:
+            self._init_controller(demo_config, spi_reg_values)
+        except:
+            funcs.forget_controller(self.controller)
+            raise
 
     # support "with" semantics
     def __enter__(self):
@@ -72,7 +77,12 @@ class Demoboard():
         del vtype
         del value
         del traceback
-        self.controller.cleanup()
+        if self.keep_open:
+            # The controller stays open in the registry for the next Demoboard
+            # on this board, funcs.cleanup_controllers() closes it at exit
+            funcs.release_controller(self.controller)
+        else:
+            funcs.forget_controller(self.controller)
         
     def collect(self, num_samples, trigger, timeout = 5, is_randomized = False, 
                 is_alternate_bit = False,):
@@ -81,7 +91,7 @@ class Demoboard():
         self.vprint('Data collect done.')
         self.vprint('Reading data')
         
-        num_bytes, raw_data = self.controller.data_receive_uint16_values(end=num_samples)
+        num_bytes, raw_data = self.controller.data_receive_uint16_values_into(end=num_samples)
         if num_bytes != num_samples * 2:
             raise errs.HardwareError("Didn't get all bytes")
         self.vprint('Data read done')
@@ -96,11 +106,12 @@ class Demoboard():
         # demo-board specific information needed by the DC1371
         self.controller.dc1371_set_demo_config(demo_config)
 
-    def set_spi_registers(self, register_values):
+    def set_spi_registers(self, register_values, skip_unchanged = False):
+        # skip_unchanged only sends registers the controller has not already
+        # set to their value, see Controller.spi_send_register_table
         if register_values != []:
             self.vprint('Updating SPI registers')
-            for x in range(0,len(register_values), 2):
-                self.controller.spi_send_byte_at_address(register_values[x], register_values[x+1])
+            self.controller.spi_send_register_table(register_values, skip_unchanged)
         # The DC1371 needs to check for FPGA load after a change in the SPI registers
         if not self.controller.fpga_get_is_loaded(self.fpga_load):
             self.vprint('Loading FPGA')
@@ -116,15 +127,13 @@ class Demoboard2ChipSelects(Demoboard):
         A DC90XX demo board with 2 chip selects
     """
 
-    def set_spi_registers(self, register_values):
+    def set_spi_registers(self, register_values, skip_unchanged = False):
         if register_values != []:
             self.vprint('Updating SPI registers')
             self.controller.dc1371_spi_choose_chip_select(1) # First bank of 4 channels
-            for x in range(0,len(register_values), 2):
-                self.controller.spi_send_byte_at_address(register_values[x], register_values[x+1])
+            self.controller.spi_send_register_table(register_values, skip_unchanged)
             self.controller.dc1371_spi_choose_chip_select(2) # Second bank of 4 channels
-            for x in range(0,len(register_values), 2):
-                self.controller.spi_send_byte_at_address(register_values[x], register_values[x+1])
+            self.controller.spi_send_register_table(register_values, skip_unchanged)
         # The DC1371 needs to check for FPGA load after a change in the SPI registers
         if not self.controller.fpga_get_is_loaded(self.fpga_load):
             self.vprint('Loading FPGA')
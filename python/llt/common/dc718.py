@@ -41,7 +41,6 @@
 
 # Import communication library
 
-import llt.common.ltc_controller_comm as comm
 import llt.common.functions as funcs
 from llt.common.constants import TYPE_DC718
 from llt.common.constants import DC718_EEPROM_SIZE
@@ -49,8 +48,10 @@ import llt.common.exceptions as errs
 
 class Demoboard():
     def __init__(self, dc_number, is_positive_clock, 
-            num_bits, alignment, is_bipolar, verbose = False):
+            num_bits, alignment, is_bipolar, verbose = False, serial_number = None,
+            keep_open = False):
         self.vprint = funcs.make_vprint(verbose)
+        self.keep_open = keep_open
         self.num_bits = num_bits
         self.alignment = alignment
         self.is_bipolar = is_bipolar
@@ -59,10 +60,14 @@ class Demoboard():
             self.bytes_per_sample = 3
         else:
             self.bytes_per_sample = 2
-        controller_info = funcs.get_controller_info_by_eeprom(TYPE_DC718,
-            dc_number, DC718_EEPROM_SIZE, self.vprint)
-        self.controller = comm.Controller(controller_info)
-        self.init_controller(self.bytes_per_sample, is_positive_clock)
+        self.controller = funcs.get_controller_by_eeprom(TYPE_DC718,
+            dc_number, DC718_EEPROM_SIZE, self.vprint, serial_number,
+            owner = self)
+        try:
+            self.init_controller(self.bytes_per_sample, is_positive_clock)
+        except:
+            funcs.forget_controller(self.controller)
+            raise
 
     # support "with" semantics
     def __enter__(self):
@@ -73,7 +78,12 @@ class Demoboard():
         del vtype
         del value
         del traceback
-        self.controller.cleanup()
+        if self.keep_open:
+            # The controller stays open in the registry for the next Demoboard
+            # on this board, funcs.cleanup_controllers() closes it at exit
+            funcs.release_controller(self.controller)
+        else:
+            funcs.forget_controller(self.controller)
         
     def collect(self, num_samples, trigger, timeout = 5, is_randomized = False, 
                 is_alternate_bit = False,):
@@ -81,7 +91,7 @@ class Demoboard():
         self.vprint('Data collect done.')
         self.vprint('Reading data')
         if self.bytes_per_sample == 2:
-            num_bytes, raw_data = self.controller.data_receive_uint16_values(end=num_samples)
+            num_bytes, raw_data = self.controller.data_receive_uint16_values_into(end=num_samples)
             if num_bytes != num_samples * 2:
                 raise errs.HardwareError("Didn't get all bytes")
         else:
@@ -98,16 +108,10 @@ class Demoboard():
         self.controller.data_set_characteristics(False, bytes_per_sample, is_positive_clock)
 
     def read_3_byte_values(self, num_samples):
-        num_bytes, raw_data = self.controller.data_receive_bytes(end=num_samples * 3)
+        num_bytes, raw_data = self.controller.data_receive_bytes_into(end=num_samples * 3)
         if num_bytes != num_samples * 3:
                 raise errs.HardwareError("Didn't get all bytes")
-        data = []
-        for i in range(num_samples):
-            d = raw_data[3*i] << 16
-            d |= raw_data[3*i+1] << 8
-            d |= raw_data[3*i+2]
-            data.append(d)
-        return data
+        return funcs.unpack_24_bit(raw_data, high_byte_first = True)
         
     def get_num_bits(self):
         return self.num_bits
\ No newline at end of file
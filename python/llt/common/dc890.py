@@ -42,7 +42,6 @@
 
 # Import communication library
 
-import llt.common.ltc_controller_comm as comm
 import llt.common.functions as funcs
 from llt.common.constants import TYPE_DC890
 from llt.common.constants import DC890_EEPROM_SIZE
@@ -50,8 +49,10 @@ import llt.common.exceptions as errs
 
 class Demoboard():
     def __init__(self, dc_number, fpga_load, num_channels, is_positive_clock, 
-                 num_bits, alignment, is_bipolar, spi_reg_values = [], verbose = False):
+                 num_bits, alignment, is_bipolar, spi_reg_values = [], verbose = False,
+                 serial_number = None, keep_open = False):
         self.vprint = funcs.make_vprint(verbose)
+        self.keep_open = keep_open
         self.num_bits = num_bits
         self.alignment = alignment
         self.is_bipolar = is_bipolar
@@ -60,12 +61,16 @@ class Demoboard():
             self.bytes_per_sample = 4
         else:
             self.bytes_per_sample = 2
-        controller_info = funcs.get_controller_info_by_eeprom(TYPE_DC890,
-            dc_number, DC890_EEPROM_SIZE, self.vprint)
-        self.controller = comm.Controller(controller_info)
+        self.controller = funcs.get_controller_by_eeprom(TYPE_DC890,
+            dc_number, DC890_EEPROM_SIZE, self.vprint, serial_number,
+            owner = self)
         is_multichannel = num_channels > 1
-        self.init_controller(fpga_load, is_multichannel, is_positive_clock)
-        self.set_spi_registers(spi_reg_values)
+        try:
+            self.init_controller(fpga_load, is_multichannel, is_positive_clock)
+            self.set_spi_registers(spi_reg_values)
+        except:
+            funcs.forget_controller(self.controller)
+            raise
 
     # support "with" semantics
     def __enter__(self):
@@ -76,7 +81,12 @@ class Demoboard():
         del vtype
         del value
         del traceback
-        self.controller.cleanup()
+        if self.keep_open:
+            # The controller stays open in the registry for the next Demoboard
+            # on this board, funcs.cleanup_controllers() closes it at exit
+            funcs.release_controller(self.controller)
+        else:
+            funcs.forget_controller(self.controller)
 
     def fix_data(self, raw_data, is_randomized, is_alternate_bit):
         return funcs.fix_data(raw_data, self.num_bits, self.alignment, 
@@ -91,11 +101,11 @@ class Demoboard():
         self.controller.dc890_flush()
         self.vprint('Reading data')
         if self.bytes_per_sample == 2:
-            num_bytes, raw_data = self.controller.data_receive_uint16_values(end=num_samples)
+            num_bytes, raw_data = self.controller.data_receive_uint16_values_into(end=num_samples)
             if num_bytes != num_samples * 2:
                 raise errs.HardwareError("Didn't get all bytes")
         else:
-            num_bytes, raw_data = self.controller.data_receive_uint32_values(end=num_samples)
+            num_bytes, raw_data = self.controller.data_receive_uint32_values_into(end=num_samples)
             if num_bytes != num_samples * 4:
                 raise errs.HardwareError("Didn't get all bytes")
         self.vprint('Data read done')
@@ -112,12 +122,13 @@ class Demoboard():
         self.controller.data_set_high_byte_first()
         self.controller.data_set_characteristics(is_multichannel, self.bytes_per_sample, is_positive_clock)
  
-    def set_spi_registers(self, register_values):
+    def set_spi_registers(self, register_values, skip_unchanged = False):
+        # skip_unchanged only sends registers the controller has not already
+        # set to their value, see Controller.spi_send_register_table
         if register_values != []:
             self.controller.dc890_gpio_set_byte(0xf0)
             self.controller.dc890_gpio_spi_set_bits(3,0,1)
-            for x in range(0,len(register_values), 2):
-                self.controller.spi_send_byte_at_address(register_values[x], register_values[x+1])
+            self.controller.spi_send_register_table(register_values, skip_unchanged)
             self.controller.dc890_gpio_set_byte(0xff)
             
     def get_num_bits(self):
@@ -21,4 +21,11 @@ class LogicError(Exception):
     Raised when a programming error in the python wrapper or dll itself is
     detected. Contact your FAE or FSE to get it resolved.
     """
-    pass
\ No newline at end of file
+    pass
+
+
+class CollectCancelledError(Exception):
+    """
+    Raised by a collect that was cancelled through CollectFuture.cancel()
+    """
+    pass
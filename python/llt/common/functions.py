@@ -36,8 +36,12 @@
 """
 import llt.common.exceptions as err
 import llt.common.ltc_controller_comm as comm
-import math
+from llt.common.async_collect import poll_until, CollectFuture
+import atexit
+import threading
+import weakref
 import time
+import numpy as np
 
 def make_vprint(verbose):
     if verbose:
@@ -48,30 +52,40 @@ def make_vprint(verbose):
                 pass
     return vprint
 
+# one sample per line, a chunk of samples is formatted with a single join
+def _write_lines(f, data, chunk_size = 1024 * 1024):
+    from llt.utils.save_for_pscope import sample_strings
+    if isinstance(data, np.ndarray):
+        data = data.reshape(-1)
+    for start in range(0, len(data), chunk_size):
+        f.write('\n'.join(sample_strings(data[start:start + chunk_size])))
+        f.write('\n')
+
 def write_to_file_32_bit(filename, data, verbose = False, append = False):
     vprint = make_vprint(verbose)
     vprint('Writing data to file')
     with open(filename, 'a' if append else 'w') as f:
-        for i in range(len(data)):
-            f.write(str(data[i]) + '\n')
+        _write_lines(f, data)
     vprint('File write done.')
 
 def write_channels_to_file_32_bit(filename, *channels, **verbose_kw):
+    """Write the channels one after the other, one sample per line. Use
+    capture_file.write_capture for a binary file that reloads instantly."""
     vprint = make_vprint(verbose_kw.get("verbose", False))
     vprint('Writing data to file')
     if len(channels) < 1:
         vprint('Nothing to write')
         return
-    write_to_file_32_bit(filename, channels[0])
-    for channel in channels[1:]:
-        write_to_file_32_bit(filename, channel, append=True)
+    with open(filename, 'w') as f:
+        for channel in channels:
+            _write_lines(f, channel)
     vprint('File write done.')
 
 def plot(num_bits, data, channel = 0, verbose = False):
     vprint = make_vprint(verbose)
             
     from matplotlib import pyplot as plt
-    import numpy as np
+    from llt.utils.sin_params import windowed_fft_db, BLACKMAN_HARRIS_92
     
     vprint("Plotting channel " + str(channel) + " time domain.") 
     
@@ -84,40 +98,9 @@ def plot(num_bits, data, channel = 0, verbose = False):
     
     vprint("FFT'ing channel " + str(channel) + " data.") 
 
-    adc_amplitude = 2.0**(num_bits-1)
-    
-    data_no_dc = data - np.average(data) # Remove DC to avoid leakage when windowing
-
-    normalization = 1.968888        
-    a0 = 0.35875
-    a1 = 0.48829
-    a2 = 0.14128
-    a3 = 0.01168
-    
-    wind = [0 for x in range(num_samples)]
-    for i in range(num_samples):
-        
-        t1 = i / (float(num_samples) - 1.0)
-        t2 = 2 * t1
-        t3 = 3 * t1
-        t1 -= int(t1)
-        t2 -= int(t2)
-        t3 -= int(t3)
-        
-        wind[i] = a0 - \
-                  a1*math.cos(2*math.pi*t1) + \
-                  a2*math.cos(2*math.pi*t2) - \
-                  a3*math.cos(2*math.pi*t3)
-        
-        wind[i] *= normalization;
-
-
-    windowed_data = data_no_dc * wind# Apply Blackman window
-    freq_domain = np.fft.fft(windowed_data)/(num_samples) # FFT
-    freq_domain = freq_domain[0:num_samples/2+1]
-    freq_domain_magnitude = np.abs(freq_domain) # Extract magnitude
-    freq_domain_magnitude[1:num_samples/2] *= 2 
-    freq_domain_magnitude_db = 20 * np.log10(freq_domain_magnitude/adc_amplitude)
+    # symmetric Blackman-Harris 92 window, cached between calls
+    freq_domain_magnitude_db = windowed_fft_db(data, num_bits,
+        BLACKMAN_HARRIS_92, symmetric=True)
     
     vprint("Plotting channel " + str(channel) + " frequency domain.")     
     
@@ -132,6 +115,12 @@ def plot_channels(num_bits, *channels, **verbose_kw):
         plot(num_bits, channel_data, channel_num, verbose)
     
 def fix_data(data, num_bits, alignment, is_bipolar, is_randomized = False, is_alternate_bit = False):
+    """Shift, de-randomize, mask and sign extend raw ADC codes.
+
+    Signed numpy integer arrays of 32 bits or more are fixed in place and
+    returned, anything else (lists, unsigned or narrow arrays) is copied into
+    a new int32 array first, so raw unsigned buffers are never modified.
+    """
     if alignment < num_bits:
         raise err.LogicError("Alignment must be >= num_bits ")
     if  alignment > 30:
@@ -140,50 +129,212 @@ def fix_data(data, num_bits, alignment, is_bipolar, is_randomized = False, is_al
     sign_bit = (1 << (num_bits - 1))
     offset = 1 << num_bits
     mask = offset - 1
-    
-    for i in xrange(len(data)):
-        x = data[i]
-        x = x >> shift
-        if is_randomized and  (x & 1):
-            x = x ^ 0x3FFFFFFE;
-        if is_alternate_bit:
-            x = x ^ 0x2AAAAAAA;
-        x = x & mask
-        if  is_bipolar and (x & sign_bit):
-            x = x - offset
-        data[i] = x 
-    return data
+
+    if (isinstance(data, np.ndarray) and data.dtype.kind == 'i' and 
+            data.dtype.itemsize >= 4):
+        x = data
+    else:
+        x = np.array(data, dtype=np.int32)
+
+    if shift:
+        x >>= shift
+    if is_randomized:
+        # codes with the LSB set have the upper bits XOR'ed with the LSB
+        randomized = x & 1
+        randomized *= 0x3FFFFFFE
+        x ^= randomized
+    if is_alternate_bit:
+        x ^= 0x2AAAAAAA
+    x &= mask
+    if is_bipolar:
+        # two's complement sign extension, (x ^ sign_bit) - sign_bit
+        x ^= sign_bit
+        x -= sign_bit
+    return x
+
+def unpack_24_bit(raw_bytes, high_byte_first = True):
+    """Turn packed 3 byte samples into an int32 array of unsigned 24 bit codes.
+
+    raw_bytes is a byte string or uint8 array, e.g. from
+    data_receive_bytes_into. The result goes straight into fix_data, which
+    then works on it in place.
+    """
+    raw = np.frombuffer(raw_bytes, dtype=np.uint8) if isinstance(raw_bytes, bytes) \
+          else np.asarray(raw_bytes, dtype=np.uint8).reshape(-1)
+    num_samples = len(raw) // 3
+    triplets = raw[:3 * num_samples].reshape(num_samples, 3)
+    # build little endian 32 bit words with a zero top byte
+    words = np.zeros((num_samples, 4), dtype=np.uint8)
+    if high_byte_first:
+        words[:, 2::-1] = triplets
+    else:
+        words[:, :3] = triplets
+    return words.view('<i4').reshape(num_samples).astype(np.int32, copy=False)
 
 def scatter_data(data, num_channels):
+    """Split interleaved data into a tuple of per-channel views."""
     if num_channels == 1:
         return data
-    temp = []
-    for x in range(0,num_channels):
-        temp.append(data[x::num_channels])
-    return tuple(temp)
+    data = np.asarray(data)
+    return tuple(data[x::num_channels] for x in range(0, num_channels))
 
 def get_controller_info_by_eeprom(controller_type, dc_number, eeprom_id_size, vprint):
-    # find demo board with correct ID
+    with _controller_registry_lock:
+        info, controller, eeprom_id = _find_controller_by_eeprom(controller_type, 
+            dc_number, eeprom_id_size, vprint)
+        controller.cleanup()
+        return info
+
+# Process-wide registry of opened controllers,
+# serial number -> [ControllerInfo, Controller, EEPROM ID, owner]
+# owner is a weak reference to the Demoboard holding the controller, None once
+# it is released. A controller whose owner was released or garbage collected
+# (never exited) is free and handed out again.
+_controller_registry = {}
+# scans open every controller that is not in the registry, so only one thread
+# may scan at a time
+_controller_registry_lock = threading.Lock()
+
+def get_controller_by_eeprom(controller_type, dc_number, eeprom_id_size, vprint, 
+                             serial_number = None, owner = None):
+    """Return an opened Controller for a demo board dc_number that no other
+    Demoboard holds.
+
+    owner is the Demoboard the controller is for, the controller is held
+    until it is released, forgotten or owner is garbage collected. Without an
+    owner it is held until released or forgotten.
+
+    A controller given back with release_controller is reused after reading
+    its EEPROM ID again, one that was unplugged or now has another demo board
+    on it is dropped. Otherwise the attached controllers that are not in the
+    registry are scanned by EEPROM like get_controller_info_by_eeprom.
+    serial_number picks the controller when several boards have the same
+    dc_number. Pass the controller to release_controller or forget_controller
+    when done with it.
+    """
+    with _controller_registry_lock:
+        return _get_controller_by_eeprom(controller_type, dc_number, 
+            eeprom_id_size, vprint, serial_number, 
+            (lambda: True) if owner is None else weakref.ref(owner))
+
+def _is_held(entry):
+    return entry[3] is not None and entry[3]() is not None
+
+def _get_controller_by_eeprom(controller_type, dc_number, eeprom_id_size, vprint, 
+                              serial_number, owner_ref):
+    for serial, entry in _controller_registry.items():
+        info, controller, eeprom_id = entry[:3]
+        if _is_held(entry) or not info.get_type() & controller_type or \
+                dc_number not in eeprom_id or \
+                serial_number not in (None, serial):
+            continue
+        try:
+            if controller._handle is None: # somebody called cleanup()
+                controller = entry[1] = comm.Controller(info)
+            eeprom_id = entry[2] = controller.eeprom_read_string(eeprom_id_size)
+        except err.HardwareError:
+            # stale handle, the controller was unplugged
+            del _controller_registry[serial]
+            controller.cleanup()
+            continue
+        if dc_number not in eeprom_id:
+            continue
+        entry[3] = owner_ref
+        vprint('Reusing the ' + dc_number + ' controller')
+        return controller
+    info, controller, eeprom_id = _find_controller_by_eeprom(controller_type, 
+        dc_number, eeprom_id_size, vprint, serial_number)
+    _controller_registry[info.get_serial_number()] = [info, controller, 
+                                                      eeprom_id, owner_ref]
+    return controller
+
+def _find_controller_by_eeprom(controller_type, dc_number, eeprom_id_size, vprint,
+                               serial_number = None):
+    # find demo board with correct ID, returns (info, opened controller, ID)
     vprint('Looking for a controller board')
     info_list = comm.list_controllers(controller_type)
     if info_list is None:
         raise(err.HardwareError('No controller boards found'))
-    for info in comm.list_controllers(controller_type):
-        with comm.Controller(info) as controller:
+    for info in info_list:
+        # the registry's controllers stay open and the devices open
+        # exclusively, so they are not opened again
+        if info.get_serial_number() in _controller_registry or \
+                serial_number not in (None, info.get_serial_number()):
+            continue
+        controller = comm.Controller(info)
+        try:
             eeprom_id = controller.eeprom_read_string(eeprom_id_size)
-            if dc_number in eeprom_id:
-                vprint('Found the ' + dc_number + ' demoboard')
-                return info
+        except:
+            controller.cleanup()
+            raise
+        if dc_number in eeprom_id:
+            vprint('Found the ' + dc_number + ' demoboard')
+            return info, controller, eeprom_id
+        controller.cleanup()
     raise(err.HardwareError('Could not find a compatible device'))
 
+def release_controller(controller):
+    """Keep controller open in the registry for the next Demoboard."""
+    with _controller_registry_lock:
+        for entry in _controller_registry.values():
+            if entry[1] is controller:
+                entry[3] = None
+
+def forget_controller(controller):
+    """Clean up controller and remove it from the registry."""
+    with _controller_registry_lock:
+        for serial, entry in _controller_registry.items():
+            if entry[1] is controller:
+                del _controller_registry[serial]
+    controller.cleanup()
+
+def cleanup_controllers():
+    """Clean up every controller in the registry, called at exit."""
+    with _controller_registry_lock:
+        for entry in _controller_registry.values():
+            entry[1].cleanup()
+        _controller_registry.clear()
+
+atexit.register(cleanup_controllers)
+
+def collect_loop(controller_board, num_collects, num_samples, trigger, delay = 0,
+                 **collect_kw):
+    """Yield num_collects captures from one already configured board.
+
+    Use this instead of constructing a Demoboard per capture, the controller
+    lookup, FPGA check and SPI setup then happen only once. num_collects = None
+    loops forever. delay is the time in seconds between captures, other
+    keyword arguments are passed on to collect.
+    """
+    i = 0
+    while num_collects is None or i < num_collects:
+        if i > 0 and delay > 0:
+            time.sleep(delay)
+        yield controller_board.collect(num_samples, trigger, **collect_kw)
+        i += 1
+
 def start_collect(controller_board, num_samples, trigger, timeout = 5):
-        controller_board.controller.data_start_collect(num_samples, trigger)
-        SLEEP_TIME = 0.2 
-        for i in range(int(math.ceil(timeout/SLEEP_TIME))):
-            if controller_board.controller.data_is_collect_done():
-                return
-            time.sleep(SLEEP_TIME)
-        raise err.HardwareError('Data collect timed out (missing clock?)')
+        controller = controller_board.controller
+        controller.data_start_collect(num_samples, trigger)
+        try:
+            is_done = poll_until(controller.data_is_collect_done, timeout)
+        except err.CollectCancelledError:
+            controller.data_cancel_collect()
+            raise
+        if not is_done:
+            raise err.HardwareError('Data collect timed out (missing clock?)')
+
+def collect_async(controller_board, num_samples, trigger, timeout = 5, **collect_kw):
+    """Start controller_board.collect in the background, return a CollectFuture.
+
+    Works for the dc890, dc1371 and dc718 Demoboards. Use one board per
+    future, several boards can collect at the same time.
+    """
+    return CollectFuture(controller_board.collect, num_samples, trigger, 
+                         timeout, **collect_kw)
 
 def uint32_to_int32(data): 
-    return [(int(d - 4294967296 if d > 2147483647 else d)) for d in data] 
\ No newline at end of file
+    """Reinterpret 32 bit words as two's complement int32, a view of data
+    if it already is a 32 bit numpy array."""
+    from llt.utils.sockit_conversions import uint32_to_int32
+    return uint32_to_int32(data)
\ No newline at end of file
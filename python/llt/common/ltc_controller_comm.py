@@ -40,8 +40,7 @@ import os
 import sys
 import llt.common.constants as consts
 import llt.common.exceptions as errs
-if os.name != 'posix':
-    import _winreg
+from llt.common.register_shadow import RegisterShadow
 
 # non-public method to map a type string to the appropriate c_types type
 def _ctype_from_string(type_string):
@@ -54,6 +53,17 @@ def _ctype_from_string(type_string):
     else:
         raise errs.ValueError("Invalid type string")
 
+# non-public method to map a type string to the matching numpy dtype name
+def _numpy_dtype_from_string(type_string):
+    if type_string == "Bytes":
+        return 'uint8'
+    elif type_string == "Uint16Values":
+        return 'uint16'
+    elif type_string == "Uint32Values":
+        return 'uint32'
+    else:
+        raise ValueError("Invalid type string")
+
 
 class ControllerInfo(ct.Structure):
     """
@@ -80,24 +90,158 @@ class ControllerInfo(ct.Structure):
     def get_description(self):
         return self._description[:consts.DESCRIPTION_BUFFER_SIZE]
 
-# non-public DLL/.so loading stuff
+# non-public DLL/.so loading stuff, the library is only loaded once a
+# controller is listed or opened, so analysis-only scripts don't need it
 _is_64_bit = sys.maxsize > 2 ** 32
-if os.name == 'posix':
-    if _is_64_bit:
-        _so_file = 'lib_ltc_controller_comm64.so'
-    else:
-        _so_file = 'lib_ltc_controller_comm.so'
-    _dll = ct.CDLL(_so_file)
-else:
-    _reg_key = _winreg.OpenKey(_winreg.HKEY_LOCAL_MACHINE, "SOFTWARE\\Linear Technology\\LinearLabTools")
-    _dll_file, _ = _winreg.QueryValueEx(_reg_key, "Location")
-    _dll_file += "ltc_controller_comm"
-    if _is_64_bit:
-        _dll_file += "64.dll"
+_dll = None
+
+def _load_dll():
+    global _dll
+    if _dll is not None:
+        return _dll
+    if os.environ.get('LTC_CONTROLLER_COMM', '').lower() == 'simulated':
+        # no hardware, see ltc_controller_comm_sim
+        import llt.common.ltc_controller_comm_sim as sim
+        _dll = sim.SimulatedDll()
+    elif os.name == 'posix':
+        if _is_64_bit:
+            so_file = 'lib_ltc_controller_comm64.so'
+        else:
+            so_file = 'lib_ltc_controller_comm.so'
+        _dll = ct.CDLL(so_file)
     else:
-        _dll_file += ".dll"
-    
-    _dll = ct.CDLL(str(_dll_file))
+        import _winreg
+        reg_key = _winreg.OpenKey(_winreg.HKEY_LOCAL_MACHINE, "SOFTWARE\\Linear Technology\\LinearLabTools")
+        dll_file, _ = _winreg.QueryValueEx(reg_key, "Location")
+        dll_file += "ltc_controller_comm"
+        if _is_64_bit:
+            dll_file += "64.dll"
+        else:
+            dll_file += ".dll"
+
+        _dll = ct.CDLL(str(dll_file))
+    return _dll
+
+# Argument types of the Lcc* functions. Those taking a handle first are
+# listed without it, the handle (LccHandle, a void*) is added.
+_HANDLE_ARGTYPES = {
+    'Reset': (),
+    'Close': (),
+    'GetSerialNumber': (ct.c_char_p, ct.c_int),
+    'GetDescription': (ct.c_char_p, ct.c_int),
+    'GetErrorInfo': (ct.c_char_p, ct.c_int),
+    'DataSetHighByteFirst': (),
+    'DataSetLowByteFirst': (),
+    'DataSendBytes': (ct.POINTER(ct.c_ubyte), ct.c_int, ct.POINTER(ct.c_int)),
+    'DataSendUint16Values': (ct.POINTER(ct.c_uint16), ct.c_int, ct.POINTER(ct.c_int)),
+    'DataSendUint32Values': (ct.POINTER(ct.c_uint32), ct.c_int, ct.POINTER(ct.c_int)),
+    'DataReceiveBytes': (ct.POINTER(ct.c_ubyte), ct.c_int, ct.POINTER(ct.c_int)),
+    'DataReceiveUint16Values': (ct.POINTER(ct.c_uint16), ct.c_int, ct.POINTER(ct.c_int)),
+    'DataReceiveUint32Values': (ct.POINTER(ct.c_uint32), ct.c_int, ct.POINTER(ct.c_int)),
+    'DataStartCollect': (ct.c_int, ct.c_int),
+    'DataIsCollectDone': (ct.POINTER(ct.c_bool), ),
+    'DataCancelCollect': (),
+    'DataSetCharacteristics': (ct.c_bool, ct.c_int, ct.c_bool),
+    'SpiSendBytes': (ct.POINTER(ct.c_ubyte), ct.c_int),
+    'SpiReceiveBytes': (ct.POINTER(ct.c_ubyte), ct.c_int),
+    'SpiTransceiveBytes': (ct.POINTER(ct.c_ubyte), ct.POINTER(ct.c_ubyte), ct.c_int),
+    'SpiSendByteAtAddress': (ct.c_ubyte, ct.c_ubyte),
+    'SpiSendBytesAtAddress': (ct.c_ubyte, ct.POINTER(ct.c_ubyte), ct.c_int),
+    'SpiReceiveByteAtAddress': (ct.c_ubyte, ct.POINTER(ct.c_ubyte)),
+    'SpiReceiveBytesAtAddress': (ct.c_ubyte, ct.POINTER(ct.c_ubyte), ct.c_int),
+    'SpiSetCsState': (ct.c_int, ),
+    'SpiSendNoChipSelect': (ct.POINTER(ct.c_ubyte), ct.c_int),
+    'SpiReceiveNoChipSelect': (ct.POINTER(ct.c_ubyte), ct.c_int),
+    'SpiTransceiveNoChipSelect': (ct.POINTER(ct.c_ubyte), ct.POINTER(ct.c_ubyte), ct.c_int),
+    'FpgaGetIsLoaded': (ct.c_char_p, ct.POINTER(ct.c_bool)),
+    'FpgaLoadFile': (ct.c_char_p, ),
+    'FpgaLoadFileChunked': (ct.c_char_p, ct.POINTER(ct.c_int)),
+    'FpgaCancelLoad': (),
+    'EepromReadString': (ct.c_char_p, ct.c_int),
+    'HsSetBitMode': (ct.c_int, ),
+    'HsPurgeIo': (),
+    'HsFpgaToggleReset': (),
+    'HsFpgaWriteAddress': (ct.c_ubyte, ),
+    'HsFpgaWriteData': (ct.c_ubyte, ),
+    'HsFpgaReadData': (ct.POINTER(ct.c_ubyte), ),
+    'HsFpgaWriteDataAtAddress': (ct.c_ubyte, ct.c_ubyte),
+    'HsFpgaReadDataAtAddress': (ct.c_ubyte, ct.POINTER(ct.c_ubyte)),
+    'HsGpioWriteHighByte': (ct.c_ubyte, ),
+    'HsGpioReadHighByte': (ct.POINTER(ct.c_ubyte), ),
+    'HsGpioWriteLowByte': (ct.c_ubyte, ),
+    'HsGpioReadLowByte': (ct.POINTER(ct.c_ubyte), ),
+    'HsFpgaEepromSetBitBangRegister': (ct.c_ubyte, ),
+    '1371SetGenericConfig': (ct.c_uint32, ),
+    '1371SetDemoConfig': (ct.c_uint32, ),
+    '1371SpiChooseChipSelect': (ct.c_int, ),
+    '890GpioSetByte': (ct.c_uint8, ),
+    '890GpioSpiSetBits': (ct.c_int, ct.c_int, ct.c_int),
+    '890Flush': ()
+}
+
+_ARGTYPES = {
+    'GetNumControllers': (ct.c_int, ct.c_int, ct.POINTER(ct.c_int)),
+    'GetControllerList': (ct.c_int, ct.POINTER(ControllerInfo), ct.c_int),
+    'InitController': (ct.POINTER(ct.c_void_p), ct.POINTER(ControllerInfo)),
+    'Cleanup': (ct.POINTER(ct.c_void_p), )
+}
+for _name, _argtypes in _HANDLE_ARGTYPES.items():
+    _ARGTYPES[_name] = (ct.c_void_p, ) + _argtypes
+
+# raise the exception matching a non-zero return code of a function taking a
+# handle, used as the errcheck of the prototyped functions
+def _check_error(error_code, func, args):
+    if error_code != 0:
+        c_error_buffer = ct.create_string_buffer(consts.ERROR_BUFFER_SIZE)
+        _functions['GetErrorInfo'](args[0], c_error_buffer, consts.ERROR_BUFFER_SIZE)
+        if error_code == -1:
+            raise errs.HardwareError(c_error_buffer.value)
+        elif error_code == -2:
+            raise ValueError(c_error_buffer.value)
+        elif error_code == -3:
+            raise errs.LogicError(c_error_buffer.value)
+        elif error_code == -4:
+            raise errs.NotSupportedError(c_error_buffer.value)
+        else:
+            raise RuntimeError(c_error_buffer.value)
+    return error_code
+
+def _not_in_library(name):
+    def not_supported(*args):
+        raise errs.NotSupportedError('Lcc' + name + ' is not in the controller library')
+    return not_supported
+
+def _prototype(dll, name):
+    try:
+        func = getattr(dll, 'Lcc' + name)
+    except AttributeError:
+        return _not_in_library(name)
+    checked = name in _HANDLE_ARGTYPES and name != 'GetErrorInfo'
+    if isinstance(func, ct._CFuncPtr):
+        func.restype = ct.c_int
+        func.argtypes = _ARGTYPES[name]
+        if checked:
+            func.errcheck = _check_error
+        return func
+    if not checked:
+        return func
+    # not a native library (simulated backend), check the same way
+    def checked_func(*args):
+        error_code = func(*args)
+        if error_code != 0:
+            _check_error(error_code, func, args)
+        return error_code
+    return checked_func
+
+# 'Name' -> the library's LccName, prototyped, built once with the library
+_functions = None
+
+def _get_functions():
+    global _functions
+    if _functions is None:
+        dll = _load_dll()
+        _functions = dict((name, _prototype(dll, name)) for name in _ARGTYPES)
+    return _functions
 
 
 def list_controllers(controller_type):
@@ -105,16 +249,17 @@ def list_controllers(controller_type):
     Looks for all attached controllers matching controller_type and puts their info in the list
     controller_type can be a bitwise OR combination of TYPE_* values
     """
+    functions = _get_functions()
     num_controllers = ct.c_int()
-    if _dll.LccGetNumControllers(ct.c_int(controller_type), ct.c_int(100),
-                                 ct.byref(num_controllers)) != 0:
+    if functions['GetNumControllers'](ct.c_int(controller_type), ct.c_int(100),
+                                      ct.byref(num_controllers)) != 0:
         raise errs.HardwareError("Could not create controller info list")
     num_controllers = num_controllers.value
     if num_controllers == 0:
         return None
     controller_info_list = (ControllerInfo * num_controllers)()
-    if _dll.LccGetControllerList(ct.c_int(controller_type), controller_info_list,
-                                 num_controllers) != 0:
+    if functions['GetControllerList'](ct.c_int(controller_type), controller_info_list,
+                                      num_controllers) != 0:
         raise errs.HardwareError("Could not get device info list, or no device found")
     return controller_info_list
 
@@ -130,11 +275,13 @@ class Controller(object):
         """Initialize the controller described by controller_info
         """
         self._handle = ct.c_void_p(None)
-        self._c_error_buffer = ct.create_string_buffer(consts.ERROR_BUFFER_SIZE)
         self._c_array = None
         self._c_array_type = "none"
-        self._dll = _dll
-        if self._dll.LccInitController(ct.byref(self._handle), ct.byref(controller_info)) != 0:
+        self._spi_chip_select = 1
+        self._spi_shadow = {} # (chip select, address) -> last value written
+        self.hs_fpga_shadow = None
+        self._functions = _get_functions()
+        if self._functions['InitController'](ct.byref(self._handle), ct.byref(controller_info)) != 0:
             raise errs.HardwareError("Error initializing the device")
 
     # support "with" semantics
@@ -148,22 +295,10 @@ class Controller(object):
         del traceback
         self.cleanup()
 
-    # call the C function and raise an exception if the return code indicates an error
+    # call the C function, its errcheck raises an exception if the return
+    # code indicates an error
     def _call(self, func_name, *args):
-        func = getattr(self._dll, 'Lcc' + func_name)
-        error_code = func(self._handle, *args)
-        if error_code != 0:
-            self._dll.LccGetErrorInfo(self._handle, self._c_error_buffer, consts.ERROR_BUFFER_SIZE)
-            if error_code == -1:
-                raise errs.HardwareError(self._c_error_buffer.value)
-            elif error_code == -2:
-                raise ValueError(self._c_error_buffer.value)
-            elif error_code == -3:
-                raise errs.LogicError(self._c_error_buffer.value)
-            elif error_code == -4:
-                raise errs.NotSupportedError(self._c_error_buffer.value)
-            else:
-                raise RuntimeError(self._c_error_buffer.value)
+        return self._functions[func_name](self._handle, *args)
 
     def cleanup(self):
         """Clean up (close and delete) all resources."""
@@ -171,8 +306,9 @@ class Controller(object):
             self.close()
         except:
             pass # nothing we can do, probably a DC1371 (no close()) anyway
+        self._spi_shadow.clear()
         if self._handle is not None:
-            self._dll.LccCleanup(ct.byref(self._handle))
+            self._functions['Cleanup'](ct.byref(self._handle))
             self._handle = None
 
     def get_serial_number(self):
@@ -189,6 +325,7 @@ class Controller(object):
 
     def reset(self):
         """Reset the controller, not used with High Speed controllers"""
+        self._spi_shadow.clear()
         self._call('Reset')
 
     def close(self):
@@ -328,6 +465,80 @@ class Controller(object):
         """
         return self._data_receive_by_type("Uint32Values", values, start, end)
 
+    # receive FIFO data of various types directly into a writable buffer
+    def _data_receive_into_by_type(self, type_string, buffer, start, end):
+        if buffer is None and end < 0:
+            raise ValueError("If buffer is None, end cannot be negative")
+        if buffer is None and start != 0:
+            raise ValueError("If buffer is None, start must be 0")
+        if start < 0:
+            raise ValueError("start must be >= 0")
+
+        import numpy as np
+        ctype = _ctype_from_string(type_string)
+        value_size = ct.sizeof(ctype)
+        if buffer is None:
+            buffer = np.empty(end, dtype=_numpy_dtype_from_string(type_string))
+
+        # flat byte view sharing memory with buffer (ndarray, bytearray, memoryview)
+        raw_bytes = np.asarray(buffer)
+        if not raw_bytes.flags.c_contiguous or not raw_bytes.flags.writeable:
+            raise ValueError("buffer must be contiguous and writable")
+        raw_bytes = raw_bytes.reshape(-1).view(np.uint8)
+        if raw_bytes.size % value_size != 0:
+            raise ValueError("buffer size must be a multiple of the value size")
+        if end < 0:
+            end = raw_bytes.size // value_size + end + 1
+        if end <= start:
+            raise ValueError("end must be > start")
+        if end * value_size > raw_bytes.size:
+            raise ValueError("buffer is too small")
+
+        num_values = end - start
+
+        # wraps the caller's memory, the DLL writes straight into it
+        c_array = (ctype * num_values).from_buffer(raw_bytes, start * value_size)
+
+        c_num_values = ct.c_int(num_values)
+        c_num_transfered = ct.c_int()
+
+        self._call('DataReceive' + type_string, c_array, c_num_values, ct.byref(c_num_transfered))
+
+        return c_num_transfered.value, buffer
+
+    def data_receive_bytes_into(self, buffer=None, start=0, end=-1):
+        """Fill buffer[start:end] with bytes received, without copying.
+
+        buffer can be any writable object supporting the buffer protocol
+        (numpy array, bytearray, memoryview...), start and end are in bytes.
+        If buffer is None (default) a new numpy uint8 array is created. Defaults
+        for start and end and interpretation of negative values is the same as
+        for slices. Return (number of bytes transferred, buffer).
+        """
+        return self._data_receive_into_by_type("Bytes", buffer, start, end)
+
+    def data_receive_uint16_values_into(self, buffer=None, start=0, end=-1):
+        """Fill buffer[start:end] with 16-bit values received, without copying.
+
+        buffer can be any writable object supporting the buffer protocol
+        (numpy array, bytearray, memoryview...), start and end are in 16-bit
+        values. If buffer is None (default) a new numpy uint16 array is created.
+        Defaults for start and end and interpretation of negative values is the
+        same as for slices. Return (number of bytes transferred, buffer).
+        """
+        return self._data_receive_into_by_type("Uint16Values", buffer, start, end)
+
+    def data_receive_uint32_values_into(self, buffer=None, start=0, end=-1):
+        """Fill buffer[start:end] with 32-bit values received, without copying.
+
+        buffer can be any writable object supporting the buffer protocol
+        (numpy array, bytearray, memoryview...), start and end are in 32-bit
+        values. If buffer is None (default) a new numpy uint32 array is created.
+        Defaults for start and end and interpretation of negative values is the
+        same as for slices. Return (number of bytes transferred, buffer).
+        """
+        return self._data_receive_into_by_type("Uint32Values", buffer, start, end)
+
     def data_start_collect(self, total_samples, trigger):
         """
         Start an ADC collect into memory, works with DC1371, DC890, DC718.
@@ -388,6 +599,7 @@ class Controller(object):
             self._c_array[i] = values[i + start]
 
         c_num_values = ct.c_int(num_values)
+        self._spi_shadow.clear()
         self._call('SpiSendBytes', self._c_array, c_num_values)
 
     def spi_receive_bytes(self, values=None, start=0, end=-1):
@@ -457,6 +669,7 @@ class Controller(object):
             self._c_array[i] = send_values[i + send_start]
 
         c_num_values = ct.c_int(num_values)
+        self._spi_shadow.clear()
         self._call('SpiTransceiveBytes', self._c_array, self._c_array, c_num_values)
 
         if receive_values is None:
@@ -479,9 +692,41 @@ class Controller(object):
         just writes two bytes, the address byte and data byte one after the
         other.
         """
-        c_address = ct.c_uint32(address)
-        c_value = ct.c_ubyte(value)
-        self._call('SpiSendByteAtAddress', c_address, c_value)
+        # plain ints, the prototype converts them (and wraps them to a byte)
+        self._call('SpiSendByteAtAddress', address, value)
+        self._spi_shadow[(self._spi_chip_select, address & 0xFF)] = value & 0xFF
+
+    def spi_send_register_table(self, register_values, skip_unchanged=False):
+        """Write a register table, register_values is [address, value, ...].
+        
+        Not used with DC718. Every register is written with
+        spi_send_byte_at_address, the native library has no call that sends
+        several addresses at once. The values written are remembered per chip
+        select, if skip_unchanged is True registers already holding their
+        value are not sent again. The shadow is cleared by reset, cleanup and
+        any other SPI send, call clear_spi_shadow if the demo-board was power
+        cycled or written by something else.
+        Returns the number of registers sent.
+        """
+        if len(register_values) % 2 != 0:
+            raise ValueError("register_values must be address, value pairs")
+        send = self._functions['SpiSendByteAtAddress']
+        shadow = self._spi_shadow
+        chip_select = self._spi_chip_select
+        num_sent = 0
+        for x in xrange(0, len(register_values), 2):
+            key = (chip_select, register_values[x] & 0xFF)
+            value = register_values[x+1] & 0xFF
+            if skip_unchanged and shadow.get(key) == value:
+                continue
+            send(self._handle, register_values[x], value)
+            shadow[key] = value
+            num_sent += 1
+        return num_sent
+
+    def clear_spi_shadow(self):
+        """Forget the register values spi_send_register_table remembered."""
+        self._spi_shadow.clear()
 
     def spi_send_bytes_at_address(self, address, values, start=0, end=-1):
         """Write an address byte and values[start:end] via SPI.
@@ -512,7 +757,8 @@ class Controller(object):
             self._c_array[i] = values[i + start]
 
         c_num_values = ct.c_int(num_values)
-        c_address = ct.c_uint32(address)
+        c_address = ct.c_ubyte(address)
+        self._spi_shadow.clear()
         self._call('SpiSendBytesAtAddress', c_address, self._c_array, c_num_values)
 
     def spi_receive_byte_at_address(self, address):
@@ -526,9 +772,8 @@ class Controller(object):
         just writes two bytes, the address byte and data byte one after the
         other.
         """
-        c_address = ct.c_uint32(address)
         c_value = ct.c_ubyte()
-        self._call('SpiReceiveByteAtAddress', c_address, ct.byref(c_value))
+        self._call('SpiReceiveByteAtAddress', address, ct.byref(c_value))
         return c_value.value
 
     def spi_receive_bytes_at_address(self, address, values=None,
@@ -561,7 +806,7 @@ class Controller(object):
             self._c_array = (ct.c_ubyte * num_values)()
 
         c_num_values = ct.c_int(num_values)
-        c_address = ct.c_uint32(address)
+        c_address = ct.c_ubyte(address)
         self._call('SpiReceiveBytesAtAddress', c_address, self._c_array, c_num_values)
 
         if values is None:
@@ -606,6 +851,7 @@ class Controller(object):
             self._c_array[i] = values[i + start]
 
         c_num_values = ct.c_int(num_values)
+        self._spi_shadow.clear()
         self._call('SpiSendNoChipSelect', self._c_array, c_num_values)
 
     def spi_receive_no_chip_select(self, values=None, start=0, end=-1):
@@ -675,6 +921,7 @@ class Controller(object):
             self._c_array[i] = send_values[i + send_start]
 
         c_num_values = ct.c_int(num_values)
+        self._spi_shadow.clear()
         self._call('SpiTransceiveNoChipSelect', self._c_array, self._c_array, c_num_values)
 
         if receive_values is None:
@@ -726,6 +973,7 @@ class Controller(object):
             
     def eeprom_read_string(self, num_chars):
         """Receive an EEPROM string."""
+        self._hs_fpga_forget_address()
         c_string = ct.create_string_buffer(num_chars+1)
         self._call('EepromReadString', c_string, num_chars+1)
         return c_string.value
@@ -733,49 +981,120 @@ class Controller(object):
     def hs_set_bit_mode(self, mode):
         """Set device mode to MODE_FIFO or MODE_MPSSE."""
         c_mode = ct.c_int(mode)
+        self._hs_fpga_forget_address()
         self._call('HsSetBitMode', c_mode)
 
     def hs_purge_io(self):
         """Purge input and output buffers."""
+        self._hs_fpga_forget_address()
         self._call('HsPurgeIo')
 
+    def hs_fpga_enable_shadow(self, volatile=()):
+        """Shadow the FPGA registers and return the RegisterShadow.
+        
+        hs_fpga_* writes that don't change a register (or the current address)
+        are skipped and reads of known registers are answered locally.
+        Registers the FPGA changes by itself (status, PLL lock, ...) must be
+        in volatile or added with hs_fpga_shadow.mark_volatile. The shadow is
+        cleared by hs_fpga_toggle_reset. Set hs_fpga_shadow to None to stop.
+        """
+        self.hs_fpga_shadow = RegisterShadow(volatile)
+        return self.hs_fpga_shadow
+
+    # the current FPGA address is shadowed like a register under this key
+    _HS_FPGA_ADDRESS = 'address'
+
+    def _hs_fpga_forget_address(self):
+        if self.hs_fpga_shadow is not None:
+            self.hs_fpga_shadow.invalidate(Controller._HS_FPGA_ADDRESS)
+
+    def _hs_fpga_write_address(self, key, address):
+        self._call('HsFpgaWriteAddress', address)
+
+    def _hs_fpga_write_data(self, address, value):
+        self._call('HsFpgaWriteData', value)
+
+    def _hs_fpga_read_data(self, address=None):
+        c_value = ct.c_ubyte()
+        self._call('HsFpgaReadData', ct.byref(c_value))
+        return c_value.value
+
+    def _hs_fpga_write_data_at_address(self, address, value):
+        self._hs_fpga_forget_address()
+        self._call('HsFpgaWriteDataAtAddress', address, value)
+        self.hs_fpga_shadow.store(Controller._HS_FPGA_ADDRESS, address)
+
+    def _hs_fpga_read_data_at_address(self, address):
+        self._hs_fpga_forget_address()
+        c_value = ct.c_ubyte()
+        self._call('HsFpgaReadDataAtAddress', address, ct.byref(c_value))
+        self.hs_fpga_shadow.store(Controller._HS_FPGA_ADDRESS, address)
+        return c_value.value
+
     def hs_fpga_toggle_reset(self):
         """Set the FPGA reset bit low then high."""
+        if self.hs_fpga_shadow is not None:
+            self.hs_fpga_shadow.invalidate()
         self._call('HsFpgaToggleReset')
 
     def hs_fpga_write_address(self, address):
         """Set the FPGA address to write or read."""
-        c_address = ct.c_ubyte(address)
-        self._call('HsFpgaWriteAddress', c_address)
+        if self.hs_fpga_shadow is None:
+            self._call('HsFpgaWriteAddress', address)
+        else:
+            self.hs_fpga_shadow.write(Controller._HS_FPGA_ADDRESS, address,
+                                      self._hs_fpga_write_address)
 
     def hs_fpga_write_data(self, value):
         """Write a value to the current FPGA address."""
-        c_value = ct.c_ubyte(value)
-        self._call('HsFpgaWriteData', c_value)
+        shadow = self.hs_fpga_shadow
+        if shadow is None:
+            self._call('HsFpgaWriteData', value)
+            return
+        address = shadow.get(Controller._HS_FPGA_ADDRESS)
+        if address is None:
+            # some register changed, we don't know which
+            shadow.invalidate()
+            self._hs_fpga_write_data(None, value)
+            shadow.writes += 1
+        else:
+            shadow.write(address, value, self._hs_fpga_write_data)
 
     def hs_fpga_read_data(self):
         """Read a value from the current FPGA address and return it."""
-        c_value = ct.c_ubyte()
-        self._call('HsFpgaReadData', ct.byref(c_value))
-        return c_value.value
+        shadow = self.hs_fpga_shadow
+        if shadow is None:
+            return self._hs_fpga_read_data()
+        address = shadow.get(Controller._HS_FPGA_ADDRESS)
+        if address is None:
+            shadow.reads += 1
+            return self._hs_fpga_read_data()
+        return shadow.read(address, self._hs_fpga_read_data)
 
     def hs_fpga_write_data_at_address(self, address, value):
         """Set the current address and write a value to it."""
-        c_address = ct.c_ubyte(address)
-        c_value = ct.c_ubyte(value)
-        self._call('HsFpgaWriteDataAtAddress', c_address, c_value)
+        shadow = self.hs_fpga_shadow
+        if shadow is None:
+            self._call('HsFpgaWriteDataAtAddress', address, value)
+        elif shadow.get(Controller._HS_FPGA_ADDRESS) == address:
+            shadow.write(address, value, self._hs_fpga_write_data)
+        else:
+            shadow.write(address, value, self._hs_fpga_write_data_at_address)
 
     def hs_fpga_read_data_at_address(self, address):
         """Set the current address and read a value from it."""
-        c_address = ct.c_ubyte(address)
-        c_value = ct.c_ubyte()
-        self._call('HsFpgaReadDataAtAddress', c_address, ct.byref(c_value))
-        return c_value.value
+        shadow = self.hs_fpga_shadow
+        if shadow is None:
+            c_value = ct.c_ubyte()
+            self._call('HsFpgaReadDataAtAddress', address, ct.byref(c_value))
+            return c_value.value
+        if shadow.get(Controller._HS_FPGA_ADDRESS) == address:
+            return shadow.read(address, self._hs_fpga_read_data)
+        return shadow.read(address, self._hs_fpga_read_data_at_address)
 
     def hs_gpio_write_high_byte(self, value):
         """Set the GPIO high byte to a value."""
-        c_value = ct.c_ubyte(value)
-        self._call('HsGpioWriteHighByte', c_value)
+        self._call('HsGpioWriteHighByte', value)
 
     def hs_gpio_read_high_byte(self):
         """Read the GPIO high byte and return the value."""
@@ -785,8 +1104,7 @@ class Controller(object):
 
     def hs_gpio_write_low_byte(self, value):
         """Set the GPIO low byte to a value."""
-        c_value = ct.c_ubyte(value)
-        self._call('HsGpioWriteLowByte', c_value)
+        self._call('HsGpioWriteLowByte', value)
 
     def hs_gpio_read_low_byte(self):
         """Read the GPIO low byte and return the value"""
@@ -824,6 +1142,7 @@ class Controller(object):
         new_chip_select -- 1 (usually) or 2
         """
         self._call('1371SpiChooseChipSelect', ct.c_int(new_chip_select))
+        self._spi_chip_select = new_chip_select
 
     def dc890_gpio_set_byte(self, byte):
         """
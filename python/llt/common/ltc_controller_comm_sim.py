@@ -0,0 +1,460 @@
+"""Software stand-in for ltc_controller_comm.dll
+
+Set the environment variable LTC_CONTROLLER_COMM=simulated before importing
+ltc_controller_comm and it uses SimulatedDll instead of the native library.
+Everything above the DLL (Controller, the dc718/dc890/dc1371 Demoboards,
+fix_data, scatter_data, file writing, sin_params...) then runs unchanged with
+no hardware attached, so it can be profiled and benchmarked offline.
+
+The simulated boards are listed in LTC_SIMULATED_BOARDS, separated by
+semicolons. Each board is the controller type, the EEPROM ID string (it has
+to contain the dc_number the Demoboard looks for) and optional settings:
+
+    LTC_SIMULATED_BOARDS="DC718:DC1563A-A;DC890:DC1925A-A:waveform=ramp:alignment=18"
+
+or from python, before the first list_controllers():
+
+    import llt.common.ltc_controller_comm_sim as sim
+    sim.add_board(consts.TYPE_DC718, 'DC1563A-A', waveform = 'noise')
+
+Board settings (see SimulatedBoard):
+    waveform      -- 'sine', 'ramp' or 'noise'
+    alignment     -- bits per sample word that carry the code, the same as
+                     the Demoboard's (default 16, 24 for 3 and 4 byte samples)
+    is_bipolar    -- 1 for two's complement codes, 0 for straight binary
+    frequency     -- sine frequency in Hz
+    amplitude     -- sine amplitude as a fraction of full scale
+    noise         -- rms noise in LSBs of alignment
+    sample_rate   -- samples/s, a collect takes num_samples / sample_rate
+    realtime      -- 0 to finish collects right away instead
+    transfer_rate -- bytes/s the data is received at, 0 for no delay
+
+Set LTC_SIMULATED_EXCLUSIVE=1 (or exclusive_open = True) to open the devices
+exclusively like the native library: the first handle that talks to a board
+owns it until it is closed or cleaned up, any other handle gets a
+HardwareError.
+"""
+
+import os
+import time
+import zlib
+import ctypes as ct
+import numpy as np
+import llt.common.constants as consts
+
+WAVEFORMS = ('sine', 'ramp', 'noise')
+
+_TYPE_NAMES = {
+    'DC1371': consts.TYPE_DC1371,
+    'DC718': consts.TYPE_DC718,
+    'DC890': consts.TYPE_DC890,
+    'HIGH_SPEED': consts.TYPE_HIGH_SPEED
+}
+
+# Roughly what the real controllers manage over USB, bytes/s
+_TRANSFER_RATES = {
+    consts.TYPE_DC1371: 20.0e6,
+    consts.TYPE_DC718: 6.0e6,
+    consts.TYPE_DC890: 8.0e6,
+    consts.TYPE_HIGH_SPEED: 30.0e6
+}
+
+_SUCCESS = 0
+_HARDWARE_ERROR = -1
+_INVALID_ARG = -2
+_NOT_SUPPORTED = -4
+
+exclusive_open = os.environ.get('LTC_SIMULATED_EXCLUSIVE', '0') != '0'
+
+class SimulatedBoard(object):
+    """A controller with a demo board attached, as seen by SimulatedDll."""
+    def __init__(self, controller_type, eeprom_id, serial_number, waveform = 'sine',
+                 alignment = None, is_bipolar = True, frequency = 1.0e3, amplitude = 0.9, noise = 1.0,
+                 sample_rate = 1.0e6, realtime = True, transfer_rate = None):
+        if waveform not in WAVEFORMS:
+            raise ValueError('waveform must be one of ' + ', '.join(WAVEFORMS))
+        self.controller_type = controller_type
+        self.eeprom_id = eeprom_id
+        self.serial_number = serial_number
+        self.description = 'Simulated ' + [name for name, value in _TYPE_NAMES.items()
+                                           if value == controller_type][0]
+        self.waveform = waveform
+        self.alignment = alignment
+        self.is_bipolar = is_bipolar
+        self.frequency = float(frequency)
+        self.amplitude = float(amplitude)
+        self.noise = float(noise)
+        self.sample_rate = float(sample_rate)
+        self.realtime = realtime
+        if transfer_rate is None:
+            transfer_rate = _TRANSFER_RATES[controller_type]
+        self.transfer_rate = float(transfer_rate)
+        self.fpga_load = None
+        self.fpga_registers = {} # high speed FPGA address -> value
+        self.fpga_address = 0
+        self.spi_registers = {} # (chip select, address) -> value
+        self.spi_chip_select = 1
+        self.spi_write_count = 0
+        self.high_byte_first = True
+        self.sample_bytes = 2
+        self.owner = None # handle that has the device open
+        self._random = np.random.RandomState(zlib.crc32(serial_number) & 0xFFFFFFFF)
+        self._sample_count = 0 # waveform phase, carries over between collects
+        self._fifo = np.zeros(0, dtype=np.uint8)
+        self._fifo_position = 0
+        self._done_time = None
+
+    def codes(self, num_samples):
+        """Next num_samples ADC codes, alignment bits wide."""
+        alignment = self.alignment
+        if alignment is None:
+            alignment = 16 if self.sample_bytes <= 2 else 24
+        full_scale = 2**(alignment - 1)
+        n = np.arange(self._sample_count, self._sample_count + num_samples)
+        self._sample_count += num_samples
+        if self.waveform == 'ramp':
+            return n % (2 * full_scale)
+        if self.waveform == 'sine':
+            values = self.amplitude * full_scale * \
+                np.sin(2 * np.pi * self.frequency / self.sample_rate * n)
+        else:
+            values = np.zeros(num_samples)
+        if self.noise:
+            values += self._random.normal(0.0, self.noise, num_samples)
+        codes = np.clip(np.round(values), -full_scale, full_scale - 1).astype(np.int64)
+        if not self.is_bipolar:
+            return codes + full_scale
+        return codes & (2 * full_scale - 1)
+
+    def start_collect(self, num_samples):
+        # the whole collect is generated up front in wire byte order
+        codes = self.codes(num_samples).astype(np.uint32)
+        word_bytes = codes.astype('>u4' if self.high_byte_first else '<u4').view(np.uint8)
+        word_bytes = word_bytes.reshape(num_samples, 4)
+        if self.high_byte_first:
+            self._fifo = word_bytes[:, 4 - self.sample_bytes:].reshape(-1).copy()
+        else:
+            self._fifo = word_bytes[:, :self.sample_bytes].reshape(-1).copy()
+        self._fifo_position = 0
+        duration = num_samples / self.sample_rate if self.realtime else 0.0
+        self._done_time = time.time() + duration
+
+    def is_collect_done(self):
+        return self._done_time is not None and time.time() >= self._done_time
+
+    def cancel_collect(self):
+        self._done_time = None
+        self._fifo = np.zeros(0, dtype=np.uint8)
+        self._fifo_position = 0
+
+    def receive(self, num_bytes):
+        """Next num_bytes of the collected data in wire order."""
+        start = self._fifo_position
+        data = self._fifo[start:start + num_bytes]
+        self._fifo_position += len(data)
+        if self.transfer_rate:
+            time.sleep(len(data) / self.transfer_rate)
+        return data
+
+_boards = []
+
+def add_board(controller_type, eeprom_id, **settings):
+    """Attach a simulated board, returns its SimulatedBoard."""
+    serial_number = 'SIM%05d' % len(_boards)
+    board = SimulatedBoard(controller_type, eeprom_id, serial_number, **settings)
+    _boards.append(board)
+    return board
+
+def remove_boards():
+    del _boards[:]
+
+def boards_from_string(boards_string):
+    """Add the boards described like LTC_SIMULATED_BOARDS."""
+    for board_string in boards_string.split(';'):
+        if not board_string.strip():
+            continue
+        fields = board_string.strip().split(':')
+        if len(fields) < 2 or fields[0].upper() not in _TYPE_NAMES:
+            raise ValueError('Expected TYPE:EEPROM_ID[:setting=value...], got ' +
+                             board_string)
+        settings = {}
+        for field in fields[2:]:
+            name, value = field.split('=')
+            if name == 'waveform':
+                settings[name] = value
+            elif name in ('alignment', 'is_bipolar', 'realtime'):
+                settings[name] = int(value)
+            else:
+                settings[name] = float(value)
+        add_board(_TYPE_NAMES[fields[0].upper()], fields[1], **settings)
+
+def _value(arg):
+    # c_int(x) / byref(c_int) -> the ctypes object's value, ints as they are
+    arg = getattr(arg, '_obj', arg)
+    return getattr(arg, 'value', arg)
+
+def _array_bytes(c_array, num_bytes):
+    return np.ctypeslib.as_array(ct.cast(c_array, ct.POINTER(ct.c_ubyte)),
+                                 shape=(num_bytes, ))
+
+class SimulatedDll(object):
+    """Implements the Lcc* entry points Controller calls, in python.
+
+    Handles are small integers, every other argument is what
+    ltc_controller_comm passes to the native library (ctypes objects or plain
+    ints). High speed FPGA registers read back what was written, SPI register
+    writes are recorded per chip select, other entry points that have no
+    effect on the simulated data (GPIO, ...) succeed and do nothing.
+    """
+    def __init__(self):
+        self._open = {} # handle -> SimulatedBoard
+        self._next_handle = 1
+        self._errors = {}
+
+    def __getattr__(self, name):
+        if not name.startswith('Lcc'):
+            raise AttributeError(name)
+        def no_op(handle, *args):
+            return self._check(handle)
+        return no_op
+
+    def _check(self, handle):
+        board = self._open.get(_value(handle))
+        if board is None:
+            return self._fail(handle, _HARDWARE_ERROR, 'Controller is not open')
+        if exclusive_open:
+            # the native library opens the device on first use
+            if board.owner not in (None, _value(handle)):
+                return self._fail(handle, _HARDWARE_ERROR, 'Device is in use')
+            board.owner = _value(handle)
+        return _SUCCESS
+
+    def _release(self, handle):
+        board = self._board(handle)
+        if board is not None and board.owner == _value(handle):
+            board.owner = None
+
+    def _fail(self, handle, code, message):
+        self._errors[_value(handle)] = message
+        return code
+
+    def _board(self, handle):
+        return self._open.get(_value(handle))
+
+    def LccGetNumControllers(self, controller_type, max_controllers, num_controllers):
+        matches = [board for board in _boards
+                   if board.controller_type & _value(controller_type)]
+        num_controllers._obj.value = min(len(matches), _value(max_controllers))
+        return _SUCCESS
+
+    def LccGetControllerList(self, controller_type, info_list, num_controllers):
+        matches = [board for board in _boards
+                   if board.controller_type & _value(controller_type)]
+        for i, board in enumerate(matches[:num_controllers]):
+            info = info_list[i]
+            info._type = board.controller_type
+            info._description = board.description
+            info._serial_number = board.serial_number
+            info._id = _boards.index(board)
+        return _SUCCESS
+
+    def LccInitController(self, handle, controller_info):
+        info = controller_info._obj
+        for board in _boards:
+            if board.serial_number == info.get_serial_number():
+                handle._obj.value = self._next_handle
+                self._open[self._next_handle] = board
+                self._next_handle += 1
+                return _SUCCESS
+        return _HARDWARE_ERROR
+
+    def LccCleanup(self, handle):
+        self._release(handle)
+        self._open.pop(_value(handle), None)
+        return _SUCCESS
+
+    def LccClose(self, handle):
+        if self._check(handle):
+            return _HARDWARE_ERROR
+        self._release(handle)
+        return _SUCCESS
+
+    def LccGetErrorInfo(self, handle, c_error_buffer, buffer_size):
+        message = self._errors.pop(_value(handle), '')
+        c_error_buffer.value = message[:buffer_size - 1]
+        return _SUCCESS
+
+    def LccGetSerialNumber(self, handle, c_serial_number, buffer_size):
+        if self._check(handle):
+            return _HARDWARE_ERROR
+        c_serial_number.value = self._board(handle).serial_number[:buffer_size - 1]
+        return _SUCCESS
+
+    def LccGetDescription(self, handle, c_description, buffer_size):
+        if self._check(handle):
+            return _HARDWARE_ERROR
+        c_description.value = self._board(handle).description[:buffer_size - 1]
+        return _SUCCESS
+
+    def LccEepromReadString(self, handle, c_string, buffer_size):
+        if self._check(handle):
+            return _HARDWARE_ERROR
+        c_string.value = self._board(handle).eeprom_id[:buffer_size - 1]
+        return _SUCCESS
+
+    def LccDataSetHighByteFirst(self, handle):
+        if self._check(handle):
+            return _HARDWARE_ERROR
+        self._board(handle).high_byte_first = True
+        return _SUCCESS
+
+    def LccDataSetLowByteFirst(self, handle):
+        if self._check(handle):
+            return _HARDWARE_ERROR
+        self._board(handle).high_byte_first = False
+        return _SUCCESS
+
+    def LccDataSetCharacteristics(self, handle, is_multichannel, sample_bytes,
+                                  is_positive_clock):
+        if self._check(handle):
+            return _HARDWARE_ERROR
+        sample_bytes = _value(sample_bytes)
+        if not 1 <= sample_bytes <= 4:
+            return self._fail(handle, _INVALID_ARG, 'sample_bytes must be 1 to 4')
+        self._board(handle).sample_bytes = sample_bytes
+        return _SUCCESS
+
+    def LccDataStartCollect(self, handle, total_samples, trigger):
+        if self._check(handle):
+            return _HARDWARE_ERROR
+        self._board(handle).start_collect(_value(total_samples))
+        return _SUCCESS
+
+    def LccDataIsCollectDone(self, handle, is_done):
+        if self._check(handle):
+            return _HARDWARE_ERROR
+        is_done._obj.value = self._board(handle).is_collect_done()
+        return _SUCCESS
+
+    def LccDataCancelCollect(self, handle):
+        if self._check(handle):
+            return _HARDWARE_ERROR
+        self._board(handle).cancel_collect()
+        return _SUCCESS
+
+    def _receive(self, handle, c_array, num_values, num_transferred, value_size,
+                 value_type):
+        if self._check(handle):
+            return _HARDWARE_ERROR
+        board = self._board(handle)
+        num_bytes = _value(num_values) * value_size
+        data = board.receive(num_bytes)
+        if value_size > 1:
+            byte_order = '>' if board.high_byte_first else '<'
+            data = data[:len(data) // value_size * value_size].view(byte_order + value_type)
+            data = data.astype(value_type).view(np.uint8)
+        _array_bytes(c_array, num_bytes)[:len(data)] = data
+        num_transferred._obj.value = len(data)
+        return _SUCCESS
+
+    def LccDataReceiveBytes(self, handle, c_array, num_values, num_transferred):
+        return self._receive(handle, c_array, num_values, num_transferred, 1, 'u1')
+
+    def LccDataReceiveUint16Values(self, handle, c_array, num_values, num_transferred):
+        return self._receive(handle, c_array, num_values, num_transferred, 2, 'u2')
+
+    def LccDataReceiveUint32Values(self, handle, c_array, num_values, num_transferred):
+        return self._receive(handle, c_array, num_values, num_transferred, 4, 'u4')
+
+    def _send(self, handle, c_array, num_values, num_transferred, value_size):
+        if self._check(handle):
+            return _HARDWARE_ERROR
+        num_transferred._obj.value = _value(num_values) * value_size
+        return _SUCCESS
+
+    def LccDataSendBytes(self, handle, c_array, num_values, num_transferred):
+        return self._send(handle, c_array, num_values, num_transferred, 1)
+
+    def LccDataSendUint16Values(self, handle, c_array, num_values, num_transferred):
+        return self._send(handle, c_array, num_values, num_transferred, 2)
+
+    def LccDataSendUint32Values(self, handle, c_array, num_values, num_transferred):
+        return self._send(handle, c_array, num_values, num_transferred, 4)
+
+    def LccHsFpgaWriteAddress(self, handle, address):
+        board = self._board(handle)
+        if board is None:
+            return self._check(handle)
+        board.fpga_address = _value(address) & 0xFF
+        return _SUCCESS
+
+    def LccHsFpgaWriteData(self, handle, value):
+        board = self._board(handle)
+        if board is None:
+            return self._check(handle)
+        board.fpga_registers[board.fpga_address] = _value(value) & 0xFF
+        return _SUCCESS
+
+    def LccHsFpgaReadData(self, handle, value):
+        board = self._board(handle)
+        if board is None:
+            return self._check(handle)
+        value._obj.value = board.fpga_registers.get(board.fpga_address, 0)
+        return _SUCCESS
+
+    def LccHsFpgaWriteDataAtAddress(self, handle, address, value):
+        board = self._board(handle)
+        if board is None:
+            return self._check(handle)
+        board.fpga_address = _value(address) & 0xFF
+        board.fpga_registers[board.fpga_address] = _value(value) & 0xFF
+        return _SUCCESS
+
+    def LccHsFpgaReadDataAtAddress(self, handle, address, value):
+        board = self._board(handle)
+        if board is None:
+            return self._check(handle)
+        board.fpga_address = _value(address) & 0xFF
+        value._obj.value = board.fpga_registers.get(board.fpga_address, 0)
+        return _SUCCESS
+
+    def LccSpiSendByteAtAddress(self, handle, address, value):
+        board = self._board(handle)
+        if board is None:
+            return self._check(handle)
+        # the native prototype takes uint8_t address and value
+        board.spi_registers[(board.spi_chip_select, _value(address) & 0xFF)] = _value(value) & 0xFF
+        board.spi_write_count += 1
+        return _SUCCESS
+
+    def Lcc1371SpiChooseChipSelect(self, handle, new_chip_select):
+        board = self._board(handle)
+        if board is None:
+            return self._check(handle)
+        board.spi_chip_select = _value(new_chip_select)
+        return _SUCCESS
+
+    def LccFpgaGetIsLoaded(self, handle, fpga_filename, is_loaded):
+        if self._check(handle):
+            return _HARDWARE_ERROR
+        load = self._board(handle).fpga_load
+        is_loaded._obj.value = load is not None and \
+            load.lower() == fpga_filename.value.lower()
+        return _SUCCESS
+
+    def LccFpgaLoadFile(self, handle, fpga_filename):
+        if self._check(handle):
+            return _HARDWARE_ERROR
+        if self._board(handle).controller_type in (consts.TYPE_DC718, consts.TYPE_HIGH_SPEED):
+            return self._fail(handle, _NOT_SUPPORTED, 'No FPGA load on this controller')
+        self._board(handle).fpga_load = fpga_filename.value
+        return _SUCCESS
+
+    def LccFpgaLoadFileChunked(self, handle, fpga_filename, progress):
+        error_code = self.LccFpgaLoadFile(handle, fpga_filename)
+        if error_code == _SUCCESS:
+            progress._obj.value = 0
+        return error_code
+
+if os.environ.get('LTC_SIMULATED_BOARDS'):
+    boards_from_string(os.environ['LTC_SIMULATED_BOARDS'])
@@ -4,10 +4,13 @@
 import os
 from subprocess import call
 import socket
+import select
 import ctypes
 import struct
 import json
+import numpy as np
 from time import sleep
+from llt.common.register_shadow import RegisterShadow
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
@@ -16,14 +19,52 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 # mem_func_lib = ctypes.CDLL(os.path.join(basedir, 'mem_functions'))
 
 def recvall(sock, length):
-    data = ''
-    while len(data) < length:
-        more = sock.recv(length - len(data))
+    chunks = []
+    received = 0
+    while received < length:
+        more = sock.recv(length - received)
         if not more:
             raise EOFError('socket closed %d bytes into a %d-byte message'
-                           % (len(data), length))
-        data += more
-    return data
+                           % (received, length))
+        chunks.append(more)
+        received += len(more)
+    return b''.join(chunks)
+
+# Receive exactly len(buffer) bytes straight into buffer (a flat numpy uint8
+# array), no intermediate strings.
+def recvall_into(sock, buffer):
+    length = len(buffer)
+    received = 0
+    while received < length:
+        more = sock.recv_into(buffer[received:], length - received)
+        if not more:
+            raise EOFError('socket closed %d bytes into a %d-byte message'
+                           % (received, length))
+        received += more
+    return buffer
+
+# Flat byte view of a writable buffer (bytearray, numpy array, memoryview)
+# that is at least num_bytes long; a new array is made if buffer is None.
+def byte_view(buffer, num_bytes):
+    if buffer is None:
+        return np.empty(num_bytes, dtype=np.uint8)
+    raw_bytes = np.asarray(buffer)
+    if not raw_bytes.flags.c_contiguous or not raw_bytes.flags.writeable:
+        raise ValueError('buffer must be contiguous and writable')
+    raw_bytes = raw_bytes.reshape(-1).view(np.uint8)
+    if len(raw_bytes) < num_bytes:
+        raise ValueError('buffer too small, need %d bytes' % num_bytes)
+    return raw_bytes[0:num_bytes]
+
+# True if the other end has closed sock, checked without blocking
+def peer_closed(sock):
+    readable, writable, errored = select.select([sock], [], [], 0)
+    if not readable:
+        return False
+    try:
+        return len(sock.recv(1, socket.MSG_PEEK)) == 0
+    except socket.error:
+        return True
 
 def check_address_range(address):
     if (address % 4 != 0):
@@ -73,13 +114,123 @@ class MemClient(object):
     COMMAND_SENT = 0x40000000
     RESPONSE_RECEIVED = 0x20000000
     DUMMY_FUNC = 0x10000000
+
+    # Registers the FPGA changes by itself or that act on every write, a
+    # shadow never remembers them
+    VOLATILE_REGISTERS = (0x20,  # CONTROL_BASE, start and trigger bits
+                          0x30,  # DATA_READY_BASE
+                          0xE0,  # LUT_ADDR_DATA_BASE
+                          0x100, # BUFFER_ADDRESS_BASE
+                          0x800, 0x804, 0x808, 0x80C, 0x810, 0x814) # SPI_PORT_BASE
     
-    def __init__(self, host='localhost', port=1992):
+    def __init__(self, host='localhost', port=1992, persistent=False, shadow=False):
+        """persistent -- keep one connection open across calls instead of
+        connecting for every command. The daemon must serve more than one
+        command per connection; if the kept connection was dropped before a
+        command is sent, it is re-opened and the command sent again.
+        shadow -- True (or a RegisterShadow) to skip reg_write calls that
+        don't change the register and answer reg_read of known registers
+        locally. True marks VOLATILE_REGISTERS volatile, anything else
+        writing the registers (another client, a power cycle) is not seen,
+        call shadow.invalidate() then."""
         self.port = port
         self.host = host
+        self.persistent = persistent
+        self._sock = None
+        if shadow is True:
+            shadow = RegisterShadow(MemClient.VOLATILE_REGISTERS)
+        self.shadow = shadow if shadow is not False else None
+
+    # support "with" semantics
+    def __enter__(self):
+        return self
+
+    # support "with" semantics
+    def __exit__(self, vtype, value, traceback):
+        self.close()
+
+    # Func Desc: Close the persistent connection (if any)
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _get_socket(self):
+        if self._sock is not None:
+            return self._sock
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.connect((self.host, self.port))
+        if self.persistent:
+            # commands are tiny, don't let Nagle hold them back
+            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._sock = s
+        return s
+
+    def _release_socket(self, s, failed = False):
+        if s is self._sock and not failed:
+            return
+        if s is self._sock:
+            self._sock = None
+        s.close()
+
+    # Send a command (and any payloads after it), then return whatever
+    # receive(socket) reads back. In persistent mode a connection kept from an
+    # earlier command may have been dropped, if sending on it fails it is
+    # re-opened and the command resent once. Once the command is sent the
+    # daemon may have run it, so a failure after that is never retried.
+    def _exchange(self, sock_msg, payloads, receive):
+        while True:
+            if self._sock is not None and peer_closed(self._sock):
+                self.close() # the daemon dropped the connection while idle
+            is_reused = self._sock is not None
+            s = self._get_socket()
+            try:
+                s.sendall(sock_msg)
+                for payload in payloads:
+                    s.sendall(payload)
+            except socket.error:
+                self._release_socket(s, failed = True)
+                if is_reused:
+                    continue
+                raise
+            try:
+                response = receive(s)
+            except (socket.error, EOFError):
+                self._release_socket(s, failed = True)
+                raise
+            self._release_socket(s)
+            return response
+
+    # Send a command (and any payloads after it), return the raw response.
+    def _command(self, sock_msg, response_length, *payloads):
+        return self._exchange(sock_msg, payloads,
+                              lambda s: recvall(s, response_length))
+
+    # Send a block read command and receive the words straight into buffer,
+    # returned as a uint32 (or int32) numpy array sharing buffer's memory.
+    def _read_block_array(self, cmd_id, address, size, buffer, signed, dummy):
+        check_address_range(address)
+        length = 16
+        command = cmd_id | MemClient.COMMAND_SENT
+        if (dummy == True):
+            command = command | MemClient.DUMMY_FUNC
+        sock_msg = struct.pack('IIII', command, length, address, size)
+        raw_bytes = byte_view(buffer, size * 4)
+        self._exchange(sock_msg, (), lambda s: recvall_into(s, raw_bytes))
+        return raw_bytes.view(np.int32 if signed else np.uint32)
+
+    # Func Desc: Start queueing register/memory commands to send back to back
+    def pipeline(self):
+        return Pipeline(self)
     
     # Func Desc: Read a register
     def reg_read(self, address, dummy = False):
+        if self.shadow is not None and not dummy:
+            check_address_range(address)
+            return self.shadow.read(address, self._reg_read)
+        return self._reg_read(address, dummy)
+
+    def _reg_read(self, address, dummy = False):
         check_address_range(address)
         length = 12 # 4 bytes CMD + 4 bytes LN + 4 bytes Register Location
         command = MemClient.REG_READ | MemClient.COMMAND_SENT
@@ -87,19 +238,22 @@ class MemClient(object):
             command = command | MemClient.DUMMY_FUNC
             
         sock_msg = struct.pack('III', command, length, address)
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.host, self.port))
-        s.sendall(sock_msg)
-        
         # register value is 32 bits
-        response = recvall(s, 12)
+        response = self._command(sock_msg, 12)
         (response_command, response_length, register_value) = struct.unpack('III', response)
-        s.close()
         check_for_error(response_command)
         return register_value
       
     # Func Desc: Write into a register
     def reg_write(self, address, value, dummy = False):
+        if self.shadow is not None and not dummy:
+            check_address_range(address)
+            # the daemon answers with the address written
+            self.shadow.write(address, value, self._reg_write)
+            return address
+        return self._reg_write(address, value, dummy)
+
+    def _reg_write(self, address, value, dummy = False):
         check_address_range(address)
         length = 16
         command = MemClient.REG_WRITE | MemClient.COMMAND_SENT
@@ -108,14 +262,9 @@ class MemClient(object):
         # register_location = MemClient.handle_command(self, command, length, (address, value))        
         
         sock_msg = struct.pack('IIII', command, length, address, value)
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.host, self.port))
-        s.sendall(sock_msg)
-        
         # third parameter is the register location that was written into    
-        response = recvall(s, 12)
+        response = self._command(sock_msg, 12)
         (response_command, response_length, register_location) = struct.unpack('III', response)
-        s.close()
         check_for_error(response_command)
         return register_location
 
@@ -127,12 +276,8 @@ class MemClient(object):
         if (dummy == True):
             command = command | MemClient.DUMMY_FUNC
         sock_msg = struct.pack('III', command, length, address)
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.host, self.port))
-        s.sendall(sock_msg)
-        response = recvall(s, 12)
+        response = self._command(sock_msg, 12)
         (response_command, response_length, memory_value) = struct.unpack('III', response)
-        s.close()
         check_for_error(response_command)        
         return memory_value
     
@@ -144,13 +289,9 @@ class MemClient(object):
         if (dummy == True):
             command = command | MemClient.DUMMY_FUNC
         sock_msg = struct.pack('IIII', command, length, address, value)
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.host, self.port))
-        s.sendall(sock_msg)
-        response = recvall(s, 12)
+        response = self._command(sock_msg, 12)
         # third parameter is the register location that was written into
         (response_command, response_length, memory_location) = struct.unpack('III', response)
-        s.close()
         check_for_error(response_command)        
         return memory_location
     
@@ -162,16 +303,8 @@ class MemClient(object):
         if (dummy == True):
             command = command | MemClient.DUMMY_FUNC
         sock_msg = struct.pack('IIII', command, length, address, size)
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.host, self.port))
-        s.sendall(sock_msg)
-        
-        block = recvall(s, size * 4)
-        ret=[]
-        for i in range(0, size*4, 4):
-            ret.append(struct.unpack('I', block[i:i+4])[0])
-        s.close()
-        return ret
+        block = self._command(sock_msg, size * 4)
+        return list(struct.unpack('%dI' % size, block))
         
     # Func Desc: Read a block of memory locations    
     def mem_read_block(self, address, capture_size, dummy = False):
@@ -181,16 +314,23 @@ class MemClient(object):
         if (dummy == True):
             command = command | MemClient.DUMMY_FUNC
         sock_msg = struct.pack('IIII', command, length, address, capture_size)
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.host, self.port))
-        s.sendall(sock_msg)
-        ret = 0
-        block = recvall(s, capture_size * 4)
-        ret=[]
-        for i in range(0, capture_size*4, 4):
-            ret.append(struct.unpack('I', block[i:i+4])[0])
-        s.close()
-        return ret        
+        block = self._command(sock_msg, capture_size * 4)
+        return list(struct.unpack('%dI' % capture_size, block))
+
+    # Func Desc: Read a block of registers into a numpy array. buffer (a
+    # bytearray, numpy array...) can be passed in to be reused, the array
+    # returned shares its memory. signed returns int32 instead of uint32.
+    def reg_read_block_array(self, address, size, buffer = None, signed = False, dummy = False):
+        return self._read_block_array(MemClient.REG_READ_BLOCK, address, size,
+                                      buffer, signed, dummy)
+
+    # Func Desc: Read a block of memory locations into a numpy array. buffer
+    # (a bytearray, numpy array...) can be passed in to be reused across
+    # captures, the array returned shares its memory. signed returns int32
+    # instead of uint32.
+    def mem_read_block_array(self, address, capture_size, buffer = None, signed = False, dummy = False):
+        return self._read_block_array(MemClient.MEM_READ_BLOCK, address, capture_size,
+                                      buffer, signed, dummy)
             
     # Func Desc: Write into a block of register locations
     def reg_write_block(self, address, size, reg_values, dummy = False):
@@ -200,19 +340,19 @@ class MemClient(object):
         if (dummy == True):
             command = command | MemClient.DUMMY_FUNC
         sock_msg = struct.pack('IIII', command, length, address, size)
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.host, self.port))
-        s.sendall(sock_msg)
         # transmit each value as a string (32 bits)        
         val = struct.pack('I'*size, *reg_values)
-        s.sendall(val)
-
-        response = recvall(s, 12)
+        if self.shadow is not None and not dummy:
+            for i in range(size):
+                self.shadow.invalidate(address + 4 * i)
+        response = self._command(sock_msg, 12, val)
         # third parameter is the register location that was last written into
         (response_command, response_length, last_location) = struct.unpack('III', response)
         check_for_error(response_command)    
         if(last_location != (address + (size - 1)*4)):    print 'Not all locations written!'
-        s.close()
+        if self.shadow is not None and not dummy:
+            for i in range(size):
+                self.shadow.store(address + 4 * i, reg_values[i])
         return last_location
     
     # Func Desc: Write into a block of memory locations
@@ -223,19 +363,13 @@ class MemClient(object):
         if (dummy == True):
             command = command | MemClient.DUMMY_FUNC
         sock_msg = struct.pack('IIII', command, length, address, size)
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.host, self.port))
-        s.sendall(sock_msg)
         # transmit each value as a string (32 bits)
         val = struct.pack('I'*size, *mem_values)
-        s.sendall(val)
-
-        response = recvall(s, 12)
+        response = self._command(sock_msg, 12, val)
         # third parameter is the register location that was last written into
         (response_command, response_length, last_location) = struct.unpack('III', response)
         check_for_error(response_command)    
         if(last_location != (address + (size - 1)*4)):    print 'Not all locations written!'
-        s.close()
         return last_location
         
     # Func Desc: Read a block of memory and write into a file
@@ -246,14 +380,8 @@ class MemClient(object):
         if (dummy == True):
             command = command | MemClient.DUMMY_FUNC
         sock_msg = struct.pack('IIII', command, length, memory_address, block_size)
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.host, self.port))
-        s.sendall(sock_msg)
-        s.sendall(filename)
-        
-        response = recvall(s, 12)
+        response = self._command(sock_msg, 12, filename)
         (response_command, response_length, val) = struct.unpack('III', response)
-        s.close()
         check_for_error(response_command)    
         return 0
         
@@ -265,14 +393,8 @@ class MemClient(object):
         if (dummy == True):
             command = command | MemClient.DUMMY_FUNC
         sock_msg = struct.pack('IIII', command, length, memory_address, block_size)
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.host, self.port))
-        s.sendall(sock_msg)
-        s.sendall(filename)
-        
-        response = recvall(s, 12)
+        response = self._command(sock_msg, 12, filename)
         (response_command, response_length, val) = struct.unpack('III', response)
-        s.close()
 
     # Func Desc: Send DC590 command as a string.
     def send_dc590(self, i2c_output_base_reg, i2c_input_base_reg, DC590_command, dummy = False):
@@ -282,6 +404,10 @@ class MemClient(object):
         if (dummy == True):
             command = command | MemClient.DUMMY_FUNC   
         sock_msg = struct.pack('IIII', command, length, i2c_output_base_reg, i2c_input_base_reg)
+        if self.shadow is not None and not dummy:
+            # the daemon bit-bangs I2C through these
+            self.shadow.invalidate(i2c_output_base_reg)
+            self.shadow.invalidate(i2c_input_base_reg)
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         s.connect((self.host, self.port))
         s.sendall(sock_msg)
@@ -392,16 +518,12 @@ class MemClient(object):
             command = command | MemClient.DUMMY_FUNC
         print command
         sock_msg = struct.pack('IIII', command, length, address, size)
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.host, self.port))
-        s.sendall(sock_msg)
-
-        s.sendall(data_array)
-        response = recvall(s, 12)
+        if self.shadow is not None and not dummy:
+            self.shadow.invalidate(address)
+        response = self._command(sock_msg, 12, data_array)
         # third parameter is the register location that was last written into
         #last_location = struct.unpack('III', response)[2]
         (response_command, response_length, last_location) = struct.unpack('III', response)
-        s.close()
 
         return last_location            
 
@@ -415,14 +537,10 @@ class MemClient(object):
         if (dummy == True):
             command = command | MemClient.DUMMY_FUNC
         sock_msg = struct.pack('III', command, length, val)
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.host, self.port))
-        s.sendall(sock_msg)
-        response = recvall(s, 12)
+        response = self._command(sock_msg, 12)
         
         # third parameter is the register location that was written into
         (response_command, response_length, count) = struct.unpack('III', response)
-        s.close()
         return count
         
     def i2c_write_byte(self, slave_address, part_command, num_of_bytes, val, dummy = False):       
@@ -431,19 +549,11 @@ class MemClient(object):
         if (dummy == True):
             command = command | MemClient.DUMMY_FUNC
         sock_msg = struct.pack('IIIII', command, length, slave_address, part_command, num_of_bytes)
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.host, self.port))
-        s.sendall(sock_msg)
-
         # transmit each value as a string (32 bits)
-        for i in range(0, num_of_bytes):
-            value = struct.pack('I', val[i])            
-            s.sendall(value)
-
-        response = recvall(s, 12)
+        values = struct.pack('I' * num_of_bytes, *val[0:num_of_bytes])
+        response = self._command(sock_msg, 12, values)
         # third parameter is the register location that was last written into
         (response_command, response_length, response_val) = struct.unpack('III', response)
-        s.close()
         return response_val
         
     def i2c_testing(self, dummy = False):
@@ -454,11 +564,7 @@ class MemClient(object):
             command = command | MemClient.DUMMY_FUNC
         val = 0xFF
         sock_msg = struct.pack('III', command, length, val)
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.host, self.port))
-        s.sendall(sock_msg)
-        response = recvall(s, 12)
-        s.close()
+        response = self._command(sock_msg, 12)
         (response_command, response_length, val) = struct.unpack('III', response)
         if(val == 0xFF):
             return True
@@ -472,11 +578,7 @@ class MemClient(object):
             command = command | MemClient.DUMMY_FUNC
         val = 0xFF
         sock_msg = struct.pack('III', command, length, val)
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.host, self.port))
-        s.sendall(sock_msg)
-        response = recvall(s, 12)
-        s.close()
+        response = self._command(sock_msg, 12)
         (response_command, response_length, val) = struct.unpack('III', response)
         if(val == 0xFF):
             return True
@@ -507,17 +609,84 @@ class MemClient(object):
             command = command | MemClient.DUMMY_FUNC
         val = 0x48414C54 # "HALT" in ASCII
         sock_msg = struct.pack('III', command, length, val)
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((self.host, self.port))
-        s.sendall(sock_msg)
-        response = recvall(s, 12)
-        s.close()
+        response = self._command(sock_msg, 12)
+        self.close()
         (response_command, response_length, halt_command) = struct.unpack('III', response)
         if(halt_command == 0x48414C54):
             return True
         else:
             return False
 
+
+class Pipeline(object):
+    """Queue register and memory commands and send them back to back.
+
+    All queued commands go out in a single write, then their 12-byte
+    responses are read back and matched up in order. Needs a daemon that
+    serves more than one command per connection, best used with a persistent
+    MemClient:
+
+        with client.pipeline() as p:
+            p.reg_write(LED_BASE, 0x55)
+            p.reg_read(REV_ID_BASE)
+        led_location, rev_id = p.results
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.results = None
+        self._messages = []
+
+    # support "with" semantics, the queue is sent on a clean exit
+    def __enter__(self):
+        return self
+
+    # support "with" semantics
+    def __exit__(self, vtype, value, traceback):
+        if vtype is None:
+            self.execute()
+
+    def _queue(self, cmd_id, dummy, *args):
+        command = cmd_id | MemClient.COMMAND_SENT
+        if (dummy == True):
+            command = command | MemClient.DUMMY_FUNC
+        length = 8 + 4 * len(args)
+        self._messages.append(struct.pack('II' + 'I' * len(args), command, length, *args))
+
+    def reg_read(self, address, dummy = False):
+        check_address_range(address)
+        self._queue(MemClient.REG_READ, dummy, address)
+
+    def reg_write(self, address, value, dummy = False):
+        check_address_range(address)
+        # queued writes are always sent, the shadow just forgets the register
+        if self.client.shadow is not None and not dummy:
+            self.client.shadow.invalidate(address)
+        self._queue(MemClient.REG_WRITE, dummy, address, value)
+
+    def mem_read(self, address, dummy = False):
+        check_address_range(address)
+        self._queue(MemClient.MEM_READ, dummy, address)
+
+    def mem_write(self, address, value, dummy = False):
+        check_address_range(address)
+        self._queue(MemClient.MEM_WRITE, dummy, address, value)
+
+    # Func Desc: Send everything queued, return the third response word of
+    # each command (value read or location written) in the order queued.
+    def execute(self):
+        messages = self._messages
+        self._messages = []
+        self.results = []
+        if len(messages) == 0:
+            return self.results
+        response = self.client._command(b''.join(messages), 12 * len(messages))
+        for i in range(len(messages)):
+            (response_command, response_length, value) = struct.unpack_from('III', response, 12 * i)
+            check_for_error(response_command)
+            self.results.append(value)
+        return self.results
+
         
 if __name__ == '__main__':
     client = MemClient()
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (c) 2016, Linear Technology Corp.(LTC)
+    All rights reserved.
+
+    Redistribution and use in source and binary forms, with or without
+    modification, are permitted provided that the following conditions are met:
+
+    1. Redistributions of source code must retain the above copyright notice, 
+       this list of conditions and the following disclaimer.
+    2. Redistributions in binary form must reproduce the above copyright 
+       notice, this list of conditions and the following disclaimer in the 
+       documentation and/or other materials provided with the distribution.
+
+    THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE 
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE 
+    ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE 
+    LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+    CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF 
+    SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+    INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN 
+    CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+    ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
+    POSSIBILITY OF SUCH DAMAGE.
+
+    The views and conclusions contained in the software and documentation are 
+    those of the authors and should not be interpreted as representing official
+    policies, either expressed or implied, of Linear Technology Corp.
+
+    Description:
+        Runs captures on several controllers at once. Boards are described
+        with the same keys as code_generator/demoboards.toml, e.g.
+
+            import llt.common.multi_board as mb
+            configs = mb.load_board_configs(["LTC2378-20 DC1925A-A",
+                                             "LTC2174-14 DC1525A-B"])
+            with mb.MultiBoard(configs) as boards:
+                results = boards.collect(32 * 1024)
+            for serial, result in results.items():
+                print serial, result.collect_time
+
+        Each board is configured, collected, read and fixed in its own worker
+        thread. The controller DLL releases the GIL while it waits on USB, so
+        the time for a round is close to that of the slowest board. Several
+        boards on the same controller type work, each board gets a controller
+        no other board holds (see functions.get_controller_by_eeprom). Add a
+        "serial_number" to the configs of identical boards to choose which
+        controller each one uses.
+"""
+
+import os
+import sys
+import time
+import collections
+from multiprocessing.pool import ThreadPool
+import llt.common.constants as consts
+import llt.common.functions as funcs
+
+DEMOBOARDS_TOML = os.path.join(os.path.dirname(os.path.abspath(__file__)), 
+                               '..', 'code_generator', 'demoboards.toml')
+
+# data is what Demoboard.collect returns, times are in seconds
+BoardResult = collections.namedtuple('BoardResult', 
+    ['name', 'data', 'configure_time', 'collect_time'])
+
+def load_board_configs(names, toml_file_name = DEMOBOARDS_TOML):
+    """Return the demoboards.toml entries called names, e.g.
+    "LTC2378-20 DC1925A-A", with a "name" key added. Needs the toml package."""
+    import toml
+    with open(toml_file_name) as f:
+        all_configs = toml.loads(f.read())
+    configs = []
+    for name in names:
+        config = dict(all_configs[name])
+        config["name"] = name
+        configs.append(config)
+    return configs
+
+def _to_int(value):
+    return int(value, 0) if isinstance(value, basestring) else int(value)
+
+def _spi_reg_values(config):
+    spi_reg = config.get("spi_reg", [])
+    if isinstance(spi_reg, basestring):
+        spi_reg = [x for x in spi_reg.split(",") if x.strip()]
+    return [_to_int(x) for x in spi_reg]
+
+def make_demoboard(config, verbose = False):
+    """Construct the Demoboard (or SockitBoard) described by a config dict."""
+    controller = config["controller"].upper()
+    if controller == "DC718":
+        import llt.common.dc718 as dc718
+        return dc718.Demoboard(dc_number         = config["dc_number"],
+                               is_positive_clock = config["is_positive_clock"],
+                               num_bits          = config["num_bits"],
+                               alignment         = config["alignment"],
+                               is_bipolar        = config["is_bipolar"],
+                               verbose           = verbose,
+                               serial_number     = config.get("serial_number"))
+    elif controller == "DC890":
+        import llt.common.dc890 as dc890
+        return dc890.Demoboard(dc_number         = config["dc_number"],
+                               fpga_load         = config["fpga_load"],
+                               num_channels      = config.get("num_channels", 1),
+                               is_positive_clock = config["is_positive_clock"],
+                               num_bits          = config["num_bits"],
+                               alignment         = config["alignment"],
+                               is_bipolar        = config["is_bipolar"],
+                               spi_reg_values    = _spi_reg_values(config),
+                               verbose           = verbose,
+                               serial_number     = config.get("serial_number"))
+    elif controller == "DC1371":
+        import llt.common.dc1371 as dc1371
+        if config.get("num_chip_selects", 1) == 2:
+            board_class = dc1371.Demoboard2ChipSelects
+        else:
+            board_class = dc1371.Demoboard
+        return board_class(dc_number      = config["dc_number"],
+                           fpga_load      = config["fpga_load"],
+                           num_channels   = config.get("num_channels", 1),
+                           num_bits       = config["num_bits"],
+                           alignment      = config["alignment"],
+                           is_bipolar     = config["is_bipolar"],
+                           demo_config    = _to_int(config["demo_config"]),
+                           spi_reg_values = _spi_reg_values(config),
+                           verbose        = verbose,
+                           serial_number  = config.get("serial_number"))
+    elif controller == "SOCKIT":
+        return SockitBoard(config["host"], config.get("port", 1992))
+    else:
+        raise ValueError("Unknown controller " + config["controller"])
+
+def board_serial_number(board):
+    if isinstance(board, SockitBoard):
+        return board.host
+    return board.controller.get_serial_number()
+
+class SockitBoard(object):
+    """A SoCkit capture system behind the Demoboard collect interface.
+
+    collect returns the raw 32 bit words as a uint32 array, the conversion
+    depends on the FPGA load (see sockit_system_functions).
+    """
+    def __init__(self, host, port = 1992):
+        from llt.common.mem_func_client_2 import MemClient
+        self.host = host
+        self.client = MemClient(host = host, port = port, persistent = True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, vtype, value, traceback):
+        self.client.close()
+
+    def collect(self, num_samples, trigger, timeout = 5):
+        import llt.utils.sockit_system_functions as sockit
+        if trigger == consts.TRIGGER_NONE:
+            trigger = sockit.TRIG_NOW
+        start_address = sockit.sockit_start_capture(self.client, num_samples,
+                                                    trigger, timeout = timeout)
+        return self.client.mem_read_block_array(start_address, num_samples)
+
+class _Failure(object):
+    # an exception from a worker, kept so every board finishes before raising
+    def __init__(self, exc_info):
+        self.exc_info = exc_info
+
+def _call(func, *args):
+    try:
+        return func(*args)
+    except Exception:
+        return _Failure(sys.exc_info())
+
+def _raise_first_error(results):
+    for result in results:
+        if isinstance(result, _Failure):
+            raise result.exc_info[0], result.exc_info[1], result.exc_info[2]
+
+class MultiBoard(object):
+    """Configure a list of boards concurrently and collect from all of them.
+
+    configs is a list of demoboards.toml style dicts. A config can also carry
+    "trigger", "timeout", "is_randomized" and "is_alternate_bit" for its
+    collect, and a "serial_number" to pick its controller. Boards stay
+    configured between collect calls.
+    """
+    def __init__(self, configs, verbose = False, num_threads = None):
+        self.configs = list(configs)
+        self._pool = ThreadPool(num_threads or len(self.configs))
+        self.boards = []
+        self.serial_numbers = []
+        self.configure_times = []
+        results = self._pool.map(lambda config: _call(self._configure, config, verbose), 
+                                 self.configs)
+        for result in results:
+            board, serial_number, configure_time = \
+                (result, None, None) if isinstance(result, _Failure) else result
+            self.boards.append(board)
+            self.serial_numbers.append(serial_number)
+            self.configure_times.append(configure_time)
+        try:
+            _raise_first_error(results)
+            for i, serial_number in enumerate(self.serial_numbers):
+                if serial_number in self.serial_numbers[:i]:
+                    raise ValueError("Two boards use the controller " + serial_number)
+        except:
+            self.close() # there will be no __exit__ if __init__ raises
+            raise
+
+    @staticmethod
+    def _configure(config, verbose):
+        start = time.time()
+        board = make_demoboard(config, verbose)
+        serial_number = board_serial_number(board)
+        return board, serial_number, time.time() - start
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, vtype, value, traceback):
+        self.close()
+
+    def close(self):
+        for board in self.boards:
+            if isinstance(board, SockitBoard):
+                board.client.close()
+            elif not isinstance(board, _Failure):
+                funcs.forget_controller(board.controller)
+        self._pool.close()
+        self._pool.join()
+
+    def _collect_one(self, index, num_samples):
+        config = self.configs[index]
+        collect_kw = {}
+        for key in ("is_randomized", "is_alternate_bit"):
+            if key in config:
+                collect_kw[key] = config[key]
+        start = time.time()
+        data = self.boards[index].collect(num_samples, 
+                                          config.get("trigger", consts.TRIGGER_NONE),
+                                          config.get("timeout", 5), **collect_kw)
+        return BoardResult(config.get("name", config.get("dc_number")), data, 
+                           self.configure_times[index], time.time() - start)
+
+    def collect(self, num_samples):
+        """Collect num_samples from every board at once.
+
+        Returns {serial number: BoardResult}. An exception on any board is
+        raised here after all the others have finished.
+        """
+        results = self._pool.map(lambda i: _call(self._collect_one, i, num_samples), 
+                                 range(len(self.boards)))
+        _raise_first_error(results)
+        return dict(zip(self.serial_numbers, results))
+
+def collect_all(configs, num_samples, verbose = False):
+    """Configure, collect from and release the boards in configs in one go."""
+    with MultiBoard(configs, verbose) as boards:
+        return boards.collect(num_samples)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+    Copyright (c) 2016, Linear Technology Corp.(LTC)
+    All rights reserved.
+
+    Redistribution and use in source and binary forms, with or without
+    modification, are permitted provided that the following conditions are met:
+
+    1. Redistributions of source code must retain the above copyright notice, 
+       this list of conditions and the following disclaimer.
+    2. Redistributions in binary form must reproduce the above copyright 
+       notice, this list of conditions and the following disclaimer in the 
+       documentation and/or other materials provided with the distribution.
+
+    THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE 
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE 
+    ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE 
+    LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+    CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF 
+    SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+    INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN 
+    CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+    ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
+    POSSIBILITY OF SUCH DAMAGE.
+
+    The views and conclusions contained in the software and documentation are 
+    those of the authors and should not be interpreted as representing official
+    policies, either expressed or implied, of Linear Technology Corp.
+
+
+    Description:
+        Write-through shadow of device registers. Redundant writes (the
+        register already holds the value) are not sent and reads of a register
+        whose value is known are answered locally. Registers the hardware
+        changes by itself (status, ready flags, ring buffer pointers) or that
+        act on every write (strobes, data ports) must be marked volatile, they
+        always go to the bus and are never remembered.
+
+            shadow = RegisterShadow(volatile = [DATA_READY_BASE])
+            value = shadow.read(REV_ID_BASE, read_func)
+            shadow.write(LED_BASE, 0x55, write_func)
+            print shadow.summary()
+
+        MemClient(shadow = True) and Controller.hs_fpga_enable_shadow use one.
+"""
+
+class RegisterShadow(object):
+    """Remembers the last value read from or written to each register."""
+    def __init__(self, volatile = ()):
+        self.volatile = set(volatile)
+        self._values = {}
+        # bus transactions sent and avoided
+        self.reads = 0
+        self.writes = 0
+        self.reads_avoided = 0
+        self.writes_avoided = 0
+
+    def read(self, address, read_func):
+        """Return the value of address, from the shadow if it is known,
+        otherwise from read_func(address)."""
+        if address not in self.volatile:
+            value = self._values.get(address)
+            if value is not None:
+                self.reads_avoided += 1
+                return value
+        value = read_func(address)
+        self.reads += 1
+        self.store(address, value)
+        return value
+
+    def write(self, address, value, write_func):
+        """Call write_func(address, value) unless address already holds
+        value. Returns False if nothing was sent."""
+        if address not in self.volatile and self._values.get(address) == value:
+            self.writes_avoided += 1
+            return False
+        # the register is in an unknown state if the write fails
+        self._values.pop(address, None)
+        write_func(address, value)
+        self.writes += 1
+        self.store(address, value)
+        return True
+
+    def get(self, address):
+        """Return the shadow value of address, None if it is not known."""
+        return self._values.get(address)
+
+    def store(self, address, value):
+        """Record a value written or read some other way."""
+        if address not in self.volatile:
+            self._values[address] = value
+
+    def invalidate(self, address = None):
+        """Forget the value of address, or of all registers if None."""
+        if address is None:
+            self._values.clear()
+        else:
+            self._values.pop(address, None)
+
+    def mark_volatile(self, *addresses):
+        for address in addresses:
+            self.volatile.add(address)
+            self._values.pop(address, None)
+
+    def transactions_avoided(self):
+        return self.reads_avoided + self.writes_avoided
+
+    def reset_counts(self):
+        self.reads = self.writes = self.reads_avoided = self.writes_avoided = 0
+
+    def summary(self):
+        return "%d of %d register writes and %d of %d reads avoided" % (
+            self.writes_avoided, self.writes + self.writes_avoided,
+            self.reads_avoided, self.reads + self.reads_avoided)
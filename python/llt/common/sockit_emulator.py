@@ -0,0 +1,468 @@
+#!/usr/bin/python
+# Stand-in for mem_func_daemon_2, so MemClient / AsyncMemClient code and the
+# sockit_* capture functions can be run and benchmarked without a SoCkit:
+#
+#   with SockitEmulator(port = 1992, pattern = 'sine') as emulator:
+#       client = MemClient('127.0.0.1', emulator.port, persistent = True)
+#       data = sockit_capture(client, 2**16, trigger = TRIG_NOW)
+#
+# or from a shell: python sockit_emulator.py [port [ramp|sine|noise]]
+#
+# Registers live in a dict, DDR in a numpy array. The capture registers
+# (CONTROL, NUM_SAMPLES, DATA_READY, BUFFER_ADDRESS) behave like the
+# cmos_32bit_capture / DC2390 loads: a trigger writes NUM_SAMPLES + 128
+# samples of the selected pattern into the DDR ring buffer and DATA_READY
+# stays busy for as long as the capture would take at sample_rate.
+# DATAPATH_CONTROL = RAMP_DATA selects the 32 bit counter, anything else the
+# "ADC" pattern. TRIG_KEY1 / TRIG_X10 captures wait for trigger().
+#
+# "dummy" commands use their own registers and memory, so they never
+# disturb the capture state.
+#
+# latency (seconds) is added once per round trip: responses are held until
+# the client has no more commands in flight, so pipelined commands pay it
+# once. bandwidth (bytes/second) paces the payload in both directions.
+
+import SocketServer
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+import numpy as np
+
+from llt.common.mem_func_client_2 import MemClient, recvall, recvall_into
+
+EXPANDER_CTRL_BASE = 0x00
+REV_ID_BASE = 0x10
+CONTROL_BASE = 0x20
+DATA_READY_BASE = 0x30
+NUM_SAMPLES_BASE = 0x50
+DATAPATH_CONTROL_BASE = 0xD0
+BUFFER_ADDRESS_BASE = 0x100
+SPI_PORT_BASE = 0x800
+SPI_RXDATA = 0x00
+SPI_TXDATA = 0x04
+SPI_SS = 0x14
+
+CW_START = 0x01
+TRIG_NOW = 0x02
+RAMP_DATA = 0x04
+
+RING_SIZE = 2**30 # bytes, BUFFER_ADDRESS wraps at this
+PRE_TRIGGER = 128 # samples stored ahead of the trigger point
+HALT = 0x48414C54
+
+PATTERNS = ('ramp', 'sine', 'noise')
+_CHUNK = 2**20 # samples generated / bytes paced at a time
+
+class SockitEmulator(object):
+    """Threaded TCP server speaking the mem_func_daemon_2 protocol.
+
+    pattern         -- 'ramp', 'sine' or 'noise', the "ADC" data captured
+    num_bits        -- ADC resolution, samples are sign extended to 32 bits
+    frequency       -- sine frequency in Hz, amplitude is a fraction of full scale
+    noise           -- rms noise in LSBs, added to the sine or the noise pattern
+    sample_rate     -- sets how long DATA_READY stays busy after a trigger
+    ddr_size        -- bytes of DDR kept, a power of 2 up to RING_SIZE.
+                       Addresses wrap at this size.
+    latency         -- seconds added per round trip
+    bandwidth       -- link speed in bytes/s, None for as fast as possible
+    rev_id          -- value of the REV_ID register (rev << 16 | type)
+    eeprom_id       -- string returned by DC590 EEPROM reads
+    """
+    def __init__(self, host = '127.0.0.1', port = 1992, pattern = 'sine',
+                 num_bits = 18, frequency = 1.0e6, amplitude = 0.9, noise = 1.0,
+                 sample_rate = 50.0e6, ddr_size = 64 * 2**20, latency = 0.0,
+                 bandwidth = None, rev_id = 0x1246ABCD,
+                 eeprom_id = 'LTC2500-32,DC2390A-A,EMULATOR\n'):
+        if pattern not in PATTERNS:
+            raise ValueError('pattern must be one of ' + ', '.join(PATTERNS))
+        if ddr_size & (ddr_size - 1) or not 4 <= ddr_size <= RING_SIZE:
+            raise ValueError('ddr_size must be a power of 2 up to %d' % RING_SIZE)
+        self.pattern = pattern
+        self.num_bits = num_bits
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.noise = noise
+        self.sample_rate = float(sample_rate)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.eeprom_id = eeprom_id
+        self.ddr_size = ddr_size
+        self.ddr = np.zeros(ddr_size / 4, dtype=np.uint32)
+        self.files = {} # MEM_READ_TO_FILE / FILE_TRANSFER land here
+        self.luts = {}
+        self._registers = {REV_ID_BASE: rev_id}
+        self._dummy_registers = {}
+        self._dummy_memory = {}
+        self._lock = threading.RLock()
+        # capture state
+        self._running = False
+        self._triggered = False
+        self._done_time = 0.0
+        self._write_address = 0
+        self._stop_address = 0
+        self._sample_count = 0 # pattern phase, carries over between captures
+        self._ramp_count = 0
+        self._random = np.random.RandomState(0)
+        # SPI port: 32 bit MOSI to MISO delay, like the loopback test jig
+        self._spi_delay = [0, 0, 0, 0]
+        self._spi_rx = 0xFF
+        self._eeprom_pointer = 0
+        self._server = _Server((host, port), _Handler)
+        self._server.emulator = self
+        self.host, self.port = self._server.server_address
+        self._thread = None
+
+    # support "with" semantics, the server runs in the background meanwhile
+    def __enter__(self):
+        self.start()
+        return self
+
+    # support "with" semantics
+    def __exit__(self, vtype, value, traceback):
+        self.stop()
+
+    def start(self):
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target = self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def trigger(self):
+        """External trigger (KEY1 / X10) for a capture that is waiting."""
+        with self._lock:
+            if self._running and not self._triggered:
+                self._capture()
+
+    # registers
+
+    def reg_read(self, address, dummy = False):
+        with self._lock:
+            if dummy:
+                return self._dummy_registers.get(address, 0)
+            if address == DATA_READY_BASE:
+                busy = self._running and (not self._triggered or
+                                          time.time() < self._done_time)
+                return 1 if busy else 0
+            if address == BUFFER_ADDRESS_BASE:
+                return self._stop_address if self._triggered else self._write_address
+            if address == SPI_PORT_BASE | SPI_RXDATA:
+                return self._spi_rx
+            return self._registers.get(address, 0)
+
+    def reg_write(self, address, value, dummy = False):
+        with self._lock:
+            if dummy:
+                self._dummy_registers[address] = value
+                return
+            if address == REV_ID_BASE:
+                return
+            previous = self._registers.get(address, 0)
+            self._registers[address] = value
+            if address == CONTROL_BASE:
+                self._control(previous, value)
+            elif address == SPI_PORT_BASE | SPI_TXDATA:
+                self._spi_delay.append(value & 0xFF)
+                byte = self._spi_delay.pop(0)
+                selected = self._registers.get(SPI_PORT_BASE | SPI_SS, 0) != 0
+                self._spi_rx = byte if selected else 0xFF
+
+    def _control(self, previous, value):
+        if value & CW_START:
+            if not previous & CW_START:
+                self._running = True
+                self._triggered = False
+            if value & TRIG_NOW and not self._triggered:
+                self._capture()
+        else:
+            self._running = False
+
+    # memory, addresses wrap at ddr_size
+
+    def _word_indices(self, address, size):
+        start = (address % self.ddr_size) / 4
+        if start + size <= len(self.ddr):
+            return slice(start, start + size)
+        return np.arange(start, start + size) % len(self.ddr)
+
+    def mem_read_block(self, address, size, dummy = False):
+        """Return size words from address as a uint32 array (a copy)."""
+        with self._lock:
+            if dummy:
+                block = np.zeros(size, dtype=np.uint32)
+                for word_address, value in self._dummy_memory.items():
+                    offset = (word_address - address) / 4
+                    if word_address >= address and offset < size:
+                        block[offset] = value
+                return block
+            indices = self._word_indices(address, size)
+            if isinstance(indices, slice):
+                return self.ddr[indices].copy()
+            return self.ddr.take(indices)
+
+    def mem_write_block(self, address, values, dummy = False):
+        with self._lock:
+            if dummy:
+                for i, value in enumerate(values):
+                    self._dummy_memory[address + 4 * i] = int(value)
+                return
+            self.ddr[self._word_indices(address, len(values))] = values
+
+    # capture
+
+    def _capture(self):
+        num_samples = self._registers.get(NUM_SAMPLES_BASE, 0) + PRE_TRIGGER
+        use_ramp = self.pattern == 'ramp' or \
+            self._registers.get(DATAPATH_CONTROL_BASE, 0) & RAMP_DATA
+        address = self._write_address
+        for start in xrange(0, num_samples, _CHUNK):
+            count = min(_CHUNK, num_samples - start)
+            if use_ramp:
+                values = self._ramp(count)
+            else:
+                values = self._adc(count)
+            self.ddr[self._word_indices(address, count)] = values
+            address += 4 * count
+        self._stop_address = address % RING_SIZE
+        self._write_address = self._stop_address
+        self._triggered = True
+        self._done_time = time.time() + num_samples / self.sample_rate
+
+    def _ramp(self, count):
+        values = np.arange(self._ramp_count, self._ramp_count + count,
+                           dtype=np.uint64).astype(np.uint32)
+        self._ramp_count = (self._ramp_count + count) % 2**32
+        return values
+
+    def _adc(self, count):
+        full_scale = 2**(self.num_bits - 1)
+        if self.pattern == 'sine':
+            n = np.arange(self._sample_count, self._sample_count + count)
+            values = self.amplitude * full_scale * \
+                np.sin(2 * np.pi * self.frequency / self.sample_rate * n)
+        else:
+            values = np.zeros(count)
+        self._sample_count += count
+        if self.noise:
+            values += self._random.normal(0.0, self.noise, count)
+        codes = np.clip(np.round(values), -full_scale, full_scale - 1)
+        return codes.astype(np.int32).view(np.uint32)
+
+    # DC590 strings: only the EEPROM (I2C address 0xA0 / 0xA1) answers.
+    # "S" bytes after a write address set the EEPROM pointer, "Q" / "R"
+    # read the next byte back as two hex characters.
+    def dc590(self, command):
+        response = []
+        i2c_address = None
+        pointer_set = False
+        pointer = self._eeprom_pointer
+        i = 0
+        while i < len(command):
+            c = command[i]
+            if c == 's':
+                i2c_address = None
+                pointer_set = False
+            elif c == 'S':
+                byte = int(command[i + 1:i + 3], 16)
+                i += 2
+                if i2c_address is None:
+                    i2c_address = byte
+                elif i2c_address == 0xA0 and not pointer_set:
+                    pointer = byte
+                    pointer_set = True
+            elif c in 'QR':
+                if i2c_address == 0xA1:
+                    eeprom = self.eeprom_id
+                    value = ord(eeprom[pointer]) if pointer < len(eeprom) else 0xFF
+                    pointer += 1
+                else:
+                    value = 0xFF
+                response.append('%02X' % value)
+            i += 1
+        self._eeprom_pointer = pointer
+        return ''.join(response)
+
+class _Server(SocketServer.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+class _Handler(SocketServer.BaseRequestHandler):
+    """Serves commands until the client closes the connection."""
+
+    def setup(self):
+        self.emulator = self.server.emulator
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._responses = []
+
+    def handle(self):
+        while True:
+            try:
+                header = self.request.recv(8)
+                if not header:
+                    break
+                if len(header) < 8:
+                    header += recvall(self.request, 8 - len(header))
+                (command, length) = struct.unpack('II', header)
+                if not self._dispatch(command, length):
+                    break
+                self._flush_if_idle()
+            except (EOFError, socket.error):
+                break
+
+    def _receive(self, length):
+        data = recvall(self.request, length) if length > 0 else b''
+        self._pace(len(data))
+        return data
+
+    def _receive_words(self, size):
+        raw_bytes = np.empty(size * 4, dtype=np.uint8)
+        if size:
+            recvall_into(self.request, raw_bytes)
+        self._pace(len(raw_bytes))
+        return raw_bytes.view('<u4')
+
+    def _pace(self, num_bytes):
+        if self.emulator.bandwidth:
+            time.sleep(float(num_bytes) / self.emulator.bandwidth)
+
+    def _respond(self, data):
+        self._responses.append(data)
+
+    def _word(self, command, value, error = False):
+        command = command | MemClient.RESPONSE_RECEIVED
+        if error:
+            command = command | MemClient.ERROR
+        self._respond(struct.pack('III', command, 12, value & 0xFFFFFFFF))
+
+    # Responses go out once the client has nothing more in flight, one
+    # latency per round trip.
+    def _flush_if_idle(self):
+        readable, _, _ = select.select([self.request], [], [], 0)
+        if not readable:
+            self.flush()
+
+    def flush(self):
+        if not self._responses:
+            return
+        if self.emulator.latency:
+            time.sleep(self.emulator.latency)
+        data = b''.join(self._responses)
+        self._responses = []
+        if not self.emulator.bandwidth:
+            self.request.sendall(data)
+            return
+        view = memoryview(data)
+        for start in xrange(0, len(data), _CHUNK):
+            self.request.sendall(view[start:start + _CHUNK])
+            self._pace(min(_CHUNK, len(data) - start))
+
+    # Returns False when the connection should be closed.
+    def _dispatch(self, command, length):
+        emulator = self.emulator
+        dummy = bool(command & MemClient.DUMMY_FUNC)
+        cmd_id = command & 0xFFFF
+        if cmd_id in (MemClient.REG_READ, MemClient.MEM_READ, MemClient.I2C_IDENTIFY,
+                      MemClient.I2C_TESTING, MemClient.I2C_READ_EEPROM,
+                      MemClient.SHUTDOWN):
+            (value, ) = struct.unpack('I', self._receive(4))
+            if cmd_id == MemClient.REG_READ:
+                self._word(command, emulator.reg_read(value, dummy))
+            elif cmd_id == MemClient.MEM_READ:
+                self._word(command, emulator.mem_read_block(value, 1, dummy)[0])
+            elif cmd_id == MemClient.I2C_IDENTIFY:
+                self._word(command, 1)
+            elif cmd_id == MemClient.SHUTDOWN:
+                self._word(command, value)
+                if value == HALT and not dummy:
+                    self.flush()
+                    threading.Thread(target = self.server.shutdown).start()
+                    return False
+            else:
+                self._word(command, 0xFF)
+        elif cmd_id in (MemClient.REG_WRITE, MemClient.MEM_WRITE):
+            (address, value) = struct.unpack('II', self._receive(8))
+            if cmd_id == MemClient.REG_WRITE:
+                emulator.reg_write(address, value, dummy)
+            else:
+                emulator.mem_write_block(address, [value], dummy)
+            self._word(command, address)
+        elif cmd_id in (MemClient.REG_READ_BLOCK, MemClient.MEM_READ_BLOCK):
+            (address, size) = struct.unpack('II', self._receive(8))
+            if cmd_id == MemClient.REG_READ_BLOCK:
+                block = np.array([emulator.reg_read(address + 4 * i, dummy)
+                                  for i in xrange(size)], dtype=np.uint32)
+            else:
+                block = emulator.mem_read_block(address, size, dummy)
+            self._respond(block.astype('<u4').tobytes())
+        elif cmd_id in (MemClient.REG_WRITE_BLOCK, MemClient.MEM_WRITE_BLOCK,
+                        MemClient.REG_WRITE_LUT):
+            (address, size) = struct.unpack('II', self._receive(8))
+            values = self._receive_words(size)
+            if cmd_id == MemClient.MEM_WRITE_BLOCK:
+                emulator.mem_write_block(address, values, dummy)
+            elif cmd_id == MemClient.REG_WRITE_LUT:
+                with emulator._lock:
+                    emulator.luts[address] = values.copy()
+            else:
+                for i in xrange(size):
+                    emulator.reg_write(address + 4 * i, int(values[i]), dummy)
+            self._word(command, address + (size - 1) * 4)
+        elif cmd_id in (MemClient.MEM_READ_TO_FILE, MemClient.MEM_WRITE_FROM_FILE):
+            (address, size) = struct.unpack('II', self._receive(8))
+            filename = self._receive(length - 16)
+            if cmd_id == MemClient.MEM_READ_TO_FILE:
+                block = emulator.mem_read_block(address, size, dummy)
+                with emulator._lock:
+                    emulator.files[filename] = block.astype('<u4').tobytes()
+            else:
+                with emulator._lock:
+                    data = emulator.files.get(filename, b'')
+                block = np.zeros(size, dtype=np.uint32)
+                stored = np.frombuffer(data[:size * 4], dtype='<u4')
+                block[:len(stored)] = stored
+                emulator.mem_write_block(address, block, dummy)
+            self._word(command, 0)
+        elif cmd_id == MemClient.I2C_WRITE_BYTE:
+            (slave_address, part_command, num_of_bytes) = struct.unpack('III', self._receive(12))
+            self._receive(length - 20)
+            self._word(command, 0xFF)
+        elif cmd_id == MemClient.FILE_TRANSFER:
+            (path_size, ) = struct.unpack('I', self._receive(4))
+            path = self._receive(path_size)
+            data = self._receive(length - 12 - path_size)
+            with emulator._lock:
+                emulator.files[path] = data
+            self._word(command, len(data))
+        elif cmd_id == MemClient.DC590_TPP_COMMANDS:
+            self._receive(8) # I2C base registers
+            response = emulator.dc590(self._receive(length - 16))
+            self._respond(struct.pack('II', command | MemClient.RESPONSE_RECEIVED,
+                                      len(response)) + response)
+        else:
+            self._receive(length - 8)
+            self._word(command, 0, error = True)
+        return True
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 1992
+    pattern = sys.argv[2] if len(sys.argv) > 2 else 'sine'
+    emulator = SockitEmulator(host = '0.0.0.0', port = port, pattern = pattern)
+    print 'SoCkit emulator listening on port %d, %s pattern' % (emulator.port, pattern)
+    try:
+        emulator.serve_forever()
+    except KeyboardInterrupt:
+        pass
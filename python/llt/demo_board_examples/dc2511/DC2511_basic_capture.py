@@ -47,6 +47,7 @@ from matplotlib import pyplot as plt
 # Okay, now the big one... this is the module that communicates with the SoCkit
 from llt.common.mem_func_client_2 import MemClient
 from llt.utils.sockit_system_functions import *
+from llt.utils.sockit_conversions import extract_lanes
 
 # Get the host from the command line argument. Can be numeric or hostname.
 HOST = sys.argv[1] if len(sys.argv) == 2 else '127.0.0.1'
@@ -110,26 +111,8 @@ xfer_start_time = time.time()
 client.reg_write(DATAPATH_CONTROL_BASE, ADC_DATA) # First capture ADC A
 data = sockit_uns32_to_signed32(sockit_capture(client, NUM_SAMPLES, edge = NEG, trigger = TRIG_NOW, timeout = 2.0))
 
-data_ch0 = np.ndarray(NUM_SAMPLES, dtype=int)
-data_ch1 = np.ndarray(NUM_SAMPLES, dtype=int)
-
-if(numbits == 16):
-    for i in range(0, NUM_SAMPLES):
-        data_ch0[i] = (data[i] & 0x0000FFFF)
-        if(data_ch0[i] > 2**15):
-            data_ch0[i] -= 2**16
-        data_ch1[i] = ((data[i] >> 16)& 0x0000FFFF)
-        if(data_ch1[i] > 2**15):
-            data_ch1[i] -= 2**16
-
-if(numbits == 12):
-    for i in range(0, NUM_SAMPLES):
-        data_ch0[i] = (data[i] & 0x00000FFF)
-        if(data_ch0[i] > 2**11):
-            data_ch0[i] -= 2**12
-        data_ch1[i] = (data[i] >> 16 & 0x00000FFF)
-        if(data_ch1[i] > 2**11):
-            data_ch1[i] -= 2**12        
+# Channel 0 is in the lower 16 bits, channel 1 in the upper 16 bits
+data_ch0, data_ch1 = extract_lanes(data, numbits)
 
 if(bit_counter == True): # Simple test to make sure no bits are stuck at zero or one...
     bitmask = 1
@@ -195,30 +178,17 @@ if(mem_bw_test == True):
     client.reg_write(DATAPATH_CONTROL_BASE, ADC_DATA) # Set datapath back to ADC
 
 if DC2511_production_test == True:
-    seed0 = data_ch0[0]
-    seed1 = data_ch1[0]
-    errors_ch0 = 0
-    errors_ch1 = 0
-    for i in range (1, NUM_SAMPLES):
-        # Channel 0
-        if(data_ch0[i] - 1 != seed0):
-        #if(np.abs(data_ch0[i] - 1 - seed0) > 0.0001):
-            errors_ch0 += 1
-            print("ch0 delta: " + str(data_ch0[i] - seed0) + " on point: " + str(i))
-        if(data_ch0[i] == 32768): # Account for rollover...
-            seed0 = -32768
-        else:
-            seed0 = data_ch0[i]
-            
-        # Channel 1
-        if(data_ch1[i] - 1 != seed1):
-        #if(np.abs(data_ch1[i] - 1 - seed1) > 0.0001):
-            errors_ch1 += 1
-            print("ch1 delta: " + str(data_ch1[i] - seed1) + " on point: " + str(i))
-        if(data_ch1[i] == 32768): # Account for rollover...
-            seed1 = -32768
-        else:
-            seed1 = data_ch1[i]            
+    # Test pattern is a counter, every step is +1 modulo 2**numbits
+    deltas_ch0 = np.diff(data_ch0.astype(np.int64))
+    deltas_ch1 = np.diff(data_ch1.astype(np.int64))
+    bad_ch0 = np.flatnonzero(deltas_ch0 % 2**numbits != 1)
+    bad_ch1 = np.flatnonzero(deltas_ch1 % 2**numbits != 1)
+    for i in bad_ch0:
+        print("ch0 delta: " + str(deltas_ch0[i]) + " on point: " + str(i + 1))
+    for i in bad_ch1:
+        print("ch1 delta: " + str(deltas_ch1[i]) + " on point: " + str(i + 1))
+    errors_ch0 = len(bad_ch0)
+    errors_ch1 = len(bad_ch1)
             
     print("DC2511 Production test!!")
     print("Number of errors on ch0: " + str(errors_ch0))
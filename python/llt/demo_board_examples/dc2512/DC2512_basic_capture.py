@@ -39,14 +39,15 @@ FPGA load type ID: 0001 is loaded into the FPGA.
 
 import sys
 from llt.utils.save_for_pscope import save_for_pscope
+from llt.utils.sin_params import windowed_fft_db, BLACKMAN_HARRIS_92
 import numpy as np
-import math
 from time import sleep
 import time
 from matplotlib import pyplot as plt
 # Okay, now the big one... this is the module that communicates with the SoCkit
 from llt.common.mem_func_client_2 import MemClient
 from llt.utils.sockit_system_functions import *
+from llt.utils.sockit_conversions import sign_extend
 
 # Get the host from the command line argument. Can be numeric or hostname.
 HOST = sys.argv[1] if len(sys.argv) == 2 else '127.0.0.1'
@@ -133,23 +134,7 @@ if(grab_filtered_data == False):
     # We're capguring 32-bit wide samples, only 18 of which are connected to the DC2512 header.
     # Mask data appropriately according to ADC resolution.
     # Note that filtered is LEFT justified, so it doesn't need fixing.
-    if(numbits == 18):
-        for i in range(0, NUM_SAMPLES):
-            data[i] = (data[i] & 0x0003FFFF)
-            if(data[i] > 2**17):
-                data[i] -= 2**18
-    
-    if(numbits == 16):
-        for i in range(0, NUM_SAMPLES):
-            data[i] = (data[i] & 0x0000FFFF)
-            if(data[i] > 2**15):
-                data[i] -= 2**16
-    
-    if(numbits == 12):
-        for i in range(0, NUM_SAMPLES):
-            data[i] = (data[i] & 0x00000FFF)
-            if(data[i] > 2**11):
-                data[i] -= 2**12
+    data = sign_extend(data, numbits)
 
 # Simple test to make sure no bits are shorted, either to Vcc, ground, or
 # to adjacent bits.
@@ -170,41 +155,9 @@ if(bit_counter == True):
 timeplot_data = downsample(data, downsample_factor)
 
 
-adc_amplitude = 2.0**(numbits-1)
-
-data_no_dc = data - np.average(data) # Remove DC to avoid leakage when windowing
-
-# Compute window function
-normalization = 1.968888        
-a0 = 0.35875
-a1 = 0.48829
-a2 = 0.14128
-a3 = 0.01168
-
-wind = [0 for x in range(NUM_SAMPLES)]
-for i in range(NUM_SAMPLES):
-    
-    t1 = i / (float(NUM_SAMPLES) - 1.0)
-    t2 = 2 * t1
-    t3 = 3 * t1
-    t1 -= int(t1)
-    t2 -= int(t2)
-    t3 -= int(t3)
-    
-    wind[i] = a0 - \
-              a1*math.cos(2*math.pi*t1) + \
-              a2*math.cos(2*math.pi*t2) - \
-              a3*math.cos(2*math.pi*t3)
-    
-    wind[i] *= normalization;
-
-
-windowed_data = data_no_dc * wind# Apply Blackman window
-freq_domain = np.fft.fft(windowed_data)/(NUM_SAMPLES) # FFT
-freq_domain = freq_domain[0:NUM_SAMPLES/2+1]
-freq_domain_magnitude = np.abs(freq_domain) # Extract magnitude
-freq_domain_magnitude[1:NUM_SAMPLES/2] *= 2 
-freq_domain_magnitude_db = 20 * np.log10(freq_domain_magnitude/adc_amplitude)
+# Remove DC, apply a symmetric Blackman-Harris 92 window and FFT
+freq_domain_magnitude_db = windowed_fft_db(data, numbits, BLACKMAN_HARRIS_92,
+                                           symmetric=True)
 
 
 if plot_data:
@@ -238,15 +191,8 @@ if(mem_bw_test == True):
     
     
 if DC2512_production_test == True:
-    seed = data[0]
-    errors = 0
-    for i in range (1, NUM_SAMPLES):
-        if(data[i] - 1 != seed):
-            errors += 1
-        if(data[i] == 131072): # Account for rollover...
-            seed = -131072
-        else:
-            seed = data[i]
+    # Test pattern is a counter, every step is +1 modulo 2**numbits
+    errors = np.count_nonzero(np.diff(data.astype(np.int64)) % 2**numbits != 1)
     print("DC2512 Production test!!")
     print("Number of errors: " + str(errors))
     
@@ -110,11 +110,10 @@ class Ltc2000():
         self.controller.hs_fpga_write_data_at_address(Ltc2000._FPGA_DAC_PD, 0x01)
         self.set_spi_registers(spi_reg_values)
 
-    def set_spi_registers(self, register_values):
+    def set_spi_registers(self, register_values, skip_unchanged = False):
         self.vprint("Configuring DAC over SPI")
         if register_values != []:
-            for x in range(0,len(register_values), 2):
-                self.controller.spi_send_byte_at_address(register_values[x], register_values[x+1])
+            self.controller.spi_send_register_table(register_values, skip_unchanged)
 
     def send_data(self, data):
         num_samples = len(data)                  
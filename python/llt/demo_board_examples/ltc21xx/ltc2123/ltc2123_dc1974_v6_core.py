@@ -233,13 +233,13 @@ while((runs < 1 or continuous == True) and runs_with_errors < 100000):
         plt.plot(data_ch1)
         plt.show()
 
-        data_ch0 -= np.average(data_ch0)
+        data_ch0 = data_ch0 - np.average(data_ch0)
         data_ch0 = data_ch0 * np.blackman(n.BuffSize/2) # Apply Blackman window
         freq_domain_ch0 = np.fft.fft(data_ch0)/(n.BuffSize/2) # FFT
         freq_domain_magnitude_ch0 = np.abs(freq_domain_ch0) # Extract magnitude
         freq_domain_magnitude_db_ch0 = 20 * np.log10(freq_domain_magnitude_ch0/8192.0)
         
-        data_ch1 -= np.average(data_ch1)
+        data_ch1 = data_ch1 - np.average(data_ch1)
         data_ch1 = data_ch1 * np.blackman(n.BuffSize/2) # Apply Blackman window
         freq_domain_ch1 = np.fft.fft(data_ch1)/(n.BuffSize/2) # FFT
         freq_domain_magnitude_ch1 = np.abs(freq_domain_ch1) # Extract magnitude
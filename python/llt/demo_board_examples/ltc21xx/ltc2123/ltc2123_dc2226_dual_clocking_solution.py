@@ -264,10 +264,10 @@ while((runs < 1 or continuous == 1) and runs_with_errors < 100000):
             plt.show()
 
 
-            data_ch0 -= np.average(data_ch0)
-            data_ch1 -= np.average(data_ch1)
-            data_ch2 -= np.average(data_ch2)
-            data_ch3 -= np.average(data_ch3)
+            data_ch0 = data_ch0 - np.average(data_ch0)
+            data_ch1 = data_ch1 - np.average(data_ch1)
+            data_ch2 = data_ch2 - np.average(data_ch2)
+            data_ch3 = data_ch3 - np.average(data_ch3)
 
 
 
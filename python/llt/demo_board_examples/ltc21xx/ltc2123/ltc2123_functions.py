@@ -44,6 +44,9 @@ either expressed or implied, of Linear Technology Corp.
 '''
 
 import llt.common.constants as consts
+import llt.utils.save_for_pscope as pscope
+import llt.utils.prbs as prbs
+import numpy as np
 import time
 from time import sleep
 
@@ -162,10 +165,13 @@ def hexStr(data):
     return '0x' + '{:04X}'.format(data)
 
 def next_pbrs(data):
-    next_pbrs = ((data << 1) ^ (data << 2)) & 0b1111111111111100
-    next_pbrs |= (((next_pbrs >> 15) ^ (next_pbrs >> 14)) & 0x0001)    # find bit 0
-    next_pbrs |= (((next_pbrs >> 14) ^ (data << 1)) & 0x0002)    # find bit 1
-    return next_pbrs
+    return prbs.next_prbs(data)
+
+# The FIFO interleaves two samples of each channel: CH0, CH0, CH1, CH1, ...
+# Returns views of data.
+def split_channels(data, num_samples):
+    samples = np.asarray(data[:num_samples]).reshape(-1, 2, 2)
+    return samples[:, 0, :].ravel(), samples[:, 1, :].ravel()
 
 def dump_ADC_registers(device):
     device.hs_set_bit_mode(consts.HS_BIT_MODE_MPSSE)
@@ -222,7 +228,7 @@ def capture2(device, n, dumpdata, dump_pscope_data, verbose):
     device.data_set_low_byte_first() #Set endian-ness
     device.hs_set_bit_mode(consts.HS_BIT_MODE_FIFO)
     sleep(0.1)
-    nSampsRead, data = device.data_receive_uint16_values(end = (n.BuffSize ))
+    nSampsRead, data = device.data_receive_uint16_values_into(end = (n.BuffSize ))
     device.hs_set_bit_mode(consts.HS_BIT_MODE_MPSSE)
 
     sleep(sleeptime)
@@ -231,17 +237,8 @@ def capture2(device, n, dumpdata, dump_pscope_data, verbose):
         print "Read out " + str(nSampsRead) + " samples"
 #        print "And " + str(extrabytecount) + " extra bytes"
 
-    # Initialize data arrays
-    data_ch0 = [0]*(n.BuffSize/2)
-    data_ch1 = [0]*(n.BuffSize/2)
-
     # Split CH0, CH1
-    for i in range(0, (n.BuffSize)/4):
-        # Split data for CH0, CH1
-        data_ch0[i*2] = data[i*4]
-        data_ch0[i*2+1] = data[i*4+1]
-        data_ch1[i*2] = data[i*4+2]
-        data_ch1[i*2+1] = data[i*4+3]
+    data_ch0, data_ch1 = split_channels(data, n.BuffSize)
 
     if(dumpdata !=0):
         for i in range(0, min(dumpdata, n.BuffSize/2)):
@@ -254,11 +251,7 @@ def capture2(device, n, dumpdata, dump_pscope_data, verbose):
                 print str(data[2*i]) + ", " + str(data[2*i+1])
 
     if(dump_pscope_data != 0):
-        outfile = open("pscope_data.csv", "w")
-        for i in range(0, n.BuffSize/2):
-            outfile.write("{:d}, ,{:d}\n".format((data_ch0[i]-32768)/4, (data_ch1[i]-32768)/4))
-        outfile.write("End\n")
-        outfile.close()
+        write_pscope_data_csv("pscope_data.csv", data_ch0, data_ch1, n.BuffSize/2)
 
     nSamps_per_channel = n.BuffSize/2
     return data, data_ch0, data_ch1, nSamps_per_channel, syncErr
@@ -303,7 +296,7 @@ def capture4(device, n, dumpdata, dump_pscope_data, verbose):
 # Step 30
     throwaway = 3
     #nSampsRead, data01 = device.data_receive_bytes(end = (n.BuffSize*2 + 100))
-    nSampsRead, data01 = device.data_receive_uint16_values(end = (n.BuffSize))
+    nSampsRead, data01 = device.data_receive_uint16_values_into(end = (n.BuffSize))
     if(throwaway != 0):
         device.data_receive_bytes(end = throwaway)
 # Step 31 
@@ -334,7 +327,7 @@ def capture4(device, n, dumpdata, dump_pscope_data, verbose):
     sleep(0.1)
 # Step 37
     #nSampsRead, data23 = device.data_receive_bytes(end = (n.BuffSize*2 + 100))
-    nSampsRead, data23 = device.data_receive_uint16_values(end = (n.BuffSize))
+    nSampsRead, data23 = device.data_receive_uint16_values_into(end = (n.BuffSize))
     if(throwaway != 0):
         device.data_receive_bytes(end = throwaway)
     device.hs_set_bit_mode(consts.HS_BIT_MODE_MPSSE)
@@ -342,23 +335,9 @@ def capture4(device, n, dumpdata, dump_pscope_data, verbose):
     if(verbose != 0):
         print "Read out " + str(nSampsRead) + " samples for CH2, 3"
 
-    # Initialize data arrays
-    data_ch0 = [0]*(n.BuffSize/2)
-    data_ch1 = [0]*(n.BuffSize/2)
-    data_ch2 = [0]*(n.BuffSize/2)
-    data_ch3 = [0]*(n.BuffSize/2)
-
-    for i in range(0, (n.BuffSize)/4):
-        # Split data for CH0, CH1
-        data_ch0[i*2] = data01[i*4]
-        data_ch0[i*2+1] = data01[i*4+1]
-        data_ch1[i*2] = data01[i*4+2]
-        data_ch1[i*2+1] = data01[i*4+3]
-        # Split data for CH2, CH3
-        data_ch2[i*2] = data23[i*4]
-        data_ch2[i*2+1] = data23[i*4+1]
-        data_ch3[i*2] = data23[i*4+2]
-        data_ch3[i*2+1] = data23[i*4+3]
+    # Split data for CH0, CH1 and CH2, CH3
+    data_ch0, data_ch1 = split_channels(data01, n.BuffSize)
+    data_ch2, data_ch3 = split_channels(data23, n.BuffSize)
 
     if(dumpdata !=0):
         for i in range(0, min(dumpdata, n.BuffSize)):
@@ -367,35 +346,32 @@ def capture4(device, n, dumpdata, dump_pscope_data, verbose):
     nSamps_per_channel = nSampsRead/2
     return data_ch0, data_ch1, data_ch2, data_ch3, nSamps_per_channel, syncErr
 
+def print_first_error(data, i):
+    print
+    print hexStr(data[i-1]) + "; " + hexStr(data[i]) + "; " + hexStr(data[i+1])
+    print
+
+# Returns the number of samples that don't follow from the one before them,
+# see llt.utils.prbs.check_prbs for the first error and burst statistics.
 def pattern_checker(data, nSamps_per_channel, dumppattern):
-    printError = True
-    errorcount = nSamps_per_channel - 1 #Start big
-    #periodicity = lastperiodicity = 0
-    golden = next_pbrs(data[0])
-    for i in range(0, nSamps_per_channel-1):
-        next = next_pbrs(data[i])
-        if(i<dumppattern):
-            print 'data: 0x' + '{:04X}'.format(data[i]) + ', next: 0x' +'{:04X}'.format(next) + ', XOR: 0x' +'{:04X}'.format(data[i+1] ^ next) + ', golden: 0x' +'{:04X}'.format(golden)      # UN-commet for hex
-            #print '0b' + '{:016b}'.format(data[i]) + ',  0x' +'{:016b}'.format(next) + ',  0x' +'{:016b}'.format(data[i] ^ next)   # UN-comment for binary
-        if(data[i+1] == next):
-            errorcount -= 1
-        elif printError:
-            printError = False
-            print
-            print hexStr(data[i-1]) + "; " + hexStr(data[i]) + "; " + hexStr(data[i+1])
-            print
-#                print "error count = " + str(errorcount)
-#                device.Close() #End of main loop.
-#                raise Exception("BAD DATA!!!")
-        if(data[i] == data[0]):
-            #periodicity = i - lastperiodicity
-            lastperiodicity = i
-        golden = next_pbrs(golden)
-
-    #print "periodicity (only valid for captures > 64k): " + str(periodicity)
-    #if errorcount < 0:
-    #    errorcount = 100000000
-    return errorcount
+    data = np.asarray(data[:nSamps_per_channel])
+    result = prbs.check_prbs(data)
+    # the first bad word is reported right after its line of the dump
+    error_line = None if result.errors == 0 else result.first_error - 1
+    dump_length = 0
+    if(dumppattern > 0):
+        dump = data[:min(dumppattern, len(data) - 1)]
+        dump_length = len(dump)
+        nexts = prbs.next_prbs(dump)
+        goldens = prbs.prbs_sequence(prbs.next_prbs(int(data[0])), len(dump))
+        for i in range(0, len(dump)):
+            print 'data: 0x' + '{:04X}'.format(dump[i]) + ', next: 0x' +'{:04X}'.format(nexts[i]) + ', XOR: 0x' +'{:04X}'.format(data[i+1] ^ nexts[i]) + ', golden: 0x' +'{:04X}'.format(goldens[i])      # UN-commet for hex
+            #print '0b' + '{:016b}'.format(dump[i]) + ',  0x' +'{:016b}'.format(nexts[i]) + ',  0x' +'{:016b}'.format(dump[i] ^ nexts[i])   # UN-comment for binary
+            if(i == error_line):
+                print_first_error(data, i)
+    if(error_line is not None and error_line >= dump_length):
+        print_first_error(data, error_line)
+    return result.errors
     
 
 
@@ -470,12 +446,7 @@ def capture1(device, n, channels, lanes, dumpdata, dump_pscope_data, verbose):
                     print str(data[2*i]) + ", " + str(data[2*i+1])
 
     if(dump_pscope_data != 0):
-        outfile = open("pscope_data.csv", "w")
-        for i in range(0, n.BuffSize/2):
-            outfile.write("{:d}, ,{:d}\n".format((data_ch0[i]-32768)/4, (data_ch1[i]-32768)/4))
-
-        outfile.write("End\n")
-        outfile.close()
+        write_pscope_data_csv("pscope_data.csv", data_ch0, data_ch1, n.BuffSize/2)
 
     nSamps_per_channel = n.BuffSize
     return data, data_ch0, data_ch1, nSamps_per_channel, syncErr
@@ -503,14 +474,19 @@ def write_1ch_32k_pscope_file(data_vector, filename):
     f.write('Row,0,319\n')
     f.write('DemoID,DC1509,LTC2107,0\n')
     f.write('RawData,1,32768,16,4371,61253,300.000000000000000,0.000000e+000,6.553600e+004	\n')	
-    for i in range(0, 32768):
-        f.write(str(data_vector[i]))      # str() converts to string
-        f.write('\n')
-
-
+    pscope.write_samples(f, data_vector[:32768])
     f.write('End			\n')	
     f.close()
 
+# Offset binary 16 bit codes to 14 bit two's complement, the two channels
+# side by side without a PScope header
+def write_pscope_data_csv(filename, data_ch0, data_ch1, num_samples):
+    data_ch0 = (np.asarray(data_ch0[:num_samples], dtype=np.int32) - 32768) // 4
+    data_ch1 = (np.asarray(data_ch1[:num_samples], dtype=np.int32) - 32768) // 4
+    with open(filename, "w") as outfile:
+        pscope.write_samples(outfile, data_ch0, data_ch1)
+        outfile.write("End\n")
+
 def bitfile_id_warning(id_shouldbe, id_is):
     if(id_is != id_shouldbe):
         print("***********************************")
@@ -0,0 +1,30 @@
+# Capture file round trip tests, no hardware needed
+import os
+import tempfile
+import numpy as np
+import llt.common.capture_file as cf
+
+def check_round_trip(channels, expected_dtype):
+    handle, filename = tempfile.mkstemp(suffix = '.ltc')
+    os.close(handle)
+    try:
+        cf.write_capture(filename, channels)
+        capture = cf.read_capture(filename, mmap = False)
+        if capture.header['dtype'] != expected_dtype:
+            raise Exception('Stored as ' + capture.header['dtype'] + ', expected ' + expected_dtype)
+        if not np.array_equal(capture.data, np.asarray(channels).reshape(capture.data.shape)):
+            raise Exception('Samples changed in a ' + expected_dtype + ' round trip')
+    finally:
+        os.remove(filename)
+
+def test():
+    # filtered or averaged data must not be truncated to int32
+    check_round_trip([np.array([0.1 + 0.2, 1/3., -2.5e9]), np.array([1e-12, 0.0, 7.25])], '<f8')
+    check_round_trip(np.array([0.5, -1.25], dtype = np.float32), '<f4')
+    # raw 32 bit words above 2**31 must not wrap
+    check_round_trip(np.array([0, 0x80000000, 0xFFFFFFFF], dtype = np.uint32), '<u4')
+    check_round_trip([-3, 0, 1 << 20], '<i4')
+    print 'Capture file tests passed'
+
+if __name__ == '__main__':
+    test()
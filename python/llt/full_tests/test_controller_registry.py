@@ -0,0 +1,43 @@
+# Controller registry tests, run on the simulated controller backend so no
+# hardware is needed. Run this on its own, not after tests that loaded the
+# native library.
+import os
+os.environ['LTC_CONTROLLER_COMM'] = 'simulated'
+os.environ['LTC_SIMULATED_BOARDS'] = ''
+import gc
+import llt.common.constants as consts
+import llt.common.functions as funcs
+import llt.common.ltc_controller_comm_sim as sim
+import llt.common.dc890 as dc890
+
+def make_demoboard():
+    return dc890.Demoboard(dc_number = 'DC1925', fpga_load = 'CMOS', num_channels = 1,
+                           is_positive_clock = True, num_bits = 16, alignment = 16,
+                           is_bipolar = True)
+
+def check_construct_drop_construct():
+    # a board dropped without "with" must not hold its controller forever
+    board = make_demoboard()
+    controller = board.controller
+    del board
+    gc.collect()
+    board = make_demoboard()
+    if board.controller is not controller:
+        raise Exception('Expected the dropped board\'s controller to be reused')
+    board.__exit__(None, None, None)
+    if len(funcs._controller_registry) != 0:
+        raise Exception('Controller still registered after __exit__')
+
+def test():
+    sim.exclusive_open = True
+    sim.remove_boards()
+    sim.add_board(consts.TYPE_DC890, 'DC1925A-A,LTC2268', realtime = 0)
+    try:
+        check_construct_drop_construct()
+    finally:
+        funcs.cleanup_controllers()
+        sim.remove_boards()
+    print 'Controller registry tests passed'
+
+if __name__ == '__main__':
+    test()
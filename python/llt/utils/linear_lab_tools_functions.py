@@ -30,9 +30,15 @@ of the authors and should not be interpreted as representing official policies,
 either expressed or implied, of Linear Technology Corp.
 
 """
+import os
+import hashlib
+import multiprocessing
 import numpy as np
 from matplotlib import pyplot as plt
 
+# Where freqz_db_cached keeps its responses between sessions
+FREQZ_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.llt', 'freqz_cache')
+
 def fold_spectrum(unfolded_spectrum, points_per_zone, num_zones):
     verbose = 0
     zonesign = 1
@@ -88,6 +94,76 @@ def freqz_by_fft_numpoints(filter_coeffs, numpoints):
     resp = abs(np.fft.fft(np.concatenate((filter_coeffs, np.zeros(fftlength - num_coeffs))))) # filter and a bunch more zeros
     return resp
 
+def _freqz_cache_key(filter_coeffs, numpoints, scale):
+    # content hash, so renamed or regenerated filters with the same taps hit
+    coeffs = np.ascontiguousarray(filter_coeffs, dtype=np.float64)
+    key = hashlib.sha1(coeffs.tobytes())
+    key.update(("%d_%r" % (numpoints, float(scale))).encode('ascii'))
+    return key.hexdigest()
+
+def _freqz_db(args):
+    filter_coeffs, numpoints, scale = args
+    resp = np.asarray(freqz_by_fft_numpoints(filter_coeffs, numpoints))
+    return (20 * np.log10(resp * scale)).astype(np.float32)
+
+def freqz_db_cached_list(filter_list, numpoints, scale = 1.0, processes = None,
+                         cache_dir = None):
+    """Magnitude responses in dB (float32) for a list of filters.
+
+    Responses are stored in cache_dir (FREQZ_CACHE_DIR by default) keyed by a
+    hash of the coefficients, numpoints and scale, and memory-mapped on later
+    calls. Misses are computed over a process pool of size processes. On
+    Windows, where a pool re-imports the calling script, the pool is only used
+    when processes is given explicitly, so the script must then guard its code
+    with if __name__ == "__main__". processes = 1 always computes in-process.
+    """
+    cache_dir = FREQZ_CACHE_DIR if cache_dir is None else cache_dir
+    paths = [os.path.join(cache_dir, _freqz_cache_key(f, numpoints, scale) + ".npy")
+             for f in filter_list]
+    responses = [None] * len(filter_list)
+    misses = []
+    for i, path in enumerate(paths):
+        try:
+            responses[i] = np.load(path, mmap_mode = 'r')
+        except (IOError, ValueError):
+            misses.append(i)
+    if not misses:
+        return responses
+
+    jobs = [(np.asarray(filter_list[i], dtype=np.float64), numpoints, scale) for i in misses]
+    if processes is None and hasattr(os, 'fork'):
+        processes = min(len(jobs), multiprocessing.cpu_count())
+    if processes is None or processes <= 1 or len(jobs) == 1:
+        results = [_freqz_db(job) for job in jobs]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_freqz_db, jobs)
+        finally:
+            pool.close()
+            pool.join()
+
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+    except OSError:
+        pass
+    for i, result in zip(misses, results):
+        responses[i] = result
+        try:
+            np.save(paths[i] + ".tmp.npy", result)
+            if os.path.exists(paths[i]):
+                os.remove(paths[i])
+            os.rename(paths[i] + ".tmp.npy", paths[i])
+        except (IOError, OSError):
+            pass # cache is best effort, the response is still returned
+    return responses
+
+def freqz_db_cached(filter_coeffs, numpoints, scale = 1.0, cache_dir = None):
+    """Single filter version of freqz_db_cached_list,
+    20*log10(scale*abs(freqz_by_fft_numpoints(filter_coeffs, numpoints)))."""
+    return freqz_db_cached_list([filter_coeffs], numpoints, scale, 1, cache_dir)[0]
+
 # Upsample an array and stuff zeros between data points.
 # Upsample_factor is the total number of output points per
 # input point (that is, the number of zeros stuffed is
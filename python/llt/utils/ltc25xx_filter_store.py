@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Binary cache for the LTC25xx digital filter coefficients
+
+The coefficients ship as one text file per filter type and downsample factor
+in common/ltc25xx_filters. Parsing them line by line takes several seconds for
+the long filters, so the first call to get_filter() parses every file once,
+normalizes each filter to unity gain and writes them into a single indexed
+binary file. Later calls memory-map that file. The cache is rebuilt whenever a
+text file is added, removed or modified.
+
+    import llt.utils.ltc25xx_filter_store as fs
+    from llt.utils.DC2390_functions import FTSSINC, DF256
+    taps = fs.get_filter(FTSSINC, DF256)    # or fs.get_filter("ssinc", 256)
+
+Cache file layout: 8 byte magic, 4 byte little endian header length, JSON
+header {name: [offset, length, mtime, size]}, padding to 8 bytes, then all
+the coefficients as little endian float64.
+
+Copyright (c) 2015, Linear Technology Corp.(LTC)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of Linear Technology Corp.
+
+"""
+import os
+import json
+import struct
+import tempfile
+import numpy as np
+
+DEFAULT_FILTER_DIR = os.path.normpath(os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', '..', '..', 'common', 'ltc25xx_filters'))
+CACHE_FILE_NAME = 'ltc25xx_filters.cache'
+
+_MAGIC = b'LTCFILT1'
+
+def filter_name(ft, df):
+    """Return the coefficient file base name, e.g. "ssinc_256".
+
+    ft is a Filt_Type_information from DC2390_functions or its text ("ssinc"),
+    df is a Downsample_Factor_information, its text or the integer factor.
+    """
+    ft_txt = getattr(ft, 'FT_txt', ft)
+    df_txt = getattr(df, 'DF_txt', df)
+    return str(ft_txt) + '_' + str(df_txt)
+
+class FilterStore(object):
+    def __init__(self, filter_dir = DEFAULT_FILTER_DIR, cache_path = None):
+        self.filter_dir = filter_dir
+        self.cache_path = cache_path
+        self._index = None
+        self._blob = None
+
+    def get_filter(self, ft, df):
+        """Return the unity gain coefficients as a read-only float64 array."""
+        name = filter_name(ft, df)
+        if self._index is None or not self._is_current(name):
+            self._load()
+        if name not in self._index:
+            raise IOError("No coefficient file for filter " + name + " in " +
+                          self.filter_dir)
+        offset, length, _, _ = self._index[name]
+        return self._blob[offset:offset + length]
+
+    def names(self):
+        if self._index is None:
+            self._load()
+        return sorted(self._index.keys())
+
+    def _text_files(self):
+        files = {}
+        for file_name in os.listdir(self.filter_dir):
+            if file_name.endswith('.txt'):
+                stat = os.stat(os.path.join(self.filter_dir, file_name))
+                files[file_name[:-4]] = [stat.st_mtime, stat.st_size]
+        return files
+
+    def _is_current(self, name):
+        # only the requested file is checked, the full directory is checked
+        # whenever the cache is (re)loaded
+        path = os.path.join(self.filter_dir, name + '.txt')
+        if name not in self._index:
+            return not os.path.exists(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return self._index[name][2:] == [stat.st_mtime, stat.st_size]
+
+    def _cache_paths(self):
+        if self.cache_path is not None:
+            return [self.cache_path]
+        return [os.path.join(self.filter_dir, CACHE_FILE_NAME),
+                os.path.join(tempfile.gettempdir(), CACHE_FILE_NAME)]
+
+    def _load(self):
+        files = self._text_files()
+        for path in self._cache_paths():
+            cached = _read_cache(path)
+            if cached is not None:
+                index, blob = cached
+                if all(index.get(name, [0, 0])[2:] == files[name] for name in files) \
+                        and len(index) == len(files):
+                    self._index, self._blob = index, blob
+                    return
+        index, blob = self._build(files)
+        for path in self._cache_paths():
+            try:
+                _write_cache(path, index, blob)
+            except (IOError, OSError):
+                continue
+            cached = _read_cache(path)
+            if cached is not None:
+                index, blob = cached
+            break
+        blob.flags.writeable = False
+        self._index, self._blob = index, blob
+
+    def _build(self, files):
+        index = {}
+        taps = []
+        offset = 0
+        for name in sorted(files):
+            with open(os.path.join(self.filter_dir, name + '.txt'), 'r') as infile:
+                coeffs = np.array(infile.read().split(), dtype=np.float64)
+            coeffs /= np.sum(coeffs) # Normalize to unity gain
+            index[name] = [offset, len(coeffs)] + files[name]
+            taps.append(coeffs)
+            offset += len(coeffs)
+        blob = np.concatenate(taps) if taps else np.zeros(0)
+        return index, blob
+
+def _read_cache(path):
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                return None
+            header_length, = struct.unpack('<I', f.read(4))
+            index = json.loads(f.read(header_length).decode('utf-8'))
+    except (IOError, OSError, ValueError, struct.error):
+        return None
+    data_offset = _data_offset(header_length)
+    num_taps = sum(entry[1] for entry in index.values())
+    if os.path.getsize(path) != data_offset + 8 * num_taps:
+        return None
+    if num_taps == 0:
+        return index, np.zeros(0)
+    blob = np.memmap(path, dtype='<f8', mode='r', offset=data_offset,
+                     shape=(num_taps,))
+    return index, blob
+
+def _write_cache(path, index, blob):
+    header = json.dumps(index).encode('utf-8')
+    data_offset = _data_offset(len(header))
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(_MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        f.write(b'\0' * (data_offset - len(_MAGIC) - 4 - len(header)))
+        f.write(blob.astype('<f8').tobytes())
+    if os.path.exists(path):
+        # os.rename will not replace an existing file on Windows
+        os.remove(path)
+    os.rename(temp_path, path)
+
+def _data_offset(header_length):
+    return (len(_MAGIC) + 4 + header_length + 7) // 8 * 8
+
+_default_store = None
+
+def get_filter(ft, df):
+    """Return unity gain coefficients for filter type ft and downsample factor
+    df from the shared store in common/ltc25xx_filters."""
+    global _default_store
+    if _default_store is None:
+        _default_store = FilterStore()
+    return _default_store.get_filter(ft, df)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized PRBS generator and checker for JESD204B test pattern captures
+
+The LTC212x PRBS test pattern is a 16 bit word per sample, each word follows
+from the one before it (next_prbs). Instead of stepping the LFSR once per
+sample in python, the checker looks up the expected next word of every sample
+in a 64k entry table and compares whole arrays. prbs_sequence generates the
+pattern from a seed by table doubling: the table for 2**k steps is the one for
+2**(k-1) steps applied to itself, so 1M words take 20 gathers.
+
+    import llt.utils.prbs as prbs
+    result = prbs.check_prbs(data_ch0)
+    print result.summary()
+    for lane, result in enumerate(prbs.check_lanes([data_ch0, data_ch1])):
+        print lane, result.errors, result.first_error
+
+errors counts words that don't follow from the word before them, the same
+count the per-sample pattern checkers give. A single corrupted word makes two
+of those in a row (itself and the next word), they are one burst.
+sequence_errors compares against the sequence seeded by the first word, where
+a slip in the middle of a capture makes every later word wrong.
+
+
+Copyright (c) 2016, Linear Technology Corp.(LTC)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+
+"""
+
+import numpy as np
+
+def next_prbs(data):
+    """Return the PRBS word following data, an int or an integer array."""
+    next_value = ((data << 1) ^ (data << 2)) & 0xFFFC
+    next_value |= ((next_value >> 15) ^ (next_value >> 14)) & 0x0001
+    next_value |= ((next_value >> 14) ^ (data << 1)) & 0x0002
+    return next_value
+
+_step_tables = [] # _step_tables[k] maps every word to the one 2**k steps later
+
+def step_table(k = 0):
+    """Return the uint16 table mapping each word to the word 2**k steps later."""
+    while len(_step_tables) <= k:
+        if _step_tables:
+            previous = _step_tables[-1]
+            table = previous[previous]
+        else:
+            table = next_prbs(np.arange(0x10000, dtype=np.uint32)).astype(np.uint16)
+        table.flags.writeable = False
+        _step_tables.append(table)
+    return _step_tables[k]
+
+def prbs_sequence(seed, num_samples):
+    """Return num_samples PRBS words starting with seed as a uint16 array."""
+    sequence = np.empty(num_samples, dtype=np.uint16)
+    if num_samples == 0:
+        return sequence
+    sequence[0] = seed & 0xFFFF
+    length = 1
+    k = 0
+    while length < num_samples:
+        # the next length words are the first ones 2**k = length steps on
+        count = min(length, num_samples - length)
+        sequence[length:length + count] = step_table(k)[sequence[:count]]
+        length += count
+        k += 1
+    return sequence
+
+class PrbsResult(object):
+    """Result of check_prbs for one lane.
+
+    error_indices are the indices of the words that don't follow from the word
+    before them, first_error is the first of them (None if there are none).
+    bursts is the number of runs of consecutive errors, longest_burst the
+    length of the longest one.
+    """
+    def __init__(self, data):
+        self.num_samples = len(data)
+        if self.num_samples < 2:
+            bad = np.zeros(0, dtype=bool)
+        else:
+            bad = step_table()[data[:-1]] != data[1:]
+        self.error_indices = np.flatnonzero(bad) + 1
+        self.errors = len(self.error_indices)
+        self.first_error = int(self.error_indices[0]) if self.errors else None
+        # +1 where a burst starts, -1 one past where it ends
+        edges = np.diff(np.concatenate(([0], bad.view(np.int8), [0])))
+        burst_lengths = np.flatnonzero(edges < 0) - np.flatnonzero(edges > 0)
+        self.bursts = len(burst_lengths)
+        self.longest_burst = int(burst_lengths.max()) if self.bursts else 0
+        if self.num_samples:
+            expected = prbs_sequence(int(data[0]), self.num_samples)
+            self.sequence_errors = int(np.count_nonzero(expected != data))
+        else:
+            self.sequence_errors = 0
+
+    def summary(self):
+        if not self.errors:
+            return "%d samples, no errors" % self.num_samples
+        return "%d samples, %d errors in %d bursts (longest %d), first at %d" % (
+            self.num_samples, self.errors, self.bursts, self.longest_burst,
+            self.first_error)
+
+def _as_words(data, num_samples):
+    # lists and wider arrays become uint16, uint16 arrays are not copied
+    words = np.asarray(data)
+    if num_samples is not None:
+        words = words[:num_samples]
+    if words.dtype != np.uint16:
+        words = (words.astype(np.int64) & 0xFFFF).astype(np.uint16)
+    return words
+
+def check_prbs(data, num_samples = None):
+    """Check the first num_samples (default all) words of data, return a
+    PrbsResult."""
+    return PrbsResult(_as_words(data, num_samples))
+
+def check_lanes(lanes, num_samples = None):
+    """Return a PrbsResult for every lane (channel) in lanes."""
+    return [check_prbs(lane, num_samples) for lane in lanes]
@@ -1,7 +1,40 @@
+# Write and read PScope .adc files. Samples are formatted a chunk at a time,
+# long captures can be written block by block with PScopeWriter or
+# save_blocks_for_pscope, and read_pscope reads a file back into arrays.
+
 import math as m
-def save_for_pscope(out_path, num_bits, is_bipolar, num_samples, dc_num, ltc_num, *data):
-    num_channels = len(data)
-    if num_channels < 0 or num_channels > 16:
+import numpy as np
+
+CHANNEL_SEPARATOR = ', ,'
+
+def sample_strings(values):
+    """Return the text str() gives each sample of values, formatted fast."""
+    if not isinstance(values, np.ndarray):
+        return map(str, values)
+    values = values.reshape(-1)
+    if values.dtype == np.float64:
+        # str of a numpy float64 is its repr, tolist makes that much faster
+        return map(repr, values.tolist())
+    if values.dtype.kind == 'f':
+        return map(str, values)
+    return map(str, values.tolist())
+
+def write_samples(out_file, *channels):
+    """Write sample lines, one column per channel, to an open file."""
+    chunk_size = 64 * 1024
+    num_samples = min(len(channel) for channel in channels)
+    for start in xrange(0, num_samples, chunk_size):
+        columns = [sample_strings(channel[start:start + chunk_size])
+                   for channel in channels]
+        if len(columns) == 1:
+            lines = columns[0]
+        else:
+            lines = map(CHANNEL_SEPARATOR.join, zip(*columns))
+        out_file.write('\n'.join(lines))
+        out_file.write('\n')
+
+def write_header(out_file, num_bits, is_bipolar, num_samples, dc_num, ltc_num, num_channels):
+    if num_channels < 1 or num_channels > 16:
         raise ValueError("pass in a list for each channel (between 1 and 16)")
 
     full_scale = 1 << num_bits
@@ -12,22 +45,128 @@ def save_for_pscope(out_path, num_bits, is_bipolar, num_samples, dc_num, ltc_num
         min_val = 0
         max_val = full_scale
 
+    out_file.write('Version,115\n')
+    out_file.write('Retainers,0,{0:d},{1:d},1024,0,{2:0.15f},1,1\n'.format(num_channels, num_samples, 0.0))
+    out_file.write('Placement,44,0,1,-1,-1,-1,-1,10,10,1031,734\n')
+    out_file.write('DemoID,' + dc_num + ',' + ltc_num + ',0\n')
+    for i in range(num_channels):
+        out_file.write(
+            'RawData,{0:d},{1:d},{2:d},{3:d},{4:d},{5:0.15f},{3:e},{4:e}\n'.format(
+                i+1, num_samples, num_bits, min_val, max_val, 1.0 ))
+
+def save_for_pscope(out_path, num_bits, is_bipolar, num_samples, dc_num, ltc_num, *data):
+    for channel in data:
+        if len(channel) < num_samples:
+            raise ValueError("a channel has %d of %d samples" % (len(channel), num_samples))
     with open(out_path, 'w') as out_file:
-        out_file.write('Version,115\n')
-        out_file.write('Retainers,0,{0:d},{1:d},1024,0,{2:0.15f},1,1\n'.format(num_channels, num_samples, 0.0))
-        out_file.write('Placement,44,0,1,-1,-1,-1,-1,10,10,1031,734\n')
-        out_file.write('DemoID,' + dc_num + ',' + ltc_num + ',0\n')
-        for i in range(num_channels):
-            out_file.write(
-                'RawData,{0:d},{1:d},{2:d},{3:d},{4:d},{5:0.15f},{3:e},{4:e}\n'.format(
-                    i+1, num_samples, num_bits, min_val, max_val, 1.0 ))
-        for samp in xrange(num_samples):
-            out_file.write(str(data[0][samp]))
-            for ch in range(1, num_channels):
-                out_file.write(', ,' + str(data[ch][samp]))
-            out_file.write('\n')
+        write_header(out_file, num_bits, is_bipolar, num_samples, dc_num, ltc_num, len(data))
+        write_samples(out_file, *[channel[:num_samples] for channel in data])
         out_file.write('End\n')
 
+class PScopeWriter(object):
+    """Write a PScope file block by block, for captures too long to hold in
+    memory. num_samples (per channel) goes in the header so it must be known
+    up front, close() checks that many were written.
+
+        with PScopeWriter("capture.adc", 24, True, n, "2390", "2500", 2) as w:
+            for block_a, block_b in blocks:
+                w.write(block_a, block_b)
+    """
+    def __init__(self, out_path, num_bits, is_bipolar, num_samples, dc_num, ltc_num,
+                 num_channels = 1):
+        self.num_samples = num_samples
+        self.num_channels = num_channels
+        self.samples_written = 0
+        self._file = open(out_path, 'w')
+        write_header(self._file, num_bits, is_bipolar, num_samples, dc_num, ltc_num,
+                     num_channels)
+
+    # support "with" semantics
+    def __enter__(self):
+        return self
+
+    # support "with" semantics, an exception leaves the file without "End"
+    def __exit__(self, vtype, value, traceback):
+        if vtype is None:
+            self.close()
+        else:
+            self._file.close()
+
+    def write(self, *channels):
+        if len(channels) != self.num_channels:
+            raise ValueError("expected a block for each of the %d channels" % self.num_channels)
+        num_samples = min(len(channel) for channel in channels)
+        if self.samples_written + num_samples > self.num_samples:
+            raise ValueError("more than %d samples written" % self.num_samples)
+        write_samples(self._file, *channels)
+        self.samples_written += num_samples
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.write('End\n')
+        self._file.close()
+        if self.samples_written != self.num_samples:
+            raise ValueError("%d of %d samples written" % (self.samples_written, self.num_samples))
+
+def save_blocks_for_pscope(out_path, num_bits, is_bipolar, num_samples, dc_num, ltc_num,
+                           blocks, num_channels = 1):
+    """Like save_for_pscope but the data comes from an iterator of blocks,
+    each an array (one channel) or a tuple with a block of every channel."""
+    with PScopeWriter(out_path, num_bits, is_bipolar, num_samples, dc_num, ltc_num,
+                      num_channels) as writer:
+        for block in blocks:
+            if isinstance(block, tuple):
+                writer.write(*block)
+            else:
+                writer.write(block)
+
+class PScopeFile(object):
+    """A PScope file read by read_pscope. header maps each header line name
+    to a list of its fields (a list of lists for repeated names like
+    RawData), channels is a tuple of arrays."""
+    def __init__(self, header, channels):
+        self.header = header
+        self.channels = channels
+        self.num_channels = len(channels)
+        self.num_samples = len(channels[0]) if channels else 0
+        raw_data = header.get('RawData', [[]])[0]
+        self.num_bits = int(raw_data[2]) if len(raw_data) > 2 else None
+        self.is_bipolar = float(raw_data[3]) < 0 if len(raw_data) > 3 else None
+        demo_id = header.get('DemoID', [])
+        self.dc_num = demo_id[0] if len(demo_id) > 0 else None
+        self.ltc_num = demo_id[1] if len(demo_id) > 1 else None
+
+def read_pscope(in_path):
+    """Read a PScope file. Samples are int64 unless the file has decimals."""
+    header = {}
+    with open(in_path, 'r') as in_file:
+        position = 0
+        for line in iter(in_file.readline, ''):
+            if line[:1].isalpha():
+                fields = [field.strip() for field in line.strip().split(',')]
+                if fields[0] == 'End':
+                    return PScopeFile(header, ())
+                if fields[0] == 'RawData':
+                    header.setdefault('RawData', []).append(fields[1:])
+                else:
+                    header[fields[0]] = fields[1:]
+                position = in_file.tell()
+            else:
+                break
+        in_file.seek(position)
+        text = in_file.read()
+    end = text.rfind('End')
+    if end >= 0:
+        text = text[:end]
+    num_channels = len(text[:text.find('\n')].split(CHANNEL_SEPARATOR))
+    is_float = '.' in text or 'e' in text
+    values = np.fromstring(text.replace(CHANNEL_SEPARATOR, ' '),
+                           dtype = np.float64 if is_float else np.int64, sep = ' ')
+    values = values[:len(values) // num_channels * num_channels]
+    data = values.reshape(-1, num_channels)
+    return PScopeFile(header, tuple(data[:, ch] for ch in range(num_channels)))
+
 if __name__ == '__main__':
     num_bits = 16
     num_samples = 65536
@@ -36,4 +175,3 @@ if __name__ == '__main__':
 
     save_for_pscope('test.adc', num_bits, True, num_samples, 'DC9876A-A', 'LTC9999',
                     channel_1, channel_2 )
-
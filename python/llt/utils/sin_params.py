@@ -1,4 +1,5 @@
 import math as m
+from collections import OrderedDict
 import numpy as np
 
 NONE               = 0x00
@@ -14,8 +15,25 @@ DEF_WINDOW_TYPE = BLACKMAN_HARRIS_92
 
 BW = 3
 
+# (size, window_type, symmetric) -> window, least recently used first
+WINDOW_CACHE_SIZE = 8
+_window_cache = OrderedDict()
+
 def sin_params(data, window_type=DEF_WINDOW_TYPE, mask=None, num_harms=9, spur_in_harms = True):
-    fft_data = windowed_fft_mag(data)
+    """Return (harmonics, snr, thd, sinad, enob, sfdr) for a capture.
+
+    data can also be a 2-D array with one capture per row, then the FFTs are
+    done in one go and a list with one result tuple per capture is returned.
+    """
+    data = np.asarray(data)
+    if data.ndim == 2:
+        return [sin_params_from_fft(fft_data, window_type, mask, num_harms, spur_in_harms)
+                for fft_data in windowed_fft_mag(data)]
+    return sin_params_from_fft(windowed_fft_mag(data), window_type, mask,
+                               num_harms, spur_in_harms)
+
+def sin_params_from_fft(fft_data, window_type=DEF_WINDOW_TYPE, mask=None, num_harms=9,
+                        spur_in_harms = True):
     harm_bins, harms, harm_bws = find_harmonics(fft_data, num_harms)
     spur, spur_bw = find_spur(spur_in_harms, harm_bins[0], harms, harm_bws, fft_data, window_type)
 
@@ -47,52 +65,82 @@ def sin_params(data, window_type=DEF_WINDOW_TYPE, mask=None, num_harms=9, spur_i
 
     return (harmonics, snr, thd, sinad, enob, sfdr)
 
-def window(size, window_type=DEF_WINDOW_TYPE):
+def window(size, window_type=DEF_WINDOW_TYPE, symmetric=False):
+    # Captures come in a handful of fixed lengths, so windows are cached.
+    # The returned array is shared and read-only, copy it before modifying.
+    # symmetric=True spans [0, 1] inclusive (i/(size-1)) like functions.plot,
+    # the default is the periodic window used for sin_params.
     if window_type == NONE:
         return None
+    key = (size, window_type, bool(symmetric))
+    win = _window_cache.pop(key, None)
+    if win is None:
+        win = _make_window(size, window_type, symmetric)
+        win.flags.writeable = False
+        if len(_window_cache) >= WINDOW_CACHE_SIZE:
+            _window_cache.popitem(last=False)
+    _window_cache[key] = win
+    return win
+
+def clear_window_cache():
+    _window_cache.clear()
+
+def _make_window(size, window_type, symmetric):
+    t = np.linspace(0, 1, size, bool(symmetric))
     if window_type == HAMMING:
-        return _one_cos(size, 0.54, 0.46, 1.586303)
+        return _one_cos(t, 0.54, 0.46, 1.586303)
     elif window_type == HANN:
-        return _one_cos(size, 0.50, 0.50, 1.632993)
+        return _one_cos(t, 0.50, 0.50, 1.632993)
     elif window_type == BLACKMAN:
-        return _two_cos(size, 0.42, 0.50, 0.08, 1.811903)
+        return _two_cos(t, 0.42, 0.50, 0.08, 1.811903)
     elif window_type == BLACKMAN_EXACT:
-        return _two_cos(size, 42659071, 0.49656062, 0.07684867, 1.801235)
+        return _two_cos(t, 42659071, 0.49656062, 0.07684867, 1.801235)
     elif window_type == BLACKMAN_HARRIS_70:
-        return _two_cos(size, 0.42323, 0.49755, 0.07922, 1.807637)
+        return _two_cos(t, 0.42323, 0.49755, 0.07922, 1.807637)
     elif window_type == FLAT_TOP:
-        return _two_cos(size, 0.2810639, 0.5208972, 0.1980399, 2.066037)
+        return _two_cos(t, 0.2810639, 0.5208972, 0.1980399, 2.066037)
     elif window_type == BLACKMAN_HARRIS_92:
-        return _three_cos(size, 0.35875, 0.48829, 0.14128, 0.01168, 1.968888)
+        return _three_cos(t, 0.35875, 0.48829, 0.14128, 0.01168, 1.968888)
     else:
          raise ValueError("Unknown window type")   
     
-def _one_cos(n, a0, a1, norm):
-    t = np.linspace(0, 1, n, False)
+def _one_cos(t, a0, a1, norm):
     win = a0 - a1*np.cos(2*np.pi * t)
     return win * norm
     
-def _two_cos(n, a0, a1, a2, norm):
-    t = np.linspace(0, 1, n, False)
+def _two_cos(t, a0, a1, a2, norm):
     win = a0 - a1*np.cos(2*np.pi * t) + a2*np.cos(4*np.pi * t)
     return win * norm
     
-def _three_cos(n, a0, a1, a2, a3, norm):
-    t = np.linspace(0, 1, n, False)
+def _three_cos(t, a0, a1, a2, a3, norm):
     win = a0 - a1*np.cos(2*np.pi * t) + a2*np.cos(4*np.pi * t) - a3*np.cos(6*np.pi * t)
     return win * norm
 
-def windowed_fft_mag(data, window_type=BLACKMAN_HARRIS_92):
-    n = len(data)      
-    data = np.array(data, dtype=np.float64)
-    data -= np.mean(data)
-    w = window(n, window_type)
-    data = data * w
-    fft_data = np.fft.fft(data)[0:n/2+1]
-    fft_data = abs(fft_data) / n
-    fft_data[1:n/2] *= 2     
+def windowed_fft_mag(data, window_type=BLACKMAN_HARRIS_92, symmetric=False,
+                     work_buffer=None):
+    # works along the last axis, so a 2-D array of captures gives one
+    # spectrum per row. Pass a float64 work_buffer shaped like data to reuse
+    # it for the windowed samples instead of allocating a copy every call.
+    if work_buffer is None:
+        data = np.array(data, dtype=np.float64)
+    else:
+        work_buffer[...] = data
+        data = work_buffer
+    n = data.shape[-1]
+    data -= np.mean(data, axis=-1, keepdims=True)
+    w = window(n, window_type, symmetric)
+    if w is not None:
+        data *= w
+    fft_data = np.abs(np.fft.rfft(data)) / n
+    fft_data[..., 1:n//2] *= 2
     return fft_data
 
+def windowed_fft_db(data, num_bits, window_type=BLACKMAN_HARRIS_92,
+                    symmetric=False, work_buffer=None):
+    # magnitude in dB relative to a full scale num_bits bipolar sine
+    fft_data = windowed_fft_mag(data, window_type, symmetric, work_buffer)
+    return 20 * np.log10(fft_data / 2.0**(num_bits-1))
+
 def find_harmonics(fft_data, max_harms):
     BW = 3
     harm_bins = np.zeros(max_harms, dtype=int)
@@ -135,23 +183,27 @@ def calculate_auto_mask(fft_data, harm_bins, window_type):
     noise_est, noise_bins = masked_sum(fft_data, mask)
     noise_est /= noise_bins
 
+    # above[k] is True where the 3 bin average starting at k is above the
+    # noise estimate
+    padded = np.concatenate((fft_data, np.zeros(2)))
+    above = (padded[:n] + padded[1:n+1] + padded[2:]) / 3 > noise_est
+
     mask = init_mask(n)
     clear_mask_at_dc(mask, window_type)
     for h in harm_bins:
         if mask[h] == 0:
             continue
 
-        j = 1
-        while ( h-j > 0 and mask[h-j] == 1 and 
-                sum(fft_data[(h-j):(h-j+3)]) / 3 > noise_est ):
-            j += 1
-        low = h - j + 1
+        # grow down from h while bins are unmasked and above the noise
+        stops = np.flatnonzero(~(mask[1:h] & above[1:h]))
+        low = stops[-1] + 2 if len(stops) else 1
 
-        j = 1
-        while ( h+j < n and mask[h+j] == 1 and 
-                sum(fft_data[(h+j-2):(h+j+1)]) / 3 > noise_est ) :
-            j += 1
-        high = h + j - 1
+        # grow up from h the same way, looking at the average ending at the bin
+        if h + 1 < 2:
+            high = h
+        else:
+            stops = np.flatnonzero(~(mask[h+1:] & above[h-1:n-2]))
+            high = h + stops[0] if len(stops) else n - 1
 
         clear_mask(mask, low, high)
     
@@ -172,22 +224,21 @@ def find_spur_in_data(fft_data, window_type, fund_bin):
     mask = clear_mask_at_dc(mask, window_type)
     mask = clear_mask(mask, fund_bin - BW, fund_bin + BW)
     
-    index = 0    
-    for i, v in enumerate(mask):
-        if v:
-            index = i
-            break
-            
-    max_value = masked_sum_of_sq(fft_data, mask, index - BW, index + BW);
-    max_index = index;
-    
-    while index < len(fft_data):
-        if mask[index]:
-            value = masked_sum_of_sq(fft_data, mask, index - BW, index + BW)
-            if value > max_value:
-                max_value = value
-                max_index = index
-        index += 1
+    # masked power summed over bins [i-BW, i+BW) for every bin i at once,
+    # reflecting around DC and Nyquist the same way masked_subset does
+    extended = map_nyquist(np.arange(-BW, n + BW), n - 1)
+    power = np.where(mask, fft_data * fft_data, 0)[extended]
+    counts = mask[extended].astype(int)
+    sums = power[0:n].copy()
+    num_bins = counts[0:n].copy()
+    for k in range(1, 2 * BW):
+        sums += power[k:n+k]
+        num_bins += counts[k:n+k]
+
+    # largest sum wins, ties go to the most bins then the lowest index
+    candidates = np.flatnonzero(mask)
+    candidates = candidates[sums[candidates] == sums[candidates].max()]
+    max_index = candidates[np.argmax(num_bins[candidates])]
     _, spur_bin = masked_max(fft_data, mask, max_index - BW, max_index + BW)
     spur, spur_bw = masked_sum_of_sq(fft_data, mask, spur_bin - BW, spur_bin + BW)
     return (spur, spur_bw)
@@ -203,7 +254,7 @@ def init_mask(n, initial_value=True):
 
 def set_mask(mask, start, end, set_value=True):
     nyq = len(mask)
-    mask[map_nyquist(np.array(range(start, end+1)), nyq)] = set_value
+    mask[map_nyquist(np.arange(start, end+1), nyq)] = set_value
     return mask
 
 def clear_mask(mask, start, end):
@@ -229,23 +280,22 @@ def masked_sum(data, mask, start=0, finish=None):
     if finish is None:
         finish = len(data) - 1
     mask, indices = masked_subset(mask, start, finish)
-    value = sum(data[indices])
+    value = np.sum(data[indices])
     return value, len(indices);
     
 def masked_sum_of_sq(data, mask, start=0, finish=None):
     if finish is None:
         finish = len(data) - 1
     mask, indices = masked_subset(mask, start, finish)
-    value = sum(data[indices] * data[indices])
+    values = data[indices]
+    value = np.dot(values, values)
     return value,len(indices);
 
   
 def masked_subset(mask, start, finish):
     nyq = len(mask) - 1
-    mapped_subset = map_nyquist(np.array(range(start, finish)), nyq)
-    indices = np.array(range(0, finish))
-    indices = indices[mapped_subset]
-    mask = mask[mapped_subset]
+    indices = map_nyquist(np.arange(start, finish), nyq)
+    mask = mask[indices]
     indices = indices[mask]
     return (mask, indices)
     
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+NumPy conversions for SoCkit captures
+
+sockit_capture and the streaming readers hand back raw 32 bit words. These
+functions turn them into signed samples without a python loop. uint32_to_int32
+is a zero copy view of a uint32 array, extract_lanes splits words that carry
+two (or more) packed channels, e.g. the 16 and 12 bit DC2511 lanes, into
+strided views or sign extended arrays, and ltc2500_to_int32 handles the
+LTC2500 layout with the status bit on top.
+
+    import llt.utils.sockit_conversions as sc
+    data = sc.uint32_to_int32(sockit_capture(client, NUM_SAMPLES))
+    ch0, ch1 = sc.extract_lanes(raw, 12)
+    for block in sockit_capture_blocks(client, n, convert = sc.uint32_to_int32):
+        ...
+
+Lists are copied into a new array once, numpy uint32 arrays (and buffers from
+mem_read_block_array) are not copied by uint32_to_int32.
+
+Copyright (c) 2016, Linear Technology Corp.(LTC)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of Linear Technology Corp.
+
+"""
+
+import numpy as np
+
+def as_uint32(data):
+    """Return data as a uint32 array, without a copy if it already is one.
+    Negative (already signed) values wrap to their 32 bit pattern."""
+    if isinstance(data, np.ndarray) and data.dtype == np.uint32:
+        return data
+    if isinstance(data, np.ndarray) and data.dtype.itemsize == 4 and data.dtype.kind in 'iu':
+        return data.view(np.uint32)
+    return np.asarray(data, dtype=np.int64).astype(np.uint32)
+
+def uint32_to_int32(data):
+    """Reinterpret 32 bit words as two's complement, a view of data if it is
+    a 32 bit array."""
+    return as_uint32(data).view(np.int32)
+
+def sign_extend(values, num_bits):
+    """Sign extend the low num_bits of values into a new int32 array."""
+    sign_bit = 1 << (num_bits - 1)
+    x = as_uint32(values).astype(np.int32)
+    x &= (1 << num_bits) - 1
+    x ^= sign_bit
+    x -= sign_bit
+    return x
+
+def extract_lane(data, lane, num_bits, lane_width=16, signed=True):
+    """Return channel lane (0 is the least significant) of words holding
+    32 / lane_width packed lanes of num_bits each.
+
+    Full 8 or 16 bit lanes are strided views of data, anything else is a new
+    int32 array.
+    """
+    words = as_uint32(data)
+    if lane < 0 or (lane + 1) * lane_width > 32:
+        raise ValueError("lane %d of width %d is not in a 32 bit word" % (lane, lane_width))
+    lanes_per_word = 32 // lane_width
+    if num_bits == lane_width and lane_width in (8, 16):
+        lane_type = np.dtype(('i' if signed else 'u') + str(lane_width // 8))
+        # little endian words, lane 0 is the first one in memory
+        return words.view(lane_type.newbyteorder('<'))[lane::lanes_per_word]
+    shifted = words >> (lane * lane_width) if lane else words
+    if signed:
+        return sign_extend(shifted, num_bits)
+    return (shifted & ((1 << num_bits) - 1)).astype(np.int32)
+
+def extract_lanes(data, num_bits, num_lanes=2, lane_width=16, signed=True):
+    """Return a tuple with every lane, see extract_lane."""
+    return tuple(extract_lane(data, lane, num_bits, lane_width, signed)
+                 for lane in range(num_lanes))
+
+def ltc2500_to_int32(data, in_place=False):
+    """LTC2500 words have the status bit on top of 31 data bits, return the
+    data bits shifted to the top as int32. in_place reuses data's memory if
+    it is a 32 bit array."""
+    words = as_uint32(data)
+    return np.left_shift(words, 1, out=words if in_place else None).view(np.int32)
+
+def ltc2500_status(data):
+    """Return the status bits (bit 31) of LTC2500 words as a bool array."""
+    return (as_uint32(data) >> 31).astype(bool)
@@ -46,6 +46,11 @@ July, 2016
 from time import sleep
 import time
 import ctypes
+import threading
+import Queue
+import numpy as np
+from llt.common.async_collect import poll_until, CollectFuture
+import llt.utils.sockit_conversions as conversions
 
 # Map out your registers here. These correspond directly to base addresses
 # in the LTQSys_blob. Read and write values to these addresses, and signals in
@@ -104,12 +109,16 @@ def type_rev_check(client, expected_type, minimum_rev):
             % (rev, minimum_rev))
 
 
-def sockit_capture(client, recordlength, trigger = TRIG_NOW, edge = NEG, timeout = 0.0):
-    dmy = False #Consider adding this as an argument.
+# Trigger a capture, wait for the ring buffer to stop and return the DDR
+# address the record starts at. The ring buffer is given 100ms to run before
+# the trigger so it holds the pre-trigger samples. The FPGA loads have no
+# register that says when it is armed, so this delay stays fixed and every
+# SoCkit capture takes at least 100ms. Only the wait for data ready polls.
+def sockit_start_capture(client, recordlength, trigger = TRIG_NOW, edge = NEG, timeout = 0.0):
 #    print("Starting Capture system...\n");
     client.reg_write(NUM_SAMPLES_BASE, recordlength)
     client.reg_write(CONTROL_BASE, edge|CW_START)
-    sleep(0.1) #sleep for a second
+    sleep(0.1) # let the ring buffer arm, see above
     if(trigger == TRIG_NOW):
         print("Software immediate trigger...")
     if(trigger == TRIG_KEY1):
@@ -122,12 +131,14 @@ def sockit_capture(client, recordlength, trigger = TRIG_NOW, edge = NEG, timeout
 #    client.reg_write(CONTROL_BASE, CW_START)
 #    sleep(timeout) #sleep for a second
     cap_start_time = time.time();
-    ready = client.reg_read(DATA_READY_BASE) # Check data ready signal
-    while((ready & 0x01) == 1):
-        time.sleep(0.1) ########## VERY IMPORTANT - It's NOT a good idea to keep hammering on a
-        ########################## port in a tight busy loop - it (may) leave the port in a
-        ########################## "half-open" state too many times...
-        ready = client.reg_read(DATA_READY_BASE) # Check data ready signal
+    # Check data ready signal. Polling backs off from 0.5ms to 100ms between
+    # reads. VERY IMPORTANT - It's NOT a good idea to keep hammering on a port
+    # in a tight busy loop - it (may) leave the port in a "half-open" state
+    # too many times...
+    def is_ready():
+        return (client.reg_read(DATA_READY_BASE) & 0x01) == 0
+    poll_until(is_ready, float('inf'))
+    ready = client.reg_read(DATA_READY_BASE)
     cap_time = time.time() - cap_start_time
     print('ready signal is %d' % ready)
     print("After " + str(cap_time) + " Seconds...")
@@ -147,6 +158,12 @@ def sockit_capture(client, recordlength, trigger = TRIG_NOW, edge = NEG, timeout
 #    print('Reading a block...')
     print 'Starting address: '
     print read_start_address
+    return read_start_address
+
+
+def sockit_capture(client, recordlength, trigger = TRIG_NOW, edge = NEG, timeout = 0.0):
+    dmy = False #Consider adding this as an argument.
+    read_start_address = sockit_start_capture(client, recordlength, trigger, edge, timeout)
 
 # Calculate number of 1M blocks
     blocklength = 2**20
@@ -166,6 +183,74 @@ def sockit_capture(client, recordlength, trigger = TRIG_NOW, edge = NEG, timeout
         block = client.mem_read_block(read_start_address, recordlength)
     return block
 
+def sockit_capture_async(client, recordlength, trigger = TRIG_NOW, edge = NEG, timeout = 0.0):
+    """Run sockit_capture in the background and return a CollectFuture.
+
+    cancel() stops waiting for the data ready signal, the FPGA capture itself
+    is not stopped. Give each future its own MemClient, or a persistent one
+    that nothing else uses meanwhile. The capture still takes at least the
+    100ms sockit_start_capture waits for the ring buffer to arm.
+    """
+    return CollectFuture(sockit_capture, client, recordlength, trigger, edge, timeout)
+
+# Streaming version of sockit_capture. Triggers the capture right away, then
+# returns an iterator of numpy uint32 blocks of blocklength samples (the last
+# one may be shorter). Blocks are read by a background thread into a pool of
+# num_buffers buffers, so block N+1 is on the wire while block N is being
+# processed and memory stays bounded no matter how long the record is.
+# A block's buffer is reused once the next block is requested, copy it if
+# you need to keep it. Don't use client from the consuming loop.
+def sockit_capture_blocks(client, recordlength, trigger = TRIG_NOW, edge = NEG,
+                          timeout = 0.0, blocklength = 2**20, num_buffers = 3,
+                          convert = None):
+    read_start_address = sockit_start_capture(client, recordlength, trigger, edge, timeout)
+    return sockit_read_blocks(client, read_start_address, recordlength,
+                              blocklength, num_buffers, convert)
+
+def _block_reader(client, address, block_sizes, free_buffers, ready_blocks, stop):
+    try:
+        for size in block_sizes:
+            buffer = free_buffers.get()
+            if stop.is_set():
+                return
+            ready_blocks.put(client.mem_read_block_array(address, size, buffer))
+            address += 4 * size
+    except Exception as e:
+        ready_blocks.put(e)
+
+# Reads an already captured record like sockit_capture_blocks. For both,
+# convert (e.g. sockit_conversions.uint32_to_int32) is applied to each block
+# before it is yielded and may work in place, the raw buffer is still the one
+# that gets reused.
+def sockit_read_blocks(client, start_address, recordlength, blocklength = 2**20,
+                       num_buffers = 3, convert = None):
+    if num_buffers < 1:
+        raise ValueError("num_buffers must be at least 1")
+    block_sizes = [blocklength] * (recordlength / blocklength)
+    if recordlength % blocklength:
+        block_sizes.append(recordlength % blocklength)
+    free_buffers = Queue.Queue()
+    for i in range(num_buffers):
+        free_buffers.put(np.empty(4 * min(blocklength, recordlength), dtype = np.uint8))
+    ready_blocks = Queue.Queue()
+    stop = threading.Event()
+    reader = threading.Thread(target = _block_reader, args = (client, start_address,
+        block_sizes, free_buffers, ready_blocks, stop))
+    reader.daemon = True
+    reader.start()
+    try:
+        for i in range(len(block_sizes)):
+            block = ready_blocks.get()
+            if isinstance(block, Exception):
+                raise block
+            yield block if convert is None else convert(block)
+            free_buffers.put(block)
+    finally:
+        # consumer is done (or gave up early), let the reader thread finish
+        stop.set()
+        free_buffers.put(None)
+        reader.join()
+
 
     
 
@@ -233,18 +318,12 @@ def sockit_ramp_test(client, recordlength, trigger = 0, timeout = 0.0):
 
 # A handy function to turn unsigned values from mem_read_block to signed
 # 32-bit values
+# Both return int32 numpy arrays, see sockit_conversions
 def sockit_uns32_to_signed32(data):
-    for i in range(0, len(data)):    
-        if(data[i] > 0x7FFFFFFF):
-            data[i] -= 0xFFFFFFFF
-    return data
+    return conversions.uint32_to_int32(data)
     
 def sockit_ltc2500_to_signed32(data):
-    for i in range(0, len(data)):
-        data[i] = (data[i] & 0x7FFFFFFF) << 1
-        if(data[i] > 0x7FFFFFFF):
-            data[i] -= 0xFFFFFFFF
-    return data
+    return conversions.ltc2500_to_int32(data)
     
     
     